@@ -82,6 +82,7 @@ a = Analysis(
         'reportlab.lib.pagesizes',
         'reportlab.lib.colors',
         'qrcode',
+        'numpy',
     ],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,113 @@
+"""
+Start-up Benchmark Script
+Measures how long the entry points take to import, writes an -X importtime report per entry
+point and fails (exit code 1) when an entry point is over its start-up budget
+
+Usage: python benchmark_startup.py [--runs N] [--report-dir DIR] [--budget module=ms ...]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Import budget per entry point in milliseconds (what has to load before the app is usable)
+STARTUP_BUDGETS_MS = {
+    'printer_client_tray': 300,   # Tray icon only - the GUI loads in the background
+    'printer_client_gui': 1500,   # tkinter, socketio, printer handler
+    'printer_client': 1200,       # Console client: socketio, printer handler
+}
+
+# Modules that must not be loaded at start-up (they are imported on first use)
+LAZY_MODULES = ('reportlab', 'bs4', 'qrcode', 'weasyprint', 'numpy', 'win32ui', 'printer_client_gui',
+                'printer_client', 'spool_backends', 'display_list', 'receipt_profiles', 'template_compiler',
+                'receipt_layout', 'weasyprint_renderer', 'converter_selector')
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter; returns (seconds, [(self_us, cumulative_us, depth, name)])"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    total_us = next((cumulative for _, cumulative, depth, name in entries if name == module), 0)
+    return total_us / 1e6, entries
+
+
+def write_report(module, entries, report_dir, top=30):
+    """Write the slowest imports (by cumulative time) to importtime_<module>.txt"""
+    path = os.path.join(report_dir, f'importtime_{module}.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"Import time report for {module} (-X importtime, microseconds)\n")
+        f.write(f"{'cumulative':>12} {'self':>10}  module\n")
+        for self_us, cumulative_us, depth, name in sorted(entries, key=lambda e: -e[1])[:top]:
+            f.write(f"{cumulative_us:>12} {self_us:>10}  {'  ' * depth}{name}\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='imports per entry point (median is used)')
+    parser.add_argument('--report-dir', default=APP_DIR, help='where to write the importtime reports')
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help='override the budget of an entry point')
+    args = parser.parse_args()
+
+    budgets = dict(STARTUP_BUDGETS_MS)
+    for override in args.budget:
+        module, ms = override.split('=', 1)
+        budgets[module] = int(ms)
+
+    print(f"\n{'='*60}")
+    print(f"Start-up Benchmark ({args.runs} runs per entry point)")
+    print(f"{'='*60}")
+
+    failures = []
+    for module, budget_ms in budgets.items():
+        try:
+            runs = [measure_import(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            if 'ModuleNotFoundError' in str(e):
+                # A dependency isn't installed on this machine - nothing to measure
+                print(f"[SKIP] {module}: {str(e)}")
+            else:
+                print(f"[FAIL] {module}: {str(e)}")
+                failures.append(module)
+            continue
+
+        median_ms = statistics.median(seconds for seconds, _ in runs) * 1000
+        entries = runs[-1][1]
+        report_path = write_report(module, entries, args.report_dir)
+
+        loaded = {name.split('.')[0] for _, _, _, name in entries} | {name for _, _, _, name in entries}
+        eager = [name for name in LAZY_MODULES if name in loaded and name != module]
+
+        status = 'OK' if median_ms <= budget_ms and not eager else 'FAIL'
+        print(f"[{status}] {module}: {median_ms:.0f}ms (budget {budget_ms}ms) - report: {report_path}")
+        if eager:
+            print(f"       loaded at start-up but should be lazy: {', '.join(eager)}")
+        if status == 'FAIL':
+            failures.append(module)
+
+    print(f"{'='*60}\n")
+    if failures:
+        print(f"[ERROR] Start-up budget exceeded: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Receipt Template Benchmark Script
+Renders receipts that differ only in their texts through _convert_receipt_html_to_pdf, with and
+without compiled receipt templates, and reports layout and total time per receipt
+
+Usage: python benchmark_templates.py [--receipts N] [--html FILE]
+"""
+import argparse
+import logging
+import os
+import re
+import time
+
+os.environ['RENDER_CACHE_ENABLED'] = 'false'  # Every receipt has to be rendered
+os.environ['RENDER_WORKERS'] = '0'
+
+from printer_handler import PrinterHandler
+from receipt_layout import WARM_UP_RECEIPT_HTML
+from template_compiler import ReceiptTemplates
+
+
+def receipt_variant(html_content, number):
+    """The same receipt with other numbers in its item rows (same structure, other texts)"""
+    def renumber(match):
+        return re.sub(r'>([^<]*)<', lambda text: '>' + re.sub(r'\d+', str(number), text.group(1)) + '<', match.group(0))
+    return re.sub(r'<tbody>.*?</tbody>', renumber, html_content, flags=re.S)
+
+
+def measure(handler, html_content, receipts, offset):
+    """Median layout and total (layout + PDF) milliseconds per receipt"""
+    layout_times, total_times = [], []
+    for number in range(offset, offset + receipts):
+        html = receipt_variant(html_content, number)
+        start = time.perf_counter()
+        handler.get_receipt_display_list(html)
+        layout_times.append(time.perf_counter() - start)
+
+        handler.display_list_cache = type(handler.display_list_cache)()  # Lay out again below
+        start = time.perf_counter()
+        handler._convert_receipt_html_to_pdf(html)
+        total_times.append(time.perf_counter() - start)
+    median = lambda values: sorted(values)[len(values) // 2] * 1000
+    return median(layout_times), median(total_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--receipts', type=int, default=200, help='receipts per run')
+    parser.add_argument('--html', help='receipt HTML file (default: the built-in warm-up receipt)')
+    args = parser.parse_args()
+
+    html_content = WARM_UP_RECEIPT_HTML
+    if args.html:
+        with open(args.html, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+
+    logging.disable(logging.INFO)
+    handler = PrinterHandler()
+    handler.load_render_stack()  # Creates the caches replaced below
+
+    print(f"\n{'='*60}")
+    print(f"Receipt Template Benchmark ({args.receipts} receipts per run)")
+    print(f"{'='*60}")
+
+    results = {}
+    for name, templates in (('layout', None), ('template', ReceiptTemplates())):
+        handler.receipt_templates = templates
+        handler.display_list_cache = type(handler.display_list_cache)()
+        measure(handler, html_content, 5, 0)  # Warm up (imports, first compile)
+        results[name] = measure(handler, html_content, args.receipts, 1000)
+        layout_ms, total_ms = results[name]
+        print(f"{name:>10}: layout {layout_ms:.2f}ms, _convert_receipt_html_to_pdf {total_ms:.2f}ms per receipt")
+        if templates is not None:
+            print(f"{'':>10}  {templates.compiled} compiled, {templates.hits} receipts from a template")
+
+    print(f"{'speed-up':>10}: layout {results['layout'][0] / results['template'][0]:.1f}x, "
+          f"total {results['layout'][1] / results['template'][1]:.1f}x")
+    print(f"{'='*60}\n")
+
+
+if __name__ == '__main__':
+    main()
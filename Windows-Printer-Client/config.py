@@ -2,6 +2,7 @@
 Configuration file for Windows Printer Client
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -22,11 +23,64 @@ class Config:
     DEFAULT_PRINTER = os.getenv('DEFAULT_PRINTER', None)  # None = use system default
 
     # PDF Converter Configuration
-    PDF_CONVERTER = os.getenv('PDF_CONVERTER', 'reportlab')  # Options: 'reportlab', 'weasyprint', 'sumatrapdf', 'wkhtmltopdf'
+    PDF_CONVERTER = os.getenv('PDF_CONVERTER', 'reportlab')  # Options: 'reportlab', 'weasyprint', 'sumatrapdf', 'wkhtmltopdf', 'auto'
+
+    # Automatic converter selection ('auto'): lowest acceptable quality (1 = basic ReportLab,
+    # 2 = table receipt renderer, 3 = full CSS engines), failures before a converter is
+    # skipped, and seconds before it is probed again
+    PDF_QUALITY_TIER = int(os.getenv('PDF_QUALITY_TIER', '2'))
+    CONVERTER_FAILURE_THRESHOLD = int(os.getenv('CONVERTER_FAILURE_THRESHOLD', '3'))
+    CONVERTER_BREAKER_COOLDOWN = int(os.getenv('CONVERTER_BREAKER_COOLDOWN', '60'))
 
     # Font Size Configuration (for ReportLab renderer)
     FONT_SCALE = float(os.getenv('FONT_SCALE', '0.8'))  # 0.8 = 20% smaller, 1.0 = normal, 1.2 = 20% larger
 
+    # wkhtmltopdf workers (pre-started processes) and per-job timeout in seconds
+    WKHTMLTOPDF_WORKERS = int(os.getenv('WKHTMLTOPDF_WORKERS', '2'))
+    WKHTMLTOPDF_TIMEOUT = int(os.getenv('WKHTMLTOPDF_TIMEOUT', '30'))
+
+    # SumatraPDF print timeout in seconds per run - a hung print run is killed and its jobs fail
+    SUMATRA_TIMEOUT = int(os.getenv('SUMATRA_TIMEOUT', '60'))
+
+    # Receipt render processes (0 = render in the client process), per-job deadline in seconds
+    # and the memory ceiling (MB) after which a worker is restarted
+    RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '0'))
+    RENDER_TIMEOUT = int(os.getenv('RENDER_TIMEOUT', '30'))
+    RENDER_WORKER_MEMORY_MB = int(os.getenv('RENDER_WORKER_MEMORY_MB', '300'))
+
+    # Compile a render function per receipt structure, used for later receipts with the same structure
+    TEMPLATE_COMPILER_ENABLED = os.getenv('TEMPLATE_COMPILER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    # Warm up the render stack (imports, fonts, converters) in the background after connecting
+    WARM_UP_ENABLED = os.getenv('WARM_UP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    # Time-to-live (seconds) of jobs per lane - the job's "lane" field, else its type - e.g.
+    # "kitchen=600,html=1800"; jobs past it are answered as expired instead of printed
+    JOB_LANE_TTLS = os.getenv('JOB_LANE_TTLS', '')
+
+    # Longest page (mm) a receipt may use before it is split - overridable per printer with "max_length_mm"
+    MAX_PAGE_LENGTH_MM = float(os.getenv('MAX_PAGE_LENGTH_MM', '3000'))
+
+    # Documents with at least this many table rows are rendered incrementally and streamed to the
+    # printer page by page (0 = always render the whole document first)
+    STREAM_RENDER_MIN_ROWS = int(os.getenv('STREAM_RENDER_MIN_ROWS', '1000'))
+
+    # Render Cache Configuration (reprints and retries reuse rendered output)
+    RENDER_CACHE_ENABLED = os.getenv('RENDER_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RENDER_CACHE_DIR = os.getenv('RENDER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'PrintClientPro', 'render_cache'))
+    RENDER_CACHE_MAX_MB = int(os.getenv('RENDER_CACHE_MAX_MB', '50'))
+
+    # Scratch directory for print methods that need a file path (SumatraPDF, ShellExecute)
+    SCRATCH_DIR = os.getenv('SCRATCH_DIR', os.path.join(tempfile.gettempdir(), 'PrintClientPro', 'scratch'))
+    # Seconds a scratch file is kept when the spooler doesn't confirm it has the job
+    SCRATCH_GRACE_SECONDS = float(os.getenv('SCRATCH_GRACE_SECONDS', '30'))
+
+    # Printer profiles (per-printer settings edited from the GUI)
+    PRINTER_SETTINGS_FILE = os.getenv('PRINTER_SETTINGS_FILE', 'printer_settings.json')
+
+    # Seconds between checks of .env and printer_settings.json for changes
+    CONFIG_WATCH_INTERVAL = float(os.getenv('CONFIG_WATCH_INTERVAL', '2'))
+
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'printer_client.log')
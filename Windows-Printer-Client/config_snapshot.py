@@ -0,0 +1,146 @@
+"""
+Config Snapshot Module
+Immutable snapshot of the render settings (.env) and printer profiles (printer_settings.json),
+swapped atomically by a file watcher so print jobs never re-read or parse files themselves
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigSnapshot(namedtuple('ConfigSnapshot', 'version pdf_converter font_scale printer_settings loaded_at')):
+    """One version of the configuration; never modified after it is created
+
+    printer_settings is read-only (mappings are MappingProxyType, lists are tuples), so the
+    jobs pinned to a snapshot can share it without one of them changing it for the others.
+    """
+
+    __slots__ = ()
+
+
+def freeze(value):
+    """Read-only copy of parsed JSON: dicts become MappingProxyType, lists become tuples"""
+    if isinstance(value, (dict, types.MappingProxyType)):
+        return types.MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def default_env_path():
+    """The .env the GUI saves to: next to the exe when frozen, else next to the sources"""
+    if getattr(sys, 'frozen', False):
+        app_dir = os.path.dirname(sys.executable)
+    else:
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+    env_path = os.path.join(app_dir, '.env')
+    return env_path if os.path.exists(env_path) else os.path.abspath('.env')
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class ConfigStore:
+    """Holds the current ConfigSnapshot and replaces it when the files change
+
+    Readers take self.current (a single reference read, so always a complete snapshot);
+    the watcher thread builds a new snapshot and swaps the reference.
+    """
+
+    def __init__(self, env_path=None, printer_settings_path='printer_settings.json', interval=2.0):
+        self.env_path = env_path or default_env_path()
+        self.printer_settings_path = printer_settings_path
+        self.interval = interval
+        self._lock = threading.Lock()  # Serializes reloads, not reads
+        self._stamps = (None, None)
+        self._bad_settings_stamp = None
+        self._watch_thread = None
+        self._stop = threading.Event()
+        self.current = ConfigSnapshot(0, 'reportlab', 0.8, freeze({}), time.time())
+        self.reload()
+
+    def _read_env(self):
+        """Environment with the .env file on top (what load_dotenv(override=True) used to give)"""
+        from dotenv import dotenv_values
+
+        values = dict(os.environ)
+        if os.path.exists(self.env_path):
+            values.update({key: value for key, value in dotenv_values(self.env_path).items() if value is not None})
+        return values
+
+    def _read_printer_settings(self, stamp):
+        """Parsed printer_settings.json, or None if it can't be read right now"""
+        if not os.path.exists(self.printer_settings_path):
+            return {}
+        try:
+            with open(self.printer_settings_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            # Caught mid-write or broken - keep the last good profiles, the next check retries
+            if stamp != self._bad_settings_stamp:
+                logger.warning(f"Could not load printer settings, keeping previous: {str(e)}")
+                self._bad_settings_stamp = stamp
+            return None
+
+    def reload(self, printer_settings=None):
+        """Build a new snapshot from the files (or from given printer settings) and swap it in"""
+        with self._lock:
+            stamps = (_file_stamp(self.env_path), _file_stamp(self.printer_settings_path))
+            env = self._read_env()
+
+            pdf_converter = env.get('PDF_CONVERTER', 'reportlab').lower()
+            try:
+                font_scale = float(env.get('FONT_SCALE', '0.8'))
+            except ValueError:
+                font_scale = 0.8
+
+            if printer_settings is not None:
+                settings = freeze(printer_settings)
+            else:
+                settings = self._read_printer_settings(stamps[1])
+                if settings is not None:
+                    settings = freeze(settings)
+                else:
+                    settings = self.current.printer_settings
+                    stamps = (stamps[0], self._stamps[1])  # Retry the profiles on the next check
+                    if stamps == self._stamps:
+                        return self.current  # Nothing else changed
+
+            previous = self.current
+            self.current = ConfigSnapshot(previous.version + 1, pdf_converter, font_scale, settings, time.time())
+            self._stamps = stamps
+
+        if previous.version:
+            logger.info(f"⚙️ Config reloaded (v{self.current.version}): converter={pdf_converter}, "
+                        f"font scale={font_scale}, {len(settings)} printer profiles")
+        return self.current
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            stamps = (_file_stamp(self.env_path), _file_stamp(self.printer_settings_path))
+            if stamps != self._stamps:
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.warning(f"Config reload failed: {str(e)}")
+
+    def start_watching(self):
+        """Check the files for changes every interval seconds in a background thread"""
+        if self._watch_thread is None:
+            self._watch_thread = threading.Thread(target=self._watch, name='config-watcher', daemon=True)
+            self._watch_thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
@@ -0,0 +1,185 @@
+"""
+Converter Selector Module
+Chooses the HTML to PDF converter per document kind from measured latency and failure rate,
+with a quality tier floor and a circuit breaker that is probed again in the background
+"""
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds (the last bucket is open-ended)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with interpolated quantiles"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimated latency at quantile q (None if nothing was observed)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= target:
+                low = self.bounds[index - 1] if index > 0 else 0.0
+                high = self.bounds[index] if index < len(self.bounds) else self.bounds[-1] * 2
+                return low + (high - low) * (target - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1] * 2
+
+
+class ConverterStats:
+    """Latency histogram, failure rate and circuit breaker state of one converter for one kind"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.attempts = 0
+        self.failures = 0
+        self.recent_failure_rate = 0.0  # Exponentially weighted, follows recent behaviour
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # Circuit breaker open (converter skipped) until this monotonic time
+        self.probing = False
+
+    def to_dict(self):
+        return {
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'failure_rate': round(self.recent_failure_rate, 3),
+            'p50_ms': None if self.latency.quantile(0.5) is None else round(self.latency.quantile(0.5) * 1000),
+            'p90_ms': None if self.latency.quantile(0.9) is None else round(self.latency.quantile(0.9) * 1000),
+            'open': self.open_until > time.monotonic(),
+        }
+
+
+class ConverterSelector:
+    """Ranks converters per document kind and keeps their statistics
+
+    converters maps a converter name to (quality, expected_seconds, kinds): its quality tier
+    (higher = better CSS fidelity), a prior latency used until it has been measured, and the
+    document kinds it can handle. probe(name, kind) renders a small test document and is
+    called from a background thread once a tripped breaker has cooled down.
+    """
+
+    FAILURE_WEIGHT = 0.3
+
+    def __init__(self, converters, quality_tier=1, failure_threshold=3, cooldown=60, probe=None):
+        self.converters = converters
+        self.quality_tier = quality_tier
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe = probe
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, name, kind):
+        key = (name, kind)
+        if key not in self._stats:
+            self._stats[key] = ConverterStats()
+        return self._stats[key]
+
+    def _expected_cost(self, name, kind):
+        """Median latency inflated by the recent failure rate (a failed attempt costs a fallback)"""
+        stats = self._get_stats(name, kind)
+        latency = stats.latency.quantile(0.5)
+        if latency is None:
+            latency = self.converters[name][1]
+        return latency / max(0.05, 1.0 - stats.recent_failure_rate)
+
+    def plan(self, kind):
+        """Converters to try for a document kind, best first, as (name, reason) pairs
+
+        Converters that meet the quality tier come first; converters below it follow, and
+        converters with an open breaker are only listed last, in case nothing else works.
+        """
+        now = time.monotonic()
+        with self._lock:
+            eligible = [name for name, (_, _, kinds) in self.converters.items() if kind in kinds]
+            ranked = sorted(eligible, key=lambda name: self._expected_cost(name, kind))
+
+            closed, tripped, below_tier = [], [], []
+            for name in ranked:
+                if self.converters[name][0] < self.quality_tier:
+                    below_tier.append(name)
+                elif self._get_stats(name, kind).open_until > now:
+                    tripped.append(name)
+                else:
+                    closed.append(name)
+
+            plan = []
+            for name in closed:
+                stats = self._get_stats(name, kind)
+                p50 = stats.latency.quantile(0.5)
+                measured = f"p50 {p50 * 1000:.0f}ms" if p50 is not None else "not measured yet"
+                rank = "fastest" if not plan else "next fastest"
+                plan.append((name, f"{rank} meeting quality tier {self.quality_tier} "
+                                   f"({measured}, failure rate {stats.recent_failure_rate:.0%})"))
+            plan += [(name, f"below quality tier {self.quality_tier}, best available") for name in below_tier]
+            plan += [(name, "breaker open, last resort") for name in tripped]
+            return plan
+
+    def is_open(self, name, kind):
+        """Whether the circuit breaker of a converter is open for a document kind"""
+        with self._lock:
+            return self._get_stats(name, kind).open_until > time.monotonic()
+
+    def record_success(self, name, kind, seconds):
+        with self._lock:
+            stats = self._get_stats(name, kind)
+            stats.attempts += 1
+            stats.latency.observe(seconds)
+            stats.recent_failure_rate *= 1.0 - self.FAILURE_WEIGHT
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+
+    def record_failure(self, name, kind, error=None):
+        with self._lock:
+            stats = self._get_stats(name, kind)
+            stats.attempts += 1
+            stats.failures += 1
+            stats.recent_failure_rate += (1.0 - stats.recent_failure_rate) * self.FAILURE_WEIGHT
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures < self.failure_threshold:
+                return
+            stats.open_until = time.monotonic() + self.cooldown
+            start_probe = self.probe is not None and not stats.probing
+            stats.probing = stats.probing or start_probe
+        logger.warning(f"🔌 Circuit breaker open for {name} ({kind}) after {stats.consecutive_failures} failures: {error}")
+        if start_probe:
+            threading.Thread(target=self._probe_loop, args=(name, kind), name=f'probe-{name}', daemon=True).start()
+
+    def _probe_loop(self, name, kind):
+        """Probe a tripped converter after each cooldown until it works again"""
+        stats = self._get_stats(name, kind)
+        while True:
+            time.sleep(self.cooldown)
+            start = time.perf_counter()
+            try:
+                self.probe(name, kind)
+            except Exception as e:
+                with self._lock:
+                    stats.open_until = time.monotonic() + self.cooldown
+                logger.info(f"🔌 Probe of {name} ({kind}) failed, breaker stays open: {e}")
+                continue
+            self.record_success(name, kind, time.perf_counter() - start)
+            with self._lock:
+                stats.probing = False
+            logger.info(f"🔌 Probe of {name} ({kind}) succeeded, breaker closed")
+            return
+
+    def stats(self):
+        """Statistics per converter and document kind"""
+        with self._lock:
+            return {f"{name}/{kind}": stats.to_dict() for (name, kind), stats in self._stats.items()}
@@ -0,0 +1,459 @@
+"""
+Display List Module
+Layout-once intermediate representation of a receipt (positioned text runs, rules, cell boxes
+and QR blocks) plus the painters that replay it onto PDF, GDI printer DCs and preview images
+"""
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Coordinates are in points. x runs from the left paper edge; y is measured from the top of the
+# content in ReportLab orientation, so it is 0 at the top and negative further down the receipt.
+
+
+class TextRun:
+    """A single line of text; x is the anchor for the alignment (left edge, centre or right edge)"""
+
+    __slots__ = ('x', 'y', 'text', 'font', 'size', 'align')
+    kind = 'text'
+
+    def __init__(self, x, y, text, font, size, align='left'):
+        self.x = x
+        self.y = y
+        self.text = text
+        self.font = font
+        self.size = size
+        self.align = align
+
+    def shifted(self, dy):
+        return TextRun(self.x, self.y + dy, self.text, self.font, self.size, self.align)
+
+    @property
+    def bold(self):
+        return self.font.endswith('-Bold')
+
+    @property
+    def left(self):
+        """x of the left edge of the run"""
+        if self.align == 'left':
+            return self.x
+        from text_wrap import text_width
+        run_width = text_width(self.text, self.font, self.size)
+        return self.x - run_width / 2 if self.align == 'center' else self.x - run_width
+
+
+class Rule:
+    """A horizontal separator line"""
+
+    __slots__ = ('x1', 'x2', 'y', 'width')
+    kind = 'rule'
+
+    def __init__(self, x1, x2, y, width=0.5):
+        self.x1 = x1
+        self.x2 = x2
+        self.y = y
+        self.width = width
+
+    def shifted(self, dy):
+        return Rule(self.x1, self.x2, self.y + dy, self.width)
+
+
+class CellBox:
+    """A stroked rectangle (tax table cell border); y is the bottom edge"""
+
+    __slots__ = ('x', 'y', 'w', 'h', 'width')
+    kind = 'box'
+
+    def __init__(self, x, y, w, h, width=0.3):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.width = width
+
+    def shifted(self, dy):
+        return CellBox(self.x, self.y + dy, self.w, self.h, self.width)
+
+
+class QrBlock:
+    """A QR code; y is the top edge"""
+
+    __slots__ = ('x', 'y', 'size', 'payload')
+    kind = 'qr'
+
+    def __init__(self, x, y, size, payload):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.payload = payload
+
+    def shifted(self, dy):
+        return QrBlock(self.x, self.y + dy, self.size, self.payload)
+
+
+class Fragment:
+    """A laid-out run of rows that can be placed into other display lists
+
+    Items and row ends are relative to the top of the fragment (y = 0); state is the layout
+    state after the rows, so the layout can continue as if it had laid them out itself.
+    """
+
+    __slots__ = ('items', 'row_ends', 'height', 'state')
+
+    def __init__(self, items, row_ends, height, state):
+        self.items = items
+        self.row_ends = row_ends
+        self.height = height
+        self.state = state
+
+
+class DisplayList:
+    """Positioned drawing items of one document, produced once by the layout pass
+
+    Row ends mark the positions where a painter may start a new page when the
+    document is longer than the output medium allows.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.height = 0  # Content height, set when the layout is finished
+        self.items = []
+        self.row_ends = []  # (number of items so far, y after the row)
+
+    def text(self, x, y, text, font, size, align='left'):
+        self.items.append(TextRun(x, y, text, font, size, align))
+
+    def rule(self, x1, x2, y, width=0.5):
+        self.items.append(Rule(x1, x2, y, width))
+
+    def box(self, x, y, w, h, width=0.3):
+        self.items.append(CellBox(x, y, w, h, width))
+
+    def qr(self, x, y, size, payload):
+        self.items.append(QrBlock(x, y, size, payload))
+
+    def end_row(self, y):
+        """Mark a possible page break position"""
+        self.row_ends.append((len(self.items), y))
+
+    def mark(self):
+        """Current position, to capture what is added after it as a fragment"""
+        return len(self.items), len(self.row_ends)
+
+    def capture(self, mark, y_start, y_end, state=None):
+        """Copy the items and row ends added since mark into a Fragment"""
+        item_start, row_end_start = mark
+        return Fragment(
+            [item.shifted(-y_start) for item in self.items[item_start:]],
+            [(count - item_start, y - y_start) for count, y in self.row_ends[row_end_start:]],
+            y_start - y_end,
+            state,
+        )
+
+    def place(self, fragment, y):
+        """Add a fragment with its top at y; returns the y below it"""
+        base = len(self.items)
+        self.items.extend(item.shifted(y) for item in fragment.items)
+        self.row_ends.extend((base + count, y + row_y) for count, row_y in fragment.row_ends)
+        return y - fragment.height
+
+    def finish(self, y):
+        """Record the final y position of the layout as the content height"""
+        self.height = -y
+        return self
+
+    def paginate(self, page_length, top_margin, bottom_limit, restart_margin):
+        """Split the items into pages
+
+        Yields (items, shift) per page; an item is drawn at page_length - shift + item.y
+        (distance shift - item.y from the page top). A new page is started at a row end
+        whose y would land below bottom_limit, and continues restart_margin below the top.
+        """
+        shift = top_margin
+        start = 0
+        for end, y in self.row_ends:
+            if page_length - shift + y < bottom_limit:
+                yield self.items[start:end], shift
+                start = end
+                shift = restart_margin + y
+        yield self.items[start:], shift
+
+
+class DisplayListCache:
+    """Small in-memory LRU of display lists, so reprints are painted without laying out again"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(html_content, font_scale):
+        from render_cache import normalize_html
+        digest = hashlib.sha256(normalize_html(html_content).encode('utf-8'))
+        digest.update(f"|{font_scale}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            display_list = self._entries.get(key)
+            if display_list is not None:
+                self._entries.move_to_end(key)
+            return display_list
+
+    def put(self, key, display_list):
+        with self._lock:
+            self._entries[key] = display_list
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def marked_copy(display_list, marker, font='Helvetica-Bold', size=10):
+    """A copy of a display list with a centred marker line (e.g. "KOPJE") above the content
+
+    The laid-out items are shifted down, not laid out again; the original list is unchanged.
+    """
+    line_height = size * 1.5
+    marked = DisplayList(display_list.width)
+    marked.text(display_list.width / 2, 0, marker, font, size, 'center')  # Baseline at the top, like the first row
+    marked.end_row(-line_height)
+    y = marked.place(display_list, -line_height)  # A display list has what a fragment has
+    return marked.finish(y)
+
+
+def paint_pdf(display_list, top_margin, bottom_margin, max_length, break_margin, restart_margin):
+    """Paint a display list to PDF bytes (all sizes in points)
+
+    The page is exactly the content height plus margins; pages are split at row ends
+    only when that is longer than max_length.
+    """
+    return paint_pdf_batch([display_list], top_margin, bottom_margin, max_length, break_margin, restart_margin)
+
+
+def _page_height(display_list, top_margin, bottom_margin, max_length, break_margin):
+    """(page height, lowest y a row may end at) of a display list"""
+    height = top_margin + display_list.height + bottom_margin
+    if height <= max_length:
+        return height, float('-inf')
+    logger.info(f"Document is {height / 72 * 25.4:.0f}mm, splitting at printer maximum of {max_length / 72 * 25.4:.0f}mm")
+    return max_length, break_margin
+
+
+def paint_pdf_batch(display_lists, top_margin, bottom_margin, max_length, break_margin, restart_margin):
+    """Paint display lists one after another into one PDF, each starting on a page of its own
+
+    Every document gets pages of its own content height, so a roll printer that cuts after
+    each page cuts between the documents.
+    """
+    from reportlab.pdfgen import canvas
+
+    pdf_buffer = io.BytesIO()
+    page_height, bottom_limit = _page_height(display_lists[0], top_margin, bottom_margin, max_length, break_margin)
+    # Invariant mode keeps output byte-identical for identical input (render cache)
+    # Explicit (width, height) - portrait() would swap a receipt shorter than it is wide
+    c = canvas.Canvas(pdf_buffer, pagesize=(display_lists[0].width, page_height), invariant=1)
+
+    for index, display_list in enumerate(display_lists):
+        if index:
+            c.showPage()
+            page_height, bottom_limit = _page_height(display_list, top_margin, bottom_margin, max_length, break_margin)
+            c.setPageSize((display_list.width, page_height))
+
+        pages = display_list.paginate(page_height, top_margin, bottom_limit, restart_margin)
+        for page_number, (items, shift) in enumerate(pages):
+            if page_number:
+                c.showPage()
+            _paint_items(c, items, page_height - shift)
+
+    c.save()
+    return pdf_buffer.getvalue()
+
+
+def iter_paint_pdf(display_list, top_margin, bottom_margin, max_length, break_margin, restart_margin):
+    """Paint a display list to PDF, yielding the bytes as pages are finished
+
+    A receipt that fits on one page is painted by paint_pdf (identical output). A longer one
+    without QR blocks is paginated the same way, but each page is written out as soon as it
+    is painted (StreamingPdfCanvas) instead of after the whole document.
+    """
+    fits = top_margin + display_list.height + bottom_margin <= max_length
+    if fits or any(item.kind == 'qr' for item in display_list.items):
+        yield paint_pdf(display_list, top_margin, bottom_margin, max_length, break_margin, restart_margin)
+        return
+
+    from stream_render import StreamingPdfCanvas
+
+    page_height, bottom_limit = _page_height(display_list, top_margin, bottom_margin, max_length, break_margin)
+    c = StreamingPdfCanvas((display_list.width, page_height))
+    for page_number, (items, shift) in enumerate(display_list.paginate(page_height, top_margin, bottom_limit, restart_margin)):
+        if page_number:
+            c.showPage()
+            yield c.take()
+        _paint_items(c, items, page_height - shift)
+    c.save()
+    yield c.take()
+    logger.info(f"Receipt streamed as {c.page_count} pages")
+
+
+def _paint_items(c, items, origin):
+    """Draw display list items on a canvas page whose content top is at y = origin"""
+    from qr_codes import draw_qr_code
+
+    current_font = None
+    for item in items:
+        kind = item.kind
+        if kind == 'text':
+            if current_font != (item.font, item.size):
+                current_font = (item.font, item.size)
+                c.setFont(item.font, item.size)
+            if item.align == 'center':
+                c.drawCentredString(item.x, origin + item.y, item.text)
+            elif item.align == 'right':
+                c.drawRightString(item.x, origin + item.y, item.text)
+            else:
+                c.drawString(item.x, origin + item.y, item.text)
+        elif kind == 'rule':
+            c.setLineWidth(item.width)
+            c.line(item.x1, origin + item.y, item.x2, origin + item.y)
+            c.setLineWidth(1)
+        elif kind == 'box':
+            c.setLineWidth(item.width)
+            c.rect(item.x, origin + item.y, item.w, item.h, stroke=1, fill=0)
+        elif kind == 'qr':
+            draw_qr_code(c, item.payload, item.x, origin + item.y, item.size)
+
+
+def paint_gdi(display_list, hdc, dpi, top_margin, page_height):
+    """Paint a display list onto a printer device context (win32ui PyCDC)
+
+    dpi is the device resolution and page_height the printable height in device pixels;
+    the caller owns StartDoc/StartPage and EndPage/EndDoc of the first and last page.
+    """
+    import win32con
+    import win32ui
+    from qr_codes import get_qr_matrix, iter_dark_runs
+
+    scale = dpi / 72.0
+
+    def px(value):
+        return int(round(value * scale))
+
+    fonts = {}
+    pens = {}
+    hdc.SetTextAlign(win32con.TA_BASELINE | win32con.TA_LEFT)
+
+    def select_font(font_name, size):
+        key = (font_name, size)
+        if key not in fonts:
+            fonts[key] = win32ui.CreateFont({
+                "name": "Arial",
+                "height": -px(size),  # Negative height selects by em size, like PDF font sizes
+                "weight": 700 if font_name.endswith('-Bold') else 400,
+            })
+        hdc.SelectObject(fonts[key])
+
+    def select_pen(width):
+        key = max(1, px(width))
+        if key not in pens:
+            pens[key] = win32ui.CreatePen(win32con.PS_SOLID, key, 0)
+        hdc.SelectObject(pens[key])
+
+    def line(x1, y1, x2, y2):
+        hdc.MoveTo((x1, y1))
+        hdc.LineTo((x2, y2))
+
+    pages = display_list.paginate(page_height / scale, top_margin, 20 * 72 / 25.4, 10 * 72 / 25.4)
+    for page_number, (items, shift) in enumerate(pages):
+        if page_number:
+            hdc.EndPage()
+            hdc.StartPage()
+            hdc.SetTextAlign(win32con.TA_BASELINE | win32con.TA_LEFT)
+
+        def dev_y(y):
+            return px(shift - y)  # Device y grows downwards from the page top
+
+        for item in items:
+            kind = item.kind
+            if kind == 'text':
+                select_font(item.font, item.size)
+                hdc.TextOut(px(item.left), dev_y(item.y), item.text)
+            elif kind == 'rule':
+                select_pen(item.width)
+                line(px(item.x1), dev_y(item.y), px(item.x2), dev_y(item.y))
+            elif kind == 'box':
+                select_pen(item.width)
+                left, right = px(item.x), px(item.x + item.w)
+                top, bottom = dev_y(item.y + item.h), dev_y(item.y)
+                line(left, top, right, top)
+                line(right, top, right, bottom)
+                line(right, bottom, left, bottom)
+                line(left, bottom, left, top)
+            elif kind == 'qr':
+                matrix = get_qr_matrix(item.payload)
+                module = item.size / len(matrix)
+                top = shift - item.y
+                for row, start, length in iter_dark_runs(matrix):
+                    hdc.FillSolidRect((
+                        px(item.x + start * module), px(top + row * module),
+                        px(item.x + (start + length) * module), px(top + (row + 1) * module)
+                    ), 0)
+
+
+def paint_image(display_list, dpi=96, top_margin=0, bottom_margin=0):
+    """Paint a display list onto a white PIL image (used for on-screen previews)"""
+    from PIL import Image, ImageDraw, ImageFont
+    from qr_codes import get_qr_matrix, iter_dark_runs
+
+    scale = dpi / 72.0
+
+    def px(value):
+        return int(round(value * scale))
+
+    height = top_margin + display_list.height + bottom_margin
+    image = Image.new('L', (max(1, px(display_list.width)), max(1, px(height))), 255)
+    draw = ImageDraw.Draw(image)
+
+    fonts = {}
+
+    def get_font(font_name, size):
+        key = (font_name, size)
+        if key not in fonts:
+            candidates = ['arialbd.ttf', 'DejaVuSans-Bold.ttf'] if font_name.endswith('-Bold') else ['arial.ttf', 'DejaVuSans.ttf']
+            fonts[key] = None
+            for candidate in candidates:
+                try:
+                    fonts[key] = ImageFont.truetype(candidate, max(1, px(size)))
+                    break
+                except Exception:
+                    continue
+            if fonts[key] is None:
+                fonts[key] = ImageFont.load_default()
+        return fonts[key]
+
+    for item in display_list.items:
+        kind = item.kind
+        if kind == 'text':
+            draw.text((px(item.left), px(top_margin - item.y)), item.text, fill=0,
+                      font=get_font(item.font, item.size), anchor='ls')
+        elif kind == 'rule':
+            y = px(top_margin - item.y)
+            draw.line((px(item.x1), y, px(item.x2), y), fill=0, width=max(1, px(item.width)))
+        elif kind == 'box':
+            draw.rectangle((px(item.x), px(top_margin - item.y - item.h),
+                            px(item.x + item.w), px(top_margin - item.y)),
+                           outline=0, width=max(1, px(item.width)))
+        elif kind == 'qr':
+            matrix = get_qr_matrix(item.payload)
+            module = item.size / len(matrix)
+            top = top_margin - item.y
+            for row, start, length in iter_dark_runs(matrix):
+                draw.rectangle((px(item.x + start * module), px(top + row * module),
+                                px(item.x + (start + length) * module) - 1, px(top + (row + 1) * module) - 1),
+                               fill=0)
+
+    return image
@@ -0,0 +1,266 @@
+"""
+ESC/POS Backend Module
+Paints receipt display lists as native ESC/POS commands for thermal printers (sent as RAW jobs)
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INIT = ESC + b'@'
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+PARTIAL_CUT = GS + b'V\x01'
+
+# Python codec -> ESC t code page number (Epson numbering)
+CODEPAGES = {
+    'cp437': 0,
+    'cp850': 2,
+    'cp1252': 16,
+    'cp858': 19,  # cp850 with the euro sign - covers Albanian ë and ç
+}
+
+
+def select_codepage(codec):
+    return ESC + b't' + bytes([CODEPAGES[codec]])
+
+
+def set_bold(on):
+    return ESC + b'E' + (b'\x01' if on else b'\x00')
+
+
+def set_double_height(on):
+    return GS + b'!' + (b'\x01' if on else b'\x00')
+
+
+def feed_lines(count):
+    return ESC + b'd' + bytes([max(0, min(255, count))])
+
+
+def qr_code_commands(payload, module_size=6):
+    """GS ( k commands that store and print a QR code (model 2, error correction L)"""
+    data = payload.encode('utf-8')
+    store_length = len(data) + 3
+
+    def function(body):
+        return GS + b'(k' + len(body).to_bytes(2, 'little') + body
+
+    return b''.join([
+        function(b'1A2\x00'),                            # Model 2
+        function(b'1C' + bytes([module_size])),          # Module size in dots
+        function(b'1E0'),                                # Error correction L
+        GS + b'(k' + store_length.to_bytes(2, 'little') + b'1P0' + data,  # Store the data
+        function(b'1Q0'),                                # Print the symbol
+    ])
+
+
+def _group_lines(display_list):
+    """Group display list items into printed lines, top to bottom
+
+    Text runs that share a baseline become one line (two- and four-column rows, tax table
+    cells); consecutive rules collapse into one separator; cell boxes are not drawn in text mode.
+    """
+    lines = []
+    for item in display_list.items:
+        kind = item.kind
+        if kind == 'text':
+            if lines and lines[-1][0] == 'text' and abs(lines[-1][1] - item.y) < 0.5:
+                lines[-1][2].append(item)
+            else:
+                lines.append(('text', item.y, [item]))
+        elif kind == 'rule':
+            if not lines or lines[-1][0] != 'rule':
+                lines.append(('rule', item.y, None))
+        elif kind == 'qr':
+            lines.append(('qr', item.y, item))
+    return lines
+
+
+def _place_runs(runs, columns, char_width, x_offset):
+    """Map text runs to (start column, run), keeping their order and at least one space between them"""
+    placed = []
+    cursor = 0
+    for run in runs:
+        text_length = len(run.text)
+        column = (run.x - x_offset) / char_width
+        if run.align == 'center':
+            start = int(round(column - text_length / 2))
+        elif run.align == 'right':
+            start = int(round(column)) - text_length
+        else:
+            start = int(round(column))
+
+        # Keep centred/right-aligned text on the paper, but never overlap the previous run
+        start = min(start, columns - text_length)
+        start = max(start, cursor + 1 if placed else 0, 0)
+        placed.append([start, run])
+        cursor = start + text_length
+
+    # A line that runs past the paper edge is pulled back, closing gaps from the right
+    limit = columns
+    for entry in reversed(placed):
+        entry[0] = max(0, min(entry[0], limit - len(entry[1].text)))
+        limit = entry[0] - 1
+    return placed
+
+
+def paint_escpos_text(display_list, columns=48, print_width_mm=72, codepage='cp858', cut=True,
+                      dpi=203):
+    """Paint a display list as ESC/POS text-mode commands
+
+    Columns are mapped from the layout positions onto the printer's character grid
+    (48 columns of Font A on 72mm printable width for 80mm paper). Bold runs use
+    emphasized mode, large runs double height, and QR blocks the printer's own QR encoder.
+    """
+    from reportlab.lib.units import mm
+
+    char_width = print_width_mm * mm / columns
+    x_offset = (display_list.width - print_width_mm * mm) / 2
+    codec = codepage if codepage in CODEPAGES else 'cp858'
+
+    out = [INIT, select_codepage(codec), ALIGN_LEFT]
+    bold = False
+    tall = False
+
+    for kind, _, payload in _group_lines(display_list):
+        if kind == 'rule':
+            if bold or tall:
+                out.append(set_bold(False) + set_double_height(False))
+                bold = tall = False
+            out.append(b'-' * columns + b'\n')
+        elif kind == 'qr':
+            from qr_codes import get_qr_matrix
+            modules = len(get_qr_matrix(payload.payload)) - 2  # Matrix includes a 1-module border
+            module_size = max(1, min(16, int(payload.size / 72 * dpi / modules)))
+            out.append(ALIGN_CENTER + qr_code_commands(payload.payload, module_size) + ALIGN_LEFT)
+        else:
+            cursor = 0
+            for start, run in _place_runs(payload, columns, char_width, x_offset):
+                if start > cursor:
+                    out.append(b' ' * (start - cursor))
+                if run.bold != bold:
+                    bold = run.bold
+                    out.append(set_bold(bold))
+                if (run.size >= 10) != tall:
+                    tall = run.size >= 10
+                    out.append(set_double_height(tall))
+                out.append(run.text.encode(codec, errors='replace'))
+                cursor = start + len(run.text)
+            out.append(b'\n')
+
+    out.append(set_bold(False) + set_double_height(False))
+    if cut:
+        out.append(feed_lines(4) + PARTIAL_CUT)
+
+    data = b''.join(out)
+    logger.info(f"ESC/POS receipt painted ({len(display_list.items)} items, {len(data)} bytes)")
+    return data
+
+
+def feed_dots(count):
+    """ESC J feeds, count dots in total"""
+    out = []
+    while count > 0:
+        step = min(255, count)
+        out.append(ESC + b'J' + bytes([step]))
+        count -= step
+    return b''.join(out)
+
+
+def raster_band(packed):
+    """GS v 0 command for a band of packed 1-bpp rows (numpy uint8 array, rows x bytes)"""
+    rows, width_bytes = packed.shape
+    return (GS + b'v0\x00' + width_bytes.to_bytes(2, 'little') + rows.to_bytes(2, 'little')
+            + packed.tobytes())
+
+
+def _dither_rows(work, start, stop):
+    """Floyd-Steinberg dither rows start..stop of a padded float image in place
+
+    Pixel (y, x) only depends on pixels with a smaller 2*y + x, so each such anti-diagonal
+    is quantized in one vectorized step. The image has one padding column on each side
+    and one padding row at the bottom that absorb error pushed off the edges.
+    """
+    import numpy as np
+
+    width = work.shape[1] - 2
+    rows = stop - start
+    for wave in range(2 * (rows - 1) + width):
+        y_first = max(0, (wave - width + 2) // 2)
+        y_last = min(rows - 1, wave // 2)
+        if y_first > y_last:
+            continue
+        ys = np.arange(y_first, y_last + 1)
+        xs = wave - 2 * ys + 1  # +1 for the left padding column
+        ys += start
+
+        old = work[ys, xs]
+        new = np.where(old < 128, 0.0, 255.0)
+        error = old - new
+        work[ys, xs] = new
+        # One statement per direction - targets never repeat within a direction
+        work[ys, xs + 1] += error * (7 / 16)
+        work[ys + 1, xs - 1] += error * (3 / 16)
+        work[ys + 1, xs] += error * (5 / 16)
+        work[ys + 1, xs + 1] += error * (1 / 16)
+
+
+def iter_escpos_raster(image, band_height=96, dither=False, threshold=128, cut=True):
+    """Yield ESC/POS raster commands for a grayscale PIL image, one band at a time
+
+    Bands are thresholded (or Floyd-Steinberg dithered) and packed to 1 bpp with NumPy as
+    they are produced, so the spooler can start on the first band while the rest is still
+    being converted. Bands without dark pixels become paper feeds.
+    """
+    import numpy as np
+
+    gray = np.asarray(image.convert('L'), dtype=np.float32)
+    height, width = gray.shape
+    width_bytes = (width + 7) // 8
+
+    if dither:
+        work = np.full((height + 1, width + 2), 255.0, dtype=np.float32)
+        work[:height, 1:width + 1] = gray
+
+    yield INIT
+
+    pending_feed = 0
+    for start in range(0, height, band_height):
+        stop = min(height, start + band_height)
+        if dither:
+            _dither_rows(work, start, stop)
+            dark = work[start:stop, 1:width + 1] < 128
+        else:
+            dark = gray[start:stop] < threshold
+
+        if not dark.any():
+            pending_feed += stop - start
+            continue
+
+        if pending_feed:
+            yield feed_dots(pending_feed)
+            pending_feed = 0
+
+        # Pad to whole bytes; packbits is MSB first, which is the GS v 0 bit order
+        if dark.shape[1] != width_bytes * 8:
+            dark = np.pad(dark, ((0, 0), (0, width_bytes * 8 - width)))
+        yield raster_band(np.packbits(dark, axis=1))
+
+    if cut:
+        yield feed_lines(4) + PARTIAL_CUT
+
+
+def iter_escpos_display_list(display_list, print_width_mm=72, dpi=203, **kwargs):
+    """Rasterize a display list at the printer's resolution and yield ESC/POS raster bands
+
+    The 80mm layout is scaled onto the printable width (576 dots at 203 dpi on 80mm paper).
+    """
+    from reportlab.lib.units import mm
+    from display_list import paint_image
+
+    render_dpi = dpi * (print_width_mm * mm) / display_list.width
+    image = paint_image(display_list, dpi=render_dpi, top_margin=5 * mm, bottom_margin=5 * mm)
+    logger.info(f"Rasterized receipt to {image.width}x{image.height} dots")
+    return iter_escpos_raster(image, **kwargs)
@@ -0,0 +1,93 @@
+"""
+Job Coalescer Module
+Collects the jobs that arrive for one printer within a short window and hands them over as one
+batch, so a burst of small tickets becomes a single spooler document
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    __slots__ = ('jobs', 'withdrawn', 'started', 'results', 'full', 'done')
+
+    def __init__(self):
+        self.jobs = []
+        self.withdrawn = set()  # Indexes of jobs that gave up before the batch was flushed
+        self.started = False  # Flushed - its jobs are printing
+        self.results = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class JobCoalescer:
+    """Coalescing window of one printer
+
+    The first job of a burst opens a batch and waits up to window seconds (or until max_jobs
+    have joined), then calls flush(jobs), which returns one result per job. Every caller of
+    submit() gets the result of its own job back, so each job is still reported on its own.
+    A job whose batch hasn't started printing within timeout seconds is withdrawn from it
+    unprinted and reported as failed; once the batch prints, every job waits for its result.
+    """
+
+    def __init__(self, window, max_jobs, flush, timeout=120):
+        self.window = window
+        self.max_jobs = max(1, max_jobs)
+        self.timeout = timeout
+        self._flush = flush
+        self._open = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Batches reach the spooler in arrival order
+        self.batches = 0
+        self.coalesced_jobs = 0
+
+    def submit(self, job):
+        """Add a job to the current batch and wait for its result"""
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            index = len(batch.jobs)
+            batch.jobs.append(job)
+            if len(batch.jobs) >= self.max_jobs:
+                self._open = None
+                batch.full.set()
+
+        if not leader:
+            if not batch.done.wait(self.timeout):
+                with self._lock:
+                    withdrawn = not batch.started
+                    if withdrawn:
+                        batch.withdrawn.add(index)
+                if withdrawn:
+                    logger.warning(f"⚠️ Coalesced batch not printing within {self.timeout}s - job {index + 1} withdrawn unprinted")
+                    return False
+                batch.done.wait()  # Already printing - a resend would print it twice
+            return batch.results[index]
+
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+
+        with self._flush_lock:
+            with self._lock:
+                batch.started = True
+                indexes = [i for i in range(len(batch.jobs)) if i not in batch.withdrawn]
+            jobs = [batch.jobs[i] for i in indexes]
+            try:
+                flushed = list(self._flush(jobs))
+            except Exception as e:
+                logger.error(f"❌ Coalesced batch of {len(jobs)} jobs failed: {str(e)}")
+                flushed = [False] * len(jobs)
+            results = [False] * len(batch.jobs)
+            for i, result in zip(indexes, flushed):
+                results[i] = result
+            batch.results = results
+            self.batches += 1
+            if len(jobs) > 1:
+                self.coalesced_jobs += len(jobs)
+        batch.done.set()
+        return results[index]
@@ -0,0 +1,85 @@
+"""
+Job Deadlines Module
+Deadlines of print jobs - an absolute "deadline" carried on the job and a time-to-live per lane -
+so jobs that waited out a printer outage are answered as expired instead of printed late
+"""
+import logging
+import math
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+EXPIRED = 'expired'  # print_response status of a job that was dropped unprinted
+
+
+class JobExpired(Exception):
+    """The job is past its deadline; it was not rendered or printed"""
+
+
+def parse_time(value):
+    """Epoch seconds from a number or numeric string (seconds or milliseconds) or an ISO 8601 string, else None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)  # Epoch sent as a string, e.g. "1760000000000"
+        except ValueError:
+            pass
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value):
+            return None
+        return value / 1000 if value > 1e11 else float(value)  # JavaScript timestamps are in ms
+    try:
+        # Naive times are local time, like the rest of the client's timestamps
+        return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_lane_ttls(spec):
+    """{lane: seconds} from a setting like "kitchen=600,bar=900" (unreadable entries are skipped)"""
+    ttls = {}
+    for entry in (spec or '').split(','):
+        lane, _, seconds = entry.partition('=')
+        try:
+            ttls[lane.strip()] = float(seconds)
+        except ValueError:
+            continue
+    return ttls
+
+
+def job_deadline(data, ttl=None):
+    """Deadline (epoch seconds) of a job: its "deadline", or creation + ttl, whichever comes first
+
+    The creation time is the job's "created_at" (set by the server) or, failing that, the
+    "received_at" stamp the client puts on the job when it first arrives.
+    """
+    deadlines = []
+    deadline = _parse_field(data, 'deadline')
+    if deadline is not None:
+        deadlines.append(deadline)
+    if ttl:
+        created = _parse_field(data, 'created_at') or data.get('received_at') or time.time()
+        deadlines.append(created + ttl)
+    return min(deadlines) if deadlines else None
+
+
+def _parse_field(data, field):
+    """parse_time of a job field, logging a value that is set but can't be read"""
+    value = data.get(field)
+    parsed = parse_time(value)
+    if parsed is None and value not in (None, ''):
+        logger.warning(f"⚠️ Unreadable {field} {value!r} on job - ignored")
+    return parsed
+
+
+def check_deadline(data, ttl=None, now=None):
+    """Raise JobExpired when a job is past its deadline"""
+    deadline = job_deadline(data, ttl)
+    if deadline is None:
+        return
+    now = time.time() if now is None else now
+    if now > deadline:
+        name = data.get('document_name', data.get('type', 'job'))
+        raise JobExpired(f"'{name}' expired {now - deadline:.0f}s ago")
@@ -4,27 +4,20 @@ Connects to Backend-Socket via WebSocket and handles print requests
 """
 import socketio
 import time
+import multiprocessing
 import json
 import logging
 from datetime import datetime
 from printer_handler import PrinterHandler
+from job_deadlines import EXPIRED, JobExpired
 from config import Config
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('printer_client.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class PrinterClient:
-    def __init__(self):
+    def __init__(self, socket_logging=True):
         self.config = Config()
-        self.sio = socketio.Client(logger=True, engineio_logger=True)
+        self.sio = socketio.Client(logger=socket_logging, engineio_logger=socket_logging)
         self.printer_handler = PrinterHandler()
         self.connected = False
         self.setup_event_handlers()
@@ -37,6 +30,8 @@ class PrinterClient:
             self.connected = True
             logger.info("Successfully connected to Backend-Socket server")
             logger.info(f"Client ID: {self.sio.sid}")
+            # First receipt of the day shouldn't pay for imports and converter start-up
+            self.printer_handler.start_warm_up()
 
         @self.sio.event
         def connect_error(data):
@@ -87,6 +82,14 @@ class PrinterClient:
                     'printer': printer_name
                 })
 
+            except JobExpired as e:
+                self.sio.emit('print_response', {
+                    'status': EXPIRED,
+                    'message': str(e),
+                    'timestamp': datetime.now().isoformat(),
+                    'printer': printer_name
+                })
+
             except Exception as e:
                 logger.error(f"Error processing print request: {str(e)}")
                 self.sio.emit('print_response', {
@@ -168,8 +171,18 @@ class PrinterClient:
 
 def main():
     """Main entry point"""
+    # Setup logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('printer_client.log'),
+            logging.StreamHandler()
+        ]
+    )
     client = PrinterClient()
     client.run()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Render worker processes in the frozen build
     main()
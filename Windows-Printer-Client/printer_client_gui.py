@@ -6,17 +6,19 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import socketio
 import threading
+import multiprocessing
 import json
 import logging
 from datetime import datetime
 from printer_handler import PrinterHandler
+from job_deadlines import EXPIRED, JobExpired
 from config import Config
 import os
 import tempfile
 import webbrowser
 
 class PrinterClientGUI:
-    def __init__(self, root):
+    def __init__(self, root, client=None):
         self.root = root
         self.root.title("Print Client Pro")
         self.root.geometry("1200x800")
@@ -38,8 +40,13 @@ class PrinterClientGUI:
             pass
 
         self.config = Config()
-        self.sio = socketio.Client(logger=False, engineio_logger=False)
-        self.printer_handler = PrinterHandler()
+        if client is not None:
+            # Started from the tray, which connected the socket before the GUI loaded - take it over
+            self.sio = client.sio
+            self.printer_handler = client.printer_handler
+        else:
+            self.sio = socketio.Client(logger=False, engineio_logger=False)
+            self.printer_handler = PrinterHandler()
         self.connected = False
 
         # Load printer settings from config file
@@ -53,8 +60,13 @@ class PrinterClientGUI:
         # Handle window close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-        # Auto-connect on startup (after a short delay to let GUI finish loading)
-        self.root.after(500, self.auto_connect_on_startup)
+        if client is not None:
+            # Our handlers replace the client's; the connection itself is kept (the tray reconnects it)
+            self.connected = self.sio.connected
+            self.update_connection_status(self.connected)
+        else:
+            # Auto-connect on startup, as soon as the window is up (the socket connects in its own thread)
+            self.root.after_idle(self.auto_connect_on_startup)
 
     def setup_gui(self):
         """Setup the GUI layout"""
@@ -225,7 +237,7 @@ class PrinterClientGUI:
 
         # Second row of converters
         pdf_converter_frame2 = tk.Frame(self.config_panel, bg=self.colors['bg_light'])
-        pdf_converter_frame2.pack(fill=tk.X, pady=(0, 10), padx=10)
+        pdf_converter_frame2.pack(fill=tk.X, pady=(0, 3), padx=10)
 
         # WeasyPrint button
         weasyprint_btn = tk.Button(
@@ -257,6 +269,21 @@ class PrinterClientGUI:
         sumatrapdf_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=6)
         self.sumatrapdf_btn = sumatrapdf_btn
 
+        # Automatic selection (fastest converter from measured latency and failures)
+        auto_btn = tk.Button(
+            self.config_panel,
+            text="Auto ⚡",
+            command=lambda: self.select_pdf_converter('auto'),
+            bg=self.colors['accent'] if self.pdf_converter_var.get() == 'auto' else self.colors['bg'],
+            fg=self.colors['text'],
+            font=("Segoe UI", 9),
+            relief=tk.FLAT,
+            cursor="hand2",
+            activebackground=self.colors['accent']
+        )
+        auto_btn.pack(fill=tk.X, pady=(0, 10), padx=10, ipady=6)
+        self.auto_btn = auto_btn
+
         # Save button
         save_btn = tk.Button(self.config_panel, text="💾 Save", command=self.save_config,
                             bg=self.colors['accent'], fg=self.colors['text'], font=("Segoe UI", 10, "bold"),
@@ -620,6 +647,8 @@ class PrinterClientGUI:
             self.connected = True
             self.logger.info("✅ Successfully connected to Backend-Socket server")
             self.update_connection_status(True)
+            # First receipt of the day shouldn't pay for imports and converter start-up
+            self.printer_handler.start_warm_up()
 
         @self.sio.event
         def connect_error(data):
@@ -671,6 +700,15 @@ class PrinterClientGUI:
                     'printer': printer_name
                 })
 
+            except JobExpired as e:
+                self.logger.warning(f"⏰ Print job expired - not printed: {str(e)}")
+                self.sio.emit('print_response', {
+                    'status': EXPIRED,
+                    'message': str(e),
+                    'timestamp': datetime.now().isoformat(),
+                    'printer': printer_name
+                })
+
             except Exception as e:
                 self.logger.error(f"❌ Error processing print: {str(e)}")
                 self.error_count += 1
@@ -771,6 +809,9 @@ class PrinterClientGUI:
         self.sumatrapdf_btn.config(
             bg=self.colors['accent'] if converter == 'sumatrapdf' else self.colors['bg']
         )
+        self.auto_btn.config(
+            bg=self.colors['accent'] if converter == 'auto' else self.colors['bg']
+        )
 
         self.logger.info(f"📄 PDF converter selected: {converter}")
 
@@ -811,9 +852,10 @@ RECONNECT_DELAY=5
 MAX_RECONNECT_ATTEMPTS=0
 """
 
-            # Write to .env file
-            with open(env_path, 'w') as f:
+            # Write to .env file (replaced in one step, so the config watcher never reads half a file)
+            with open(env_path + '.tmp', 'w') as f:
                 f.write(env_content)
+            os.replace(env_path + '.tmp', env_path)
 
             # Reload environment variables
             from dotenv import load_dotenv
@@ -827,6 +869,9 @@ MAX_RECONNECT_ATTEMPTS=0
             self.config.PDF_CONVERTER = self.pdf_converter_var.get()
             self.config.FONT_SCALE = self.font_scale_var.get()
 
+            # New jobs render with the saved settings right away
+            self.printer_handler.reload_config()
+
             self.logger.info(f"💾 Configuration saved to: {env_path}")
             messagebox.showinfo("Success", f"Configuration saved successfully!\n\nFile: {env_path}")
 
@@ -1083,13 +1128,17 @@ MAX_RECONNECT_ATTEMPTS=0
                 self.error_count += 1
                 self.stat_cards['errors'].config(text=str(self.error_count))
 
-            # Update queue size and refresh display
-            queue_size = len(self.printer_handler.get_queue())
-            self.stat_cards['queue'].config(text=str(queue_size))
-            self.refresh_queue_display()
+        except JobExpired as e:
+            self.logger.warning(f"⏰ Queue item {idx} expired - removed: {str(e)}")
 
         except Exception as e:
             self.logger.error(f"❌ Error retrying queue item: {str(e)}")
+            return
+
+        # Update queue size and refresh display
+        queue_size = len(self.printer_handler.get_queue())
+        self.stat_cards['queue'].config(text=str(queue_size))
+        self.refresh_queue_display()
 
     def delete_queue_item(self, idx):
         """Delete a specific queue item"""
@@ -1500,8 +1549,11 @@ MAX_RECONNECT_ATTEMPTS=0
         """Save printer settings to JSON file"""
         settings_file = 'printer_settings.json'
         try:
-            with open(settings_file, 'w', encoding='utf-8') as f:
+            with open(settings_file + '.tmp', 'w', encoding='utf-8') as f:
                 json.dump(self.printer_settings, f, indent=2, ensure_ascii=False)
+            os.replace(settings_file + '.tmp', settings_file)
+            # Keep the handler's printer profiles in sync
+            self.printer_handler.printer_settings = self.printer_settings
             return True
         except Exception as e:
             self.logger.error(f"Error saving printer settings: {str(e)}")
@@ -1554,6 +1606,80 @@ MAX_RECONNECT_ATTEMPTS=0
             self.logger.error(f"❌ Error saving printer settings: {str(e)}")
             messagebox.showerror("Error", f"Could not save settings: {str(e)}")
 
+    def show_receipt_preview(self, item):
+        """Show a table-based HTML receipt painted from its display list; returns False if not a receipt"""
+        data = item.get('data', {})
+        html_content = data.get('html', '') or data.get('content', '')
+        if not html_content:
+            return False
+
+        try:
+            from PIL import ImageTk
+            from display_list import paint_image
+
+            display_list = self.printer_handler.get_receipt_display_list(html_content)
+            if not display_list.items:
+                return False
+            # 96 dpi with 5mm margins, like the printed page
+            image = paint_image(display_list, dpi=96, top_margin=14, bottom_margin=14)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not paint receipt preview: {str(e)}")
+            return False
+
+        doc_name = data.get('document_name', 'Unknown Document')
+        preview_window = tk.Toplevel(self.root)
+        preview_window.title(f"Print Preview - {doc_name}")
+        preview_window.geometry(f"{image.width + 60}x700")
+        preview_window.configure(bg=self.colors['bg'])
+
+        # Action buttons at bottom
+        button_frame = tk.Frame(preview_window, bg=self.colors['bg'])
+        button_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=20, pady=(0, 20))
+
+        tk.Button(
+            button_frame,
+            text="✖️ Close",
+            command=preview_window.destroy,
+            bg=self.colors['bg_light'],
+            fg=self.colors['text'],
+            font=("Segoe UI", 10, "bold"),
+            relief=tk.FLAT,
+            cursor="hand2"
+        ).pack(side=tk.RIGHT, padx=(5, 0), ipady=8, ipadx=15)
+
+        tk.Button(
+            button_frame,
+            text="🌐 Open HTML",
+            command=lambda: self.show_html_in_browser(item),
+            bg=self.colors['bg_light'],
+            fg=self.colors['text'],
+            font=("Segoe UI", 10, "bold"),
+            relief=tk.FLAT,
+            cursor="hand2"
+        ).pack(side=tk.RIGHT, padx=(5, 0), ipady=8, ipadx=15)
+
+        # Scrollable paper
+        content_frame = tk.Frame(preview_window, bg=self.colors['bg'])
+        content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
+
+        scrollbar = tk.Scrollbar(content_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        paper = tk.Canvas(
+            content_frame,
+            bg=self.colors['bg'],
+            highlightthickness=0,
+            yscrollcommand=scrollbar.set,
+            scrollregion=(0, 0, image.width, image.height)
+        )
+        paper.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=paper.yview)
+
+        photo = ImageTk.PhotoImage(image)
+        paper.create_image(0, 0, image=photo, anchor='nw')
+        paper.image = photo  # Keep a reference so Tk does not drop the image
+
+        return True
+
     def show_print_preview(self, item):
         """Show a preview window for the print job"""
         try:
@@ -1563,9 +1689,10 @@ MAX_RECONNECT_ATTEMPTS=0
             printer_name = item.get('printer_name', 'Unknown')
             timestamp = item.get('timestamp', datetime.now())
 
-            # For HTML type, open in browser
+            # For HTML type, show the receipt as it will print (other HTML opens in browser)
             if print_type == 'html':
-                self.show_html_in_browser(item)
+                if not self.show_receipt_preview(item):
+                    self.show_html_in_browser(item)
                 return
 
             # Create preview window for non-HTML types
@@ -1742,4 +1869,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Render worker processes in the frozen build
     main()
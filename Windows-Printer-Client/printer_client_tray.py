@@ -5,19 +5,23 @@ Runs in background with system tray icon
 import pystray
 from PIL import Image, ImageDraw
 import threading
+import multiprocessing
 import sys
 import os
 import time
 
-# Import the main GUI
-from printer_client_gui import PrinterClientGUI
-import tkinter as tk
+# The socket client (socketio, printer handler) is imported and connected by its own thread and
+# the GUI (tkinter) by the GUI thread, so the tray icon is up before the heavy modules load and
+# print requests are taken before the window exists
 
 class PrinterClientTray:
     def __init__(self):
         self.gui_window = None
         self.gui_visible = False
         self.app = None
+        self.client = None  # Socket client, connected before the GUI loads
+        self.client_ready = threading.Event()
+        self.socket_thread = None
         self.is_startup = True  # Track if this is app startup
 
         # Create tray icon
@@ -60,18 +64,32 @@ class PrinterClientTray:
 
         return image
 
+    def start_socket_client(self):
+        """Create the print client and connect its socket (socket thread, before the GUI loads)"""
+        try:
+            from printer_client import PrinterClient
+
+            self.client = PrinterClient(socket_logging=False)
+        finally:
+            self.client_ready.set()  # The GUI builds its own client if this one failed
+        self.client.connect_to_server()
+
     def show_gui(self, icon=None, item=None):
         """Show the GUI window"""
         if not self.gui_window or not self.gui_window.winfo_exists():
-            # Create new window
+            import tkinter as tk
+            from printer_client_gui import PrinterClientGUI
+
+            # Create new window - taking over the socket client when it is ready
             self.gui_window = tk.Tk()
-            self.app = PrinterClientGUI(self.gui_window)
+            self.client_ready.wait()
+            self.app = PrinterClientGUI(self.gui_window, client=self.client)
 
             # Override close button to hide instead of quit
             self.gui_window.protocol("WM_DELETE_WINDOW", self.hide_gui)
 
-            # Auto-connect when window opens
-            if not self.app.connected:
+            # Auto-connect when window opens (unless the socket thread is still connecting)
+            if not self.app.connected and not (self.socket_thread and self.socket_thread.is_alive()):
                 self.gui_window.after(500, self.app.connect_to_server)
 
             # If this is startup, check if we should auto-hide
@@ -127,6 +145,10 @@ class PrinterClientTray:
 
     def run(self):
         """Run the system tray application"""
+        # Connect the socket first, so print requests are handled while the GUI loads
+        self.socket_thread = threading.Thread(target=self.start_socket_client, name='socket-client', daemon=True)
+        self.socket_thread.start()
+
         # Start GUI in background thread with smart startup behavior
         gui_thread = threading.Thread(target=self.show_gui, daemon=True)
         gui_thread.start()
@@ -135,5 +157,6 @@ class PrinterClientTray:
         self.tray.run()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Render worker processes in the frozen build
     app = PrinterClientTray()
     app.run()
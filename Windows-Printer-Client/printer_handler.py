@@ -3,18 +3,18 @@ Printer Handler Module
 Handles all printing operations for Windows
 """
 import win32print
-import win32ui
 import win32con
-from PIL import Image, ImageDraw, ImageFont
 import logging
-import json
 from datetime import datetime
-import tempfile
 import os
-import sys
-import subprocess
+import threading
+import time
 import io
+import itertools
 from config import Config
+from config_snapshot import ConfigStore
+from job_deadlines import JobExpired, check_deadline, parse_lane_ttls
+from scratch_janitor import ScratchJanitor
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +22,163 @@ class PrinterHandler:
     def __init__(self):
         self.default_printer = win32print.GetDefaultPrinter()
         self.print_queue = []  # Queue for failed/pending prints
+        # Render settings and printer profiles: immutable snapshot, swapped when the files change
+        self.config_store = ConfigStore(printer_settings_path=Config.PRINTER_SETTINGS_FILE,
+                                        interval=Config.CONFIG_WATCH_INTERVAL)
+        self.config_store.start_watching()
+        self._job = threading.local()  # Snapshot pinned by the job running on this thread
+        self.render_cache = self._create_render_cache()
+        # Scratch files of path-based print methods are deleted in the background
+        self.scratch_janitor = ScratchJanitor(Config.SCRATCH_DIR, grace=Config.SCRATCH_GRACE_SECONDS)
+        self.scratch_janitor.start()
+        # Layout caches and converters - created by load_render_stack() on the first job or
+        # warm-up, so start-up doesn't import the render modules
+        self.display_list_cache = None
+        self.fragment_cache = None  # Store header/footer blocks
+        self.layout_plans = None  # Per-stylesheet row plans of known receipt skeletons
+        self.receipt_templates = None
+        self.weasyprint_renderer = None
+        self.converter_selector = None
+        self._render_stack_lock = threading.Lock()
+        self.wkhtmltopdf_pool = None
+        self._wkhtmltopdf_lock = threading.Lock()
+        self.sumatra_helper = None
+        self._sumatra_lock = threading.Lock()
+        self.render_pool = None
+        self._render_pool_lock = threading.Lock()
+        self._render_pool_failed_at = None  # Start-up failure - rendering in-process until the cooldown
+        self._coalescers = {}  # Printer -> JobCoalescer (profiles with "coalesce_ms")
+        self._coalescers_lock = threading.Lock()
+        self._warm_up_thread = None
+        self.warm_up_report = {}  # Step -> seconds (or error text) of the last warm-up
+        self.warm_up_seconds = None
         logger.info(f"Default printer: {self.default_printer}")
 
+    def load_render_stack(self):
+        """Import the render modules and create the layout caches and converters (once)"""
+        if self.converter_selector is not None:
+            return
+        with self._render_stack_lock:
+            if self.converter_selector is not None:
+                return
+            from display_list import DisplayListCache
+            from receipt_profiles import LayoutPlanCache
+            from template_compiler import ReceiptTemplates
+            from weasyprint_renderer import WeasyPrintRenderer
+            from converter_selector import ConverterSelector
+
+            self.display_list_cache = DisplayListCache()
+            self.fragment_cache = DisplayListCache(max_entries=32)
+            self.layout_plans = LayoutPlanCache()
+            self.receipt_templates = ReceiptTemplates() if Config.TEMPLATE_COMPILER_ENABLED else None
+            self.weasyprint_renderer = WeasyPrintRenderer()
+            # Created last - other threads take a set selector as a fully loaded stack
+            self.converter_selector = ConverterSelector(
+                {
+                    # name: (quality tier, expected seconds before measured, document kinds)
+                    'receipt': (2, 0.05, ('receipt',)),
+                    'reportlab': (1, 0.2, ('receipt', 'document')),
+                    'wkhtmltopdf': (3, 1.0, ('receipt', 'document')),
+                    'weasyprint': (3, 1.5, ('receipt', 'document')),
+                },
+                quality_tier=Config.PDF_QUALITY_TIER,
+                failure_threshold=Config.CONVERTER_FAILURE_THRESHOLD,
+                cooldown=Config.CONVERTER_BREAKER_COOLDOWN,
+                probe=self._probe_converter,
+            )
+
+    def _enabled_converters(self):
+        """Converters a job may use with the current settings (configured one plus fallbacks)"""
+        self.load_render_stack()
+        pdf_converter, _ = self._get_render_settings()
+        if pdf_converter == 'auto':
+            return [name for name, _ in self.converter_selector.plan('receipt')]
+        if pdf_converter in ('wkhtmltopdf', 'weasyprint'):
+            return [pdf_converter, 'receipt', 'reportlab']
+        return ['receipt', 'reportlab']
+
+    def warm_up(self):
+        """Import the render stack and render a dummy receipt through each enabled converter
+
+        Moves import, font metric, QR encoder, wkhtmltopdf discovery and worker start-up
+        costs from the first real job to start-up. Returns the seconds it took.
+        """
+        from receipt_layout import WARM_UP_RECEIPT_HTML
+
+        start = time.perf_counter()
+        report = {}
+        self.load_render_stack()
+
+        def step(name, action):
+            step_start = time.perf_counter()
+            try:
+                action()
+                report[name] = round(time.perf_counter() - step_start, 3)
+            except Exception as e:
+                report[name] = f"failed: {type(e).__name__}: {str(e)}"
+
+        def import_stack():
+            import bs4  # noqa: F401
+            import qrcode  # noqa: F401
+            from reportlab.pdfgen import canvas  # noqa: F401
+            from reportlab.pdfbase import pdfmetrics
+            for font_name in ('Helvetica', 'Helvetica-Bold'):
+                pdfmetrics.getFont(font_name)  # Loads the font metrics used for measuring
+
+        step('imports', import_stack)
+        for name in self._enabled_converters():
+            step(name, lambda name=name: self._run_converter(name, WARM_UP_RECEIPT_HTML, Config.MAX_PAGE_LENGTH_MM))
+
+        self.warm_up_report = report
+        self.warm_up_seconds = time.perf_counter() - start
+        summary = ', '.join(f"{name} {value:.2f}s" if isinstance(value, float) else f"{name} {value}"
+                            for name, value in report.items())
+        logger.info(f"🔥 Render stack warm in {self.warm_up_seconds:.2f}s ({summary})")
+        return self.warm_up_seconds
+
+    def start_warm_up(self):
+        """Warm up in a background thread, once per process (called when the socket connects)"""
+        if Config.WARM_UP_ENABLED and self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name='render-warm-up', daemon=True)
+            self._warm_up_thread.start()
+
+    def _create_render_cache(self):
+        """Create the on-disk render cache used for reprints and retries"""
+        if not Config.RENDER_CACHE_ENABLED:
+            return None
+        try:
+            from render_cache import RenderCache
+            return RenderCache(Config.RENDER_CACHE_DIR, Config.RENDER_CACHE_MAX_MB * 1024 * 1024)
+        except Exception as e:
+            logger.warning(f"Render cache disabled: {str(e)}")
+            return None
+
+    def get_config(self):
+        """Config snapshot of the job on this thread, or the current one outside a job"""
+        return getattr(self._job, 'config', None) or self.config_store.current
+
+    def reload_config(self):
+        """Re-read .env and printer_settings.json now (the watcher would within a few seconds)"""
+        return self.config_store.reload()
+
+    @property
+    def printer_settings(self):
+        """Per-printer profiles (printer_settings.json) of the current config snapshot"""
+        return self.get_config().printer_settings
+
+    @printer_settings.setter
+    def printer_settings(self, settings):
+        self.config_store.reload(printer_settings=settings)
+
+    def get_printer_profile(self, printer_name):
+        """Get the profile (printer_settings.json entry) for a printer"""
+        return self.printer_settings.get(printer_name, {})
+
+    def _get_render_settings(self):
+        """Get the PDF converter and font scale (from the config snapshot - no file access)"""
+        config = self.get_config()
+        return config.pdf_converter, config.font_scale
+
     def get_available_printers(self):
         """Get list of available printers with status"""
         printers = []
@@ -100,7 +255,210 @@ class PrinterHandler:
         Args:
             data: Dictionary containing print data
             printer_name: Name of the printer (optional, uses default if not specified)
+
+        The whole job uses one config snapshot; its version is recorded in data['config_version']
+        (for a coalesced job, the version of the snapshot its batch was rendered under).
+        HTML jobs for a printer with a coalescing window are printed together with the jobs that
+        arrive within the window; the result is still this job's own.
+        Raises JobExpired (before any render work) when the job is past its deadline.
         """
+        self.load_render_stack()
+        config = self.config_store.current
+        data['config_version'] = config.version
+        data.setdefault('received_at', time.time())  # Kept when the job is queued and retried
+        self._job.config = config
+        try:
+            try:
+                check_deadline(data, self.get_job_ttl(data, printer_name or self.default_printer))
+            except JobExpired as e:
+                logger.warning(f"⏰ Skipping expired job: {str(e)}")
+                raise
+
+            coalescer = self._get_coalescer(printer_name or self.default_printer) if data.get('type') == 'html' else None
+            if coalescer is not None:
+                return coalescer.submit(data)
+            return self._print_document(data, printer_name)
+        finally:
+            self._job.config = None
+
+    def get_job_ttl(self, data, printer_name):
+        """Time-to-live (seconds) of a job, None for no limit
+
+        The job's "ttl" wins over the printer profile's "job_ttl"; otherwise JOB_LANE_TTLS
+        decides by the job's "lane" (or its type when it has none).
+        """
+        ttl = data.get('ttl') or self.get_printer_profile(printer_name).get('job_ttl')
+        if ttl is None:
+            ttl = parse_lane_ttls(Config.JOB_LANE_TTLS).get(data.get('lane') or data.get('type', 'text'))
+        try:
+            return float(ttl) if ttl else None
+        except (TypeError, ValueError):
+            return None
+
+    def _get_coalescer(self, printer_name):
+        """Coalescing window of a printer, or None when its profile doesn't enable one
+
+        Printer profile keys: "coalesce_ms" (window, e.g. 150; 0 = off),
+        "coalesce_max_jobs" (jobs per batch, default 8) and "coalesce_timeout" (seconds a
+        job waits for its batch to start printing before it is withdrawn unprinted and reported
+        as failed, default 120).
+        """
+        profile = self.get_printer_profile(printer_name)
+        window_ms = float(profile.get('coalesce_ms', 0) or 0)
+        if window_ms <= 0:
+            return None
+        max_jobs = int(profile.get('coalesce_max_jobs', 8))
+        timeout = float(profile.get('coalesce_timeout', 120))
+
+        from job_coalescer import JobCoalescer
+
+        with self._coalescers_lock:
+            coalescer = self._coalescers.get(printer_name)
+            if coalescer is None or (coalescer.window, coalescer.max_jobs, coalescer.timeout) != (window_ms / 1000, max_jobs, timeout):
+                coalescer = JobCoalescer(window_ms / 1000, max_jobs, lambda jobs: self._print_batch(jobs, printer_name), timeout)
+                self._coalescers[printer_name] = coalescer
+            return coalescer
+
+    def _print_batch(self, jobs, printer_name):
+        """Print a coalesced burst of HTML jobs as one spooler document; returns a result per job
+
+        Table-based receipts are combined - ESC/POS commands with a cut after every ticket (unless
+        the profile sets "cut": false), or one PDF with a page per ticket (roll printers cut after
+        each page), painted in a render worker when the render pool runs; with WeasyPrint every
+        document is rendered into one PDF in a single call. Documents already in the render cache, other documents, and every job
+        when the printer isn't ready, go through the normal path one by one.
+        """
+        # The whole batch renders under the leader's config snapshot - record that version on every job
+        version = self.get_config().version
+        for job in jobs:
+            job['config_version'] = version
+
+        if len(jobs) == 1:
+            return [self._print_document(jobs[0], printer_name)]
+
+        found_printer = self.find_printer(printer_name)
+        if found_printer is None or self.get_printer_status(found_printer) not in ['Ready', 'Unknown']:
+            return [self._print_document(job, printer_name) for job in jobs]
+
+        profile = self.get_printer_profile(found_printer)
+        escpos = profile.get('backend') in ('escpos', 'escpos_raster')
+        pdf_converter, _ = self._get_render_settings()
+
+        def cached(html_content):
+            # Rendered before - replayed from the render cache on the normal path instead
+            return (not escpos and self.render_cache is not None
+                    and self._render_cache_key(html_content, profile) in self.render_cache)
+
+        results = [None] * len(jobs)
+        combined = []  # (index, the job's copies: display lists, (HTML, marker) pairs for the render pool, or HTML for WeasyPrint)
+        pdf_data = None
+        render_pool = None
+        weasyprint = not escpos and pdf_converter == 'weasyprint'
+        if weasyprint:
+            # One WeasyPrint call renders the whole burst into a single PDF
+            for index, job in enumerate(jobs):
+                html_content = job.get('html', job.get('content', ''))
+                if html_content and not cached(html_content):
+                    copies, _ = self.get_job_copies(job, found_printer)
+                    combined.append((index, [html_content] * copies))
+        elif escpos or pdf_converter in ('reportlab', 'sumatrapdf'):
+            render_pool = None if escpos else self._get_render_pool()
+            for index, job in enumerate(jobs):
+                html_content = job.get('html', job.get('content', ''))
+                if cached(html_content):
+                    continue
+                if render_pool is not None:
+                    # Laid out and painted in a render worker, like a single receipt
+                    if self._document_kind(html_content) == 'receipt':
+                        copies, copy_marker = self.get_job_copies(job, found_printer)
+                        marker = copy_marker if copies > 1 else None
+                        combined.append((index, [(html_content, None)] + [(html_content, marker)] * (copies - 1)))
+                    continue
+                try:
+                    display_list = self.get_receipt_display_list(html_content)
+                except Exception as e:
+                    logger.warning(f"Coalesced job {index + 1} can't be combined: {str(e)}")
+                    continue
+                if display_list.items:
+                    copies, copy_marker = self.get_job_copies(job, found_printer)
+                    copy_list = display_list
+                    if copies > 1 and copy_marker:
+                        from display_list import marked_copy
+                        copy_list = marked_copy(display_list, copy_marker)
+                    combined.append((index, [display_list] + [copy_list] * (copies - 1)))
+
+        parts = [part for _, job_parts in combined for part in job_parts]
+        if len(combined) > 1 and weasyprint:
+            try:
+                pdf_data = self.weasyprint_renderer.render_batch(parts, combine=True)
+                logger.info(f"Batch of {len(parts)} documents converted with WeasyPrint ({len(pdf_data)} bytes)")
+            except Exception as e:
+                logger.warning(f"WeasyPrint batch conversion failed: {e}, printing the jobs one by one")
+                combined = []
+        elif len(combined) > 1 and render_pool is not None:
+            try:
+                _, font_scale = self._get_render_settings()
+                max_length_mm = float(profile.get('max_length_mm', Config.MAX_PAGE_LENGTH_MM))
+                pdf_data = render_pool.render_receipts(parts, font_scale, max_length_mm)
+                logger.info(f"Batch of {len(parts)} receipts rendered in worker process ({len(pdf_data)} bytes)")
+            except Exception as e:
+                logger.warning(f"Batch render in worker process failed: {e}, printing the jobs one by one")
+                combined = []
+
+        if len(combined) > 1:
+            document_name = f'Batch of {len(combined)} tickets {datetime.now().strftime("%Y%m%d_%H%M%S")}'
+            logger.info(f"📦 Printing {len(combined)} coalesced tickets to {found_printer} as one document")
+            try:
+                if pdf_data is not None:
+                    result = self._print_pdf_data(pdf_data, found_printer, document_name)
+                else:
+                    result = self._print_display_lists(parts, found_printer, profile, document_name)
+            except Exception as e:
+                logger.error(f"❌ Error printing coalesced tickets: {str(e)}")
+                result = False
+            for index, _ in combined:
+                results[index] = bool(result)
+                if not result:
+                    jobs[index]['printer_name'] = found_printer
+                    self.add_to_queue(jobs[index], found_printer)
+
+        for index, job in enumerate(jobs):
+            if results[index] is None:
+                results[index] = self._print_document(job, printer_name)
+        return results
+
+    def _print_display_lists(self, display_lists, printer_name, profile, document_name):
+        """Send laid-out tickets to a printer in one job (ESC/POS or a PDF page per ticket)"""
+        backend_name = profile.get('backend')
+        if backend_name in ('escpos', 'escpos_raster'):
+            from spool_backends import RawPrinterBackend, get_byte_backend
+
+            backend = get_byte_backend(printer_name, profile) or RawPrinterBackend(printer_name)
+            if backend_name == 'escpos_raster':
+                from escpos_backend import iter_escpos_display_list
+                bands = itertools.chain.from_iterable(
+                    iter_escpos_display_list(display_list, dpi=int(profile.get('dpi', 203)),
+                                             dither=profile.get('dither', False), cut=profile.get('cut', True))
+                    for display_list in display_lists
+                )
+                return backend.send_stream(bands, document_name)
+
+            from escpos_backend import paint_escpos_text
+            return backend.send_stream(
+                (paint_escpos_text(display_list, columns=int(profile.get('columns', 48)),
+                                   codepage=profile.get('codepage', 'cp858'), cut=profile.get('cut', True))
+                 for display_list in display_lists),
+                document_name,
+            )
+
+        from reportlab.lib.units import mm
+        from display_list import paint_pdf_batch
+
+        max_length_mm = float(profile.get('max_length_mm', Config.MAX_PAGE_LENGTH_MM))
+        pdf_data = paint_pdf_batch(display_lists, 5 * mm, 5 * mm, max_length_mm * mm, 20 * mm, 10 * mm)
+        return self._print_pdf_data(pdf_data, printer_name, document_name)
+
+    def _print_document(self, data, printer_name):
         try:
             if printer_name is None:
                 printer_name = self.default_printer
@@ -118,7 +476,7 @@ class PrinterHandler:
 
             # Check printer status before attempting to print
             status = self.get_printer_status(printer_name)
-            logger.info(f"Printing to: {printer_name} (Status: {status})")
+            logger.info(f"Printing to: {printer_name} (Status: {status}, config v{data['config_version']})")
 
             if status not in ['Ready', 'Unknown']:
                 logger.warning(f"Printer '{printer_name}' is not ready (Status: {status}). Adding to queue.")
@@ -136,77 +494,129 @@ class PrinterHandler:
                 # For HTML, we don't use the device context, we convert to PDF and print directly
                 html_content = data.get('html', data.get('content', ''))
                 if html_content:
-                    pdf_path = None
-                    try:
-                        # Convert HTML to PDF
-                        logger.info("📄 Converting HTML to PDF...")
-                        logger.info(f"   HTML length: {len(html_content)} characters")
-                        pdf_path = self._convert_html_to_pdf(html_content)
-
-                        if not pdf_path:
-                            logger.error("❌ PDF conversion returned None")
-                            raise Exception("Failed to create PDF from HTML - converter returned None")
+                    copies, copy_marker = self.get_job_copies(data, printer_name)
 
-                        if not os.path.exists(pdf_path):
-                            logger.error(f"❌ PDF file not found at: {pdf_path}")
-                            raise Exception(f"Failed to create PDF from HTML - file not found at {pdf_path}")
-
-                        # Log PDF file details
-                        pdf_size = os.path.getsize(pdf_path)
-                        logger.info(f"✅ PDF created: {pdf_path} ({pdf_size} bytes)")
-
-                        # Print the PDF file
-                        logger.info(f"🖨️ Printing PDF to {printer_name}...")
-                        result = self._print_pdf_file(pdf_path, printer_name)
+                    # Thermal printers with an ESC/POS profile get native commands - no PDF at all
+                    if self.get_printer_profile(printer_name).get('backend') in ('escpos', 'escpos_raster'):
+                        doc_name = data.get('document_name', f'Print Job {datetime.now().strftime("%Y%m%d_%H%M%S")}')
+                        result = self._print_escpos(html_content, printer_name, doc_name, copies, copy_marker)
+                        if result:
+                            logger.info("✅ HTML printed successfully as ESC/POS")
+                            return True
+                        elif result is not None:
+                            raise Exception("Failed to print ESC/POS receipt")
 
+                    # Printers with "painter": "gdi" get receipts painted straight onto their device context
+                    if self.get_printer_profile(printer_name).get('painter') == 'gdi':
+                        doc_name = data.get('document_name', f'Print Job {datetime.now().strftime("%Y%m%d_%H%M%S")}')
+                        result = self._print_gdi(html_content, printer_name, doc_name, copies, copy_marker)
                         if result:
-                            logger.info("✅ HTML printed successfully via PDF conversion")
+                            logger.info("✅ HTML printed successfully on the printer DC")
+                            return True
+                        elif result is not None:
+                            raise Exception("Failed to paint receipt onto the printer DC")
+
+                    # Reprints and retries of an already rendered document go straight to spooling
+                    # (looked up under the converter that would render it now)
+                    _, font_scale = self._get_render_settings()
+                    profile = self.get_printer_profile(printer_name)
+                    pdf_data = None
+                    if self.render_cache:
+                        pdf_data = self.render_cache.get(self._render_cache_key(html_content, profile))
+                        if pdf_data:
+                            logger.info(f"♻️ Render cache hit - printing cached PDF ({len(pdf_data)} bytes)")
+
+                    # Long reports are streamed: finished pages are spooled while later rows still render
+                    stream_converter = self._stream_converter(html_content) if copies == 1 and not pdf_data else None
+                    if stream_converter:
+                        max_length_mm = float(profile.get('max_length_mm', Config.MAX_PAGE_LENGTH_MM))
+                        logger.info(f"🌊 Streaming long document to {printer_name} with {stream_converter} ({len(html_content)} characters)")
+                        doc_name = data.get('document_name', f'Print Job {datetime.now().strftime("%Y%m%d_%H%M%S")}')
+                        pdf_chunks = self._iter_stream_pdf(html_content, stream_converter, max_length_mm)
+                        if self.render_cache:
+                            # Written to the cache file as the pages pass - never held in memory
+                            pdf_chunks = self.render_cache.put_stream(
+                                self.render_cache.make_key(html_content, stream_converter, font_scale, profile), pdf_chunks
+                            )
+                        if self._print_pdf_data(pdf_chunks, printer_name, doc_name):
+                            logger.info("✅ HTML printed successfully as a streamed PDF")
                             return True
-                        else:
-                            logger.error("❌ _print_pdf_file returned False")
-                            raise Exception("Failed to print PDF")
-
-                    finally:
-                        # Clean up temporary PDF file
-                        if pdf_path and os.path.exists(pdf_path):
-                            try:
-                                import time
-                                time.sleep(2)
-                                os.remove(pdf_path)
-                                logger.info(f"Cleaned up temporary PDF: {pdf_path}")
-                            except Exception as e:
-                                logger.warning(f"Could not delete temporary PDF: {str(e)}")
+                        raise Exception("Failed to print streamed PDF")
+
+                    if not pdf_data:
+                        # Convert HTML to PDF (in memory)
+                        logger.info("📄 Converting HTML to PDF...")
+                        logger.info(f"   HTML length: {len(html_content)} characters")
+                        pdf_data, converter = self._convert_html_to_pdf(html_content, printer_name)
+
+                        if not pdf_data:
+                            logger.error("❌ PDF conversion returned no data")
+                            raise Exception("Failed to create PDF from HTML - converter returned no data")
+
+                        logger.info(f"✅ PDF created in memory ({len(pdf_data)} bytes)")
+
+                        if self.render_cache:
+                            # Cached under the converter that ran - a fallback render isn't replayed
+                            # once the configured converter works again
+                            self.render_cache.put(
+                                self.render_cache.make_key(html_content, converter, font_scale, profile), pdf_data
+                            )
+
+                    # Print the PDF data - rendered once, however many copies
+                    logger.info(f"🖨️ Printing PDF to {printer_name}" + (f" ({copies} copies)..." if copies > 1 else "..."))
+                    doc_name = data.get('document_name', f'Print Job {datetime.now().strftime("%Y%m%d_%H%M%S")}')
+                    marked_pdf = None
+                    if copies > 1 and copy_marker:
+                        marked_pdf = self._render_marked_copy(html_content, copy_marker, printer_name)
+                    if marked_pdf:
+                        result = (self._print_pdf_data(pdf_data, printer_name, doc_name)
+                                  and self._print_pdf_data(marked_pdf, printer_name, f"{doc_name} ({copy_marker})", copies - 1))
+                    else:
+                        result = self._print_pdf_data(pdf_data, printer_name, doc_name, copies)
+
+                    if result:
+                        logger.info("✅ HTML printed successfully via PDF conversion")
+                        return True
+                    else:
+                        logger.error("❌ _print_pdf_data returned False")
+                        raise Exception("Failed to print PDF")
 
             # For other types, use the device context
+            import win32ui  # Loaded on first device-context job (keeps start-up light)
+
             # Get printer handle
             hprinter = win32print.OpenPrinter(printer_name)
+            copies, _ = self.get_job_copies(data, printer_name)
 
             try:
-                # Create a device context
-                hdc = win32ui.CreateDC()
-                hdc.CreatePrinterDC(printer_name)
+                # Create a device context - with the copies in its DEVMODE when the driver takes them
+                hdc, driver_copies = self._create_printer_dc(hprinter, printer_name, copies)
 
                 # Start the document
                 doc_name = data.get('document_name', f'Print Job {datetime.now().strftime("%Y%m%d_%H%M%S")}')
                 hdc.StartDoc(doc_name)
-                hdc.StartPage()
 
                 # Get page dimensions
                 page_width = hdc.GetDeviceCaps(win32con.HORZRES)
                 page_height = hdc.GetDeviceCaps(win32con.VERTRES)
 
-                if print_type == 'text':
-                    self._print_text(hdc, data, page_width, page_height)
-                elif print_type == 'receipt':
-                    self._print_receipt(hdc, data, page_width, page_height)
-                elif print_type == 'reservation':
-                    self._print_reservation(hdc, data, page_width, page_height)
-                else:
-                    # Default text printing
-                    self._print_text(hdc, data, page_width, page_height)
+                # Drivers without copy support get one page per copy
+                for _ in range(1 if driver_copies else copies):
+                    hdc.StartPage()
 
-                # End the page and document
-                hdc.EndPage()
+                    if print_type == 'text':
+                        self._print_text(hdc, data, page_width, page_height)
+                    elif print_type == 'receipt':
+                        self._print_receipt(hdc, data, page_width, page_height)
+                    elif print_type == 'reservation':
+                        self._print_reservation(hdc, data, page_width, page_height)
+                    else:
+                        # Default text printing
+                        self._print_text(hdc, data, page_width, page_height)
+
+                    hdc.EndPage()
+
+                # End the document
                 hdc.EndDoc()
 
                 logger.info(f"Print job completed successfully: {doc_name}")
@@ -236,6 +646,8 @@ class PrinterHandler:
 
     def _print_text(self, hdc, data, page_width, page_height):
         """Print simple text content"""
+        import win32ui
+
         content = data.get('content', 'No content provided')
 
         # Set font
@@ -256,6 +668,8 @@ class PrinterHandler:
 
     def _print_receipt(self, hdc, data, page_width, page_height):
         """Print a receipt"""
+        import win32ui
+
         # Header
         header_font = win32ui.CreateFont({
             "name": "Arial",
@@ -331,6 +745,8 @@ class PrinterHandler:
 
     def _print_reservation(self, hdc, data, page_width, page_height):
         """Print a reservation confirmation"""
+        import win32ui
+
         # Header
         header_font = win32ui.CreateFont({
             "name": "Arial",
@@ -388,23 +804,33 @@ class PrinterHandler:
         }
         return self.print_document(print_data)
 
-    def _convert_html_to_pdf(self, html_content):
-        """Convert HTML to PDF using the configured converter"""
-        # Reload config from .env to get latest settings
-        from dotenv import load_dotenv
-        load_dotenv(override=True)
+    def _convert_html_to_pdf(self, html_content, printer_name=None):
+        """Convert HTML to PDF using the configured converter
 
+        Returns (pdf_data, converter): the converter that actually produced the PDF, which is
+        not the configured one after a fallback. Every attempt feeds the converter selector,
+        and a configured converter whose circuit breaker is open is skipped for its fallback
+        until a background probe finds it working again.
+        """
+        self.load_render_stack()
         # Get the selected PDF converter from config (reload from environment)
-        pdf_converter = os.environ.get('PDF_CONVERTER', 'reportlab').lower()
+        pdf_converter, _ = self._get_render_settings()
+        kind = self._document_kind(html_content)
+
+        # Longest page the target printer accepts (receipts are cut to content height)
+        max_length_mm = float(self.get_printer_profile(printer_name).get('max_length_mm', Config.MAX_PAGE_LENGTH_MM))
         logger.info(f"Using PDF converter: {pdf_converter}")
 
         # Route to the appropriate converter based on configuration
-        if pdf_converter == 'wkhtmltopdf':
+        if pdf_converter == 'auto':
+            return self._convert_html_to_pdf_auto(html_content, max_length_mm)
+
+        elif pdf_converter == 'wkhtmltopdf':
             try:
                 logger.info("🔧 Attempting wkhtmltopdf conversion...")
-                result = self._convert_html_to_pdf_wkhtmltopdf(html_content)
-                logger.info(f"✅ wkhtmltopdf conversion successful: {result}")
-                return result
+                result = self._attempt_converter('wkhtmltopdf', kind, html_content, max_length_mm, skip_open=True)
+                logger.info(f"✅ wkhtmltopdf conversion successful ({len(result)} bytes)")
+                return result, 'wkhtmltopdf'
             except Exception as e:
                 import traceback
                 logger.warning(f"⚠️ wkhtmltopdf conversion failed: {type(e).__name__}: {str(e)}")
@@ -417,25 +843,25 @@ class PrinterHandler:
                     tables = soup.find_all('table')
                     if tables:
                         logger.info("📊 Using optimized table-based receipt renderer")
-                        return self._convert_receipt_html_to_pdf(html_content)
+                        return self._attempt_converter('receipt', kind, html_content, max_length_mm), 'receipt'
                 except Exception as fallback_error:
                     logger.debug(f"Table-based renderer also failed: {fallback_error}")
                     pass
                 logger.info("📄 Using basic ReportLab renderer")
-                return self._convert_html_to_pdf_reportlab(html_content)
+                return self._attempt_converter('reportlab', kind, html_content, max_length_mm), 'reportlab'
 
         elif pdf_converter == 'weasyprint':
             try:
-                return self._convert_html_to_pdf_weasyprint(html_content)
+                return self._attempt_converter('weasyprint', kind, html_content, max_length_mm, skip_open=True), 'weasyprint'
             except Exception as e:
                 logger.warning(f"WeasyPrint conversion failed: {e}, falling back to ReportLab")
-                return self._convert_html_to_pdf_reportlab(html_content)
+                return self._attempt_converter('reportlab', kind, html_content, max_length_mm), 'reportlab'
 
         elif pdf_converter == 'sumatrapdf':
             # SumatraPDF is actually a PDF printer/viewer, not a converter
             # So we'll use ReportLab for conversion and SumatraPDF for printing
             logger.info("Using ReportLab for conversion (SumatraPDF is for printing)")
-            return self._convert_html_to_pdf_reportlab(html_content)
+            return self._attempt_converter('reportlab', kind, html_content, max_length_mm), 'reportlab'
 
         else:  # Default to 'reportlab'
             # Try optimized receipt renderer for table-based receipts
@@ -447,1292 +873,518 @@ class PrinterHandler:
                 tables = soup.find_all('table')
                 if tables:
                     logger.info("Using optimized table-based receipt renderer")
-                    return self._convert_receipt_html_to_pdf(html_content)
+                    return self._attempt_converter('receipt', kind, html_content, max_length_mm, skip_open=True), 'receipt'
+            except TimeoutError:
+                raise  # The document hung a render worker - don't retry it in-process
             except Exception as e:
                 logger.warning(f"Could not use optimized renderer: {e}")
 
             # Fall back to general ReportLab renderer
             try:
-                return self._convert_html_to_pdf_reportlab(html_content)
+                return self._attempt_converter('reportlab', kind, html_content, max_length_mm), 'reportlab'
             except Exception as e:
                 logger.error(f"Error converting HTML to PDF with ReportLab: {str(e)}")
                 # Fall back to WeasyPrint if available
-                return self._convert_html_to_pdf_weasyprint(html_content)
+                return self._attempt_converter('weasyprint', kind, html_content, max_length_mm), 'weasyprint'
+
+    @staticmethod
+    def _document_kind(html_content):
+        """Document kind for converter choice: 'receipt' (table-based) or 'document'"""
+        return 'receipt' if '<table' in html_content.lower() else 'document'
+
+    def _expected_converter(self, html_content):
+        """Converter that renders a document first with the current settings (before any fallback)"""
+        pdf_converter, _ = self._get_render_settings()
+        kind = self._document_kind(html_content)
+        if pdf_converter == 'auto':
+            plan = self.converter_selector.plan(kind)
+            return plan[0][0] if plan else None
+        if pdf_converter in ('wkhtmltopdf', 'weasyprint') and not self.converter_selector.is_open(pdf_converter, kind):
+            return pdf_converter
+        if pdf_converter in ('weasyprint', 'sumatrapdf') or kind == 'document':
+            return 'reportlab'
+        return 'receipt'
+
+    def _run_converter(self, name, html_content, max_length_mm):
+        """Convert with one named converter (no fallback)"""
+        if name == 'receipt':
+            return self._convert_receipt_html_to_pdf(html_content, max_length_mm)
+        if name == 'wkhtmltopdf':
+            return self._convert_html_to_pdf_wkhtmltopdf(html_content)
+        if name == 'weasyprint':
+            return self._convert_html_to_pdf_weasyprint(html_content)
+        return self._convert_html_to_pdf_reportlab(html_content, max_length_mm)
+
+    def _attempt_converter(self, name, kind, html_content, max_length_mm, skip_open=False):
+        """Convert with one converter, feeding its latency or failure to the converter selector
+
+        skip_open: raise at once, without an attempt, while the converter's breaker is open.
+        """
+        if skip_open and self.converter_selector.is_open(name, kind):
+            raise Exception(f"{name} skipped - circuit breaker open")
+        start = time.perf_counter()
+        try:
+            pdf_data = self._run_converter(name, html_content, max_length_mm)
+        except Exception as e:
+            self.converter_selector.record_failure(name, kind, e)
+            raise
+        self.converter_selector.record_success(name, kind, time.perf_counter() - start)
+        return pdf_data
+
+    def _probe_converter(self, name, kind):
+        """Render a small test document to check whether a tripped converter works again"""
+        from weasyprint_renderer import WARM_UP_HTML
+
+        self._run_converter(name, WARM_UP_HTML, Config.MAX_PAGE_LENGTH_MM)
 
-    def _convert_receipt_html_to_pdf(self, html_content):
-        """Optimized HTML to PDF converter for table-based receipts with CSS parsing"""
+    def _convert_html_to_pdf_auto(self, html_content, max_length_mm):
+        """Convert with the converter the selector ranks best, falling back down its plan; returns (pdf_data, converter)
+
+        Every attempt feeds the selector's latency histograms and failure rates, so a missing
+        or slow converter drops out of the front of the plan after a few jobs.
+        """
+        kind = self._document_kind(html_content)
+        last_error = None
+        for name, reason in self.converter_selector.plan(kind):
+            logger.info(f"🧭 Converter for {kind}: {name} - {reason}")
+            start = time.perf_counter()
+            try:
+                pdf_data = self._attempt_converter(name, kind, html_content, max_length_mm)
+            except Exception as e:
+                logger.warning(f"⚠️ {name} failed after {time.perf_counter() - start:.2f}s: {type(e).__name__}: {str(e)}")
+                if isinstance(e, TimeoutError):
+                    raise  # The document hung a render worker - don't try it elsewhere
+                last_error = e
+                continue
+            return pdf_data, name
+        raise Exception(f"All converters failed for {kind}: {last_error}")
+
+    def get_receipt_display_list(self, html_content):
+        """Get the laid-out display list of a table-based receipt
+
+        The layout is done once per document and font scale; reprints and the other
+        painters (PDF, GDI, preview) replay the cached display list.
+        """
+        self.load_render_stack()
+        _, font_scale = self._get_render_settings()
+        key = self.display_list_cache.make_key(html_content, font_scale)
+        display_list = self.display_list_cache.get(key)
+        if display_list is not None:
+            logger.info(f"♻️ Display list cache hit ({len(display_list.items)} items)")
+            return display_list
+
+        if self.receipt_templates is not None:
+            display_list = self.receipt_templates.layout(html_content, font_scale, self.fragment_cache, self.layout_plans)
+        else:
+            from receipt_layout import layout_receipt
+            display_list = layout_receipt(html_content, font_scale, self.fragment_cache, self.layout_plans)
+        self.display_list_cache.put(key, display_list)
+        return display_list
+
+    def _convert_receipt_html_to_pdf(self, html_content, max_length_mm=None):
+        """Optimized HTML to PDF converter for table-based receipts with CSS parsing
+
+        The receipt is laid out into a display list, which is painted onto a single page of
+        exactly the content height (split only past max_length_mm).
+        """
         try:
             from reportlab.lib.units import mm
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import portrait
-            from bs4 import BeautifulSoup
-            import re
-
-            # Create temp PDF file
-            pdf_fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
-            os.close(pdf_fd)
-
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Detect if this is "urdhri punes" (work order) by checking title
-            is_urdhri_punes = False
-            title_element = soup.find('td', class_='title1') or soup.find('h1')
-            if title_element:
-                title_text = title_element.get_text().strip().lower()
-                if 'urdhri' in title_text or 'punes' in title_text:
-                    is_urdhri_punes = True
-                    logger.info("Detected 'urdhri punes' - will add lines around column headers")
-
-            # Parse CSS into a simple dictionary
-            css_styles = {}
-            for style_tag in soup.find_all('style'):
-                css_text = style_tag.string or ''
-
-                # Parse .classname { rules }
-                for match in re.finditer(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}', css_text):
-                    class_name = match.group(1)
-                    rules_text = match.group(2)
-                    css_styles[class_name] = {}
-
-                    for rule in rules_text.split(';'):
-                        if ':' in rule:
-                            prop, val = rule.split(':', 1)
-                            prop = prop.strip()
-                            val = val.replace('!important', '').strip()
-                            css_styles[class_name][prop] = val
-
-                # Parse tag selectors like tfoot, thead, hr, td, th, etc.
-                for match in re.finditer(r'\b([a-z]+)\s*\{([^}]+)\}', css_text):
-                    tag_name = match.group(1)
-                    rules_text = match.group(2)
-
-                    # Skip if already parsed as class or if it's a CSS keyword
-                    if tag_name in ['html', 'body', 'import', 'media', 'font']:
-                        continue
-
-                    css_styles[tag_name] = {}
-                    for rule in rules_text.split(';'):
-                        if ':' in rule:
-                            prop, val = rule.split(':', 1)
-                            prop = prop.strip()
-                            val = val.replace('!important', '').strip()
-                            css_styles[tag_name][prop] = val
-
-            # Override font sizes for specific classes to make them smaller
-            font_size_overrides = {
-                'title1': '14px',          # Fature Tatimore - smaller
-                'title1_urdhri': '14px',   # Urdhri titles - smaller
-                'tds-footer': '11px',      # Company, NIPT, Address - smaller
-            }
-
-            for class_name, size in font_size_overrides.items():
-                if class_name in css_styles:
-                    css_styles[class_name]['font-size'] = size
-
-            logger.info(f"Parsed {len(css_styles)} CSS rules (classes + tags)")
-            # Log some key CSS rules for debugging
-            for key in ['title1', 'tds-footer', 'columnsSkontrino', 'columnsPershkrim', 'columnsTotal', 'tfoot', 'center-text']:
-                if key in css_styles:
-                    logger.info(f"  CSS '{key}': {css_styles[key]}")
-
-            # Helper to get CSS value
-            def get_css_value(element, css_prop, default):
-                """Get CSS property value from element classes, inline styles, and parent tags"""
-                # Priority: inline style > element classes > element tag > parent tag
-
-                # 1. Check inline styles first (highest priority)
-                inline_style = element.get('style', '')
-                if inline_style and css_prop in inline_style:
-                    # Simple parsing for inline styles
-                    for style_part in inline_style.split(';'):
-                        if ':' in style_part:
-                            prop, val = style_part.split(':', 1)
-                            if prop.strip() == css_prop:
-                                return val.strip()
-
-                # 2. Check element's own classes (reverse order for last-defined wins)
-                classes = element.get('class', [])
-                for cls in reversed(classes):
-                    if cls in css_styles and css_prop in css_styles[cls]:
-                        return css_styles[cls][css_prop]
-
-                # 3. Check element's own tag
-                if element.name in css_styles and css_prop in css_styles[element.name]:
-                    return css_styles[element.name][css_prop]
-
-                # 4. Check parent elements (tfoot, thead, tbody, etc.)
-                parent = element.parent
-                while parent:
-                    if parent.name in css_styles and css_prop in css_styles[parent.name]:
-                        return css_styles[parent.name][css_prop]
-                    parent = parent.parent
-                    # Only check up to 2 levels to avoid over-inheritance
-                    if parent and parent.name == 'table':
-                        break
-
-                return default
-
-            # Setup PDF
-            width = 80 * mm
-            height = 297 * mm
-            c = canvas.Canvas(pdf_path, pagesize=portrait((width, height)))
-
-            y = height - 5 * mm  # Smaller top margin
-            margin = 3 * mm  # Smaller side margins
-
-            # Font size scaling factor from config - reload from environment
-            from dotenv import load_dotenv
-            load_dotenv(override=True)  # Reload .env to get latest FONT_SCALE
-            try:
-                font_scale = float(os.environ.get('FONT_SCALE', '0.8'))
-            except:
-                font_scale = 0.8
+            from display_list import paint_pdf
 
-            logger.info(f"Using font scale: {font_scale} ({int(font_scale * 100)}%)")
+            if max_length_mm is None:
+                max_length_mm = Config.MAX_PAGE_LENGTH_MM
 
-            def draw_text(text, y_pos, font_size=9, bold=False, align='left'):
-                """Draw text with alignment"""
-                # Apply font scaling
-                scaled_font_size = max(6, int(font_size * font_scale))  # Minimum 6pt
+            render_pool = self._get_render_pool()
+            if render_pool is not None:
+                # Layout and painting run in a worker process (deadline enforced, crashes contained)
+                _, font_scale = self._get_render_settings()
+                pdf_data = render_pool.render_receipt(html_content, font_scale, max_length_mm)
+                logger.info(f"Receipt PDF rendered in worker process ({len(pdf_data)} bytes)")
+                return pdf_data
 
-                font = "Helvetica-Bold" if bold else "Helvetica"
-                c.setFont(font, scaled_font_size)
+            display_list = self.get_receipt_display_list(html_content)
 
-                if align == 'center':
-                    c.drawCentredString(width / 2, y_pos, text)
-                elif align == 'right':
-                    c.drawRightString(width - margin, y_pos, text)
-                else:
-                    c.drawString(margin, y_pos, text)
+            # 5mm top/bottom margins; when split, break below 20mm and continue 10mm from the top
+            pdf_data = paint_pdf(display_list, 5 * mm, 5 * mm, max_length_mm * mm, 20 * mm, 10 * mm)
+            logger.info(f"Receipt PDF created successfully ({display_list.height / mm + 10:.0f}mm, {len(pdf_data)} bytes)")
+            return pdf_data
 
-                return scaled_font_size * 0.35  # Return line height in mm (tighter spacing)
+        except Exception as e:
+            logger.error(f"Error in optimized receipt renderer: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            raise
 
-            def draw_solid_line(y_pos, line_width=0.5):
-                """Draw a solid separator line"""
-                c.setLineWidth(line_width)
-                c.line(margin, y_pos, width - margin, y_pos)
-                c.setLineWidth(1)  # Reset line width
+    def _get_render_pool(self):
+        """Get the receipt render process pool (None when RENDER_WORKERS is 0 or it cannot start)
 
-            def draw_qr_code(data, y_pos, qr_size=30):
-                """Generate and draw QR code"""
+        A pool that fails to start is tried again after CONVERTER_BREAKER_COOLDOWN seconds;
+        jobs render in-process meanwhile.
+        """
+        if Config.RENDER_WORKERS <= 0:
+            return None
+        with self._render_pool_lock:
+            if self.render_pool is None:
+                failed_at = self._render_pool_failed_at
+                if failed_at is not None and time.monotonic() - failed_at < Config.CONVERTER_BREAKER_COOLDOWN:
+                    return None
                 try:
-                    import qrcode
-                    from reportlab.lib.utils import ImageReader
-
-                    # Generate QR code
-                    qr = qrcode.QRCode(
-                        version=1,
-                        error_correction=qrcode.constants.ERROR_CORRECT_L,
-                        box_size=10,
-                        border=1,
+                    from render_pool import RenderPool
+                    self.render_pool = RenderPool(
+                        Config.RENDER_WORKERS, Config.RENDER_TIMEOUT, Config.RENDER_WORKER_MEMORY_MB
                     )
-                    qr.add_data(data)
-                    qr.make(fit=True)
+                    self._render_pool_failed_at = None
+                    logger.info(f"🧵 Started {Config.RENDER_WORKERS} render worker processes")
+                except Exception as e:
+                    logger.warning(f"Render processes unavailable, rendering in-process: {str(e)}")
+                    self._render_pool_failed_at = time.monotonic()
+                    return None
+            return self.render_pool
+
+    def _get_wkhtmltopdf_pool(self):
+        """Get the pool of pre-started wkhtmltopdf workers (created on first use)"""
+        with self._wkhtmltopdf_lock:
+            if self.wkhtmltopdf_pool is None:
+                from wkhtmltopdf_pool import WkhtmltopdfPool, find_wkhtmltopdf
+
+                wkhtmltopdf_path = find_wkhtmltopdf()
+                if not wkhtmltopdf_path:
+                    raise Exception("wkhtmltopdf not installed")
+
+                self.wkhtmltopdf_pool = WkhtmltopdfPool(
+                    wkhtmltopdf_path, Config.WKHTMLTOPDF_WORKERS, Config.WKHTMLTOPDF_TIMEOUT
+                )
+                self.wkhtmltopdf_pool.start()
+            return self.wkhtmltopdf_pool
+
+    def _get_sumatra_helper(self):
+        """Get the resident SumatraPDF print helper (created on first use), or None without SumatraPDF"""
+        with self._sumatra_lock:
+            if self.sumatra_helper is None:
+                from sumatra_helper import SumatraHelper, find_sumatra
 
-                    # Create image
-                    img = qr.make_image(fill_color="black", back_color="white")
+                sumatra_path = find_sumatra()
+                if not sumatra_path:
+                    return None
 
-                    # Save to temp file
-                    qr_fd, qr_path = tempfile.mkstemp(suffix='.png')
-                    os.close(qr_fd)
-                    img.save(qr_path)
+                self.sumatra_helper = SumatraHelper(sumatra_path, Config.SUMATRA_TIMEOUT)
+            return self.sumatra_helper
 
-                    # Draw QR code centered
-                    qr_x = (width - qr_size * mm) / 2
-                    c.drawImage(qr_path, qr_x, y_pos - qr_size * mm,
-                               width=qr_size * mm, height=qr_size * mm)
+    def _convert_html_to_pdf_wkhtmltopdf(self, html_content):
+        """Convert HTML to PDF using wkhtmltopdf (best CSS support)
 
-                    # Clean up temp file
-                    try:
-                        os.unlink(qr_path)
-                    except:
-                        pass
+        The executable is located once per process and conversions run on pre-started
+        workers (HTML on stdin, PDF on stdout) with a concurrency limit and per-job timeout.
+        """
+        from wkhtmltopdf_pool import inject_stylesheet
 
-                    return qr_size  # Return height used in mm
-                except Exception as e:
-                    logger.warning(f"Could not generate QR code: {e}")
-                    return 0
-
-            # Track sections to add solid lines at correct positions
-            last_section = None  # Track what we just processed
-
-            # Process all tables
-            for table in soup.find_all('table'):
-                for row in table.find_all('tr'):
-                    # Check if this row is in tfoot or tbody
-                    is_footer_row = row.find_parent('tfoot') is not None
-                    is_tbody_row = row.find_parent('tbody') is not None
-
-                    cells = row.find_all(['td', 'th'])
-
-                    if not cells:
-                        continue
-
-                    # Check if this row ONLY contains a line (hr or div with dashed-line/div_line)
-                    # If cell only contains these elements with no other text, it's a separator row
-                    is_line_only_row = False
-                    for cell in cells:
-                        cell_text = cell.get_text().strip()
-                        has_line_div = cell.find('div', class_=['div_line', 'dashed-line'])
-                        has_hr = cell.find('hr')
-
-                        if (has_line_div or has_hr) and not cell_text:
-                            is_line_only_row = True
-                            break
-
-                    if is_line_only_row:
-                        # Remove all HTML dashed lines - we'll add solid lines strategically
-                        continue
-
-                    # Single cell (title, info, etc.)
-                    if len(cells) == 1 or (len(cells) == 2 and cells[0].get('colspan')):
-                        cell = cells[0]
-
-                        # Check if this cell contains SVG (QR code)
-                        svg_element = cell.find('svg')
-                        if svg_element:
-                            # Extract QR code data from nearby elements
-                            # Look for NIVF or NSLF in previous rows
-                            qr_data = ""
-                            for prev_row in table.find_all('tr'):
-                                prev_text = prev_row.get_text()
-                                if 'NIVF:' in prev_text or 'NSLF:' in prev_text:
-                                    # Extract the hash/code after the colon
-                                    parts = prev_text.split(':', 1)
-                                    if len(parts) > 1:
-                                        qr_data = parts[1].strip()
-                                        break
-
-                            if qr_data:
-                                y -= 3 * mm  # Space before QR
-                                qr_height = draw_qr_code(qr_data, y, qr_size=30)
-                                y -= (qr_height + 3) * mm  # Space after QR
-                            continue
-
-                        text = cell.get_text().strip()
-
-                        if not text:
-                            continue
-
-                        # Get CSS styling from the cell
-                        font_size_str = get_css_value(cell, 'font-size', '9px').replace('px', '').replace('pt', '')
-                        try:
-                            font_size = int(float(font_size_str))
-                        except:
-                            font_size = 9
-
-                        # Apply font scaling
-                        font_size = max(6, int(font_size * font_scale))
-
-                        weight = get_css_value(cell, 'font-weight', 'normal')
-                        bold = weight in ['bold', '500', '600', '700', '800', '900']
-
-                        align_val = get_css_value(cell, 'text-align', 'left')
-
-                        # Footer rows should be centered (tfoot has text-align: center)
-                        if is_footer_row:
-                            align_val = 'center'
-                            # Add line before footer (if not QR code or NSLF/NIVF)
-                            if 'Gjeneruar' in text or 'Generated' in text:
-                                if last_section != 'footer_line_added':
-                                    y -= 2 * mm
-                                    draw_solid_line(y)
-                                    y -= 3 * mm
-                                    last_section = 'footer_line_added'
-
-                        # Check if contains h1/h2 (makes it bold automatically and larger)
-                        heading = cell.find(['h1', 'h2'])
-                        if heading:
-                            bold = True
-                            # h1 should be larger - but respect CSS if it's already set larger
-                            if heading.name == 'h1' and font_size < 12:
-                                font_size = 12
-                            elif heading.name == 'h2' and font_size < 10:
-                                font_size = 10
-
-                        # Check for <br> tags and split text into multiple lines
-                        if cell.find('br'):
-                            # Handle line breaks in text (like NSLF field)
-                            text_parts = []
-                            for content in cell.stripped_strings:
-                                text_parts.append(content)
-
-                            # Print each part on its own line
-                            for part in text_parts:
-                                line_height = draw_text(part, y, font_size, bold, align_val)
-                                y -= (line_height + 1.5) * mm
-                        else:
-                            # Check if this is end of company header section (tds-footer class)
-                            cell_classes = cell.get('class', [])
-                            if 'tds-footer' in cell_classes:
-                                last_section = 'company_header'
-                            # Check if this is operator/tavolina/data info (columnsSkontrino)
-                            elif 'columnsSkontrino' in cell_classes and last_section == 'company_header':
-                                # Add solid line BEFORE the receipt info section (Data, Operator, etc)
-                                y -= 2 * mm
-                                draw_solid_line(y)
-                                y -= 3 * mm
-                                last_section = 'receipt_info'
-
-                            # Regular single-line text
-                            line_height = draw_text(text, y, font_size, bold, align_val)
-
-                            # Tighter spacing for more compact layout
-                            if font_size >= 14:
-                                spacing = 1.5
-                            elif font_size >= 12:
-                                spacing = 1.2
-                            else:
-                                spacing = 0.8
-                            y -= (line_height + spacing) * mm
-
-                            # Check if this is "Tavolina" or "Menyra e Pageses" field - add line AFTER
-                            # This check must be AFTER drawing text and spacing
-                            if 'Tavolina:' in text or 'Menyra e Pageses:' in text:
-                                # Add spacing and solid line AFTER Tavolina/Menyra e Pageses
-                                y -= 1 * mm  # Extra space before line
-                                draw_solid_line(y)
-                                y -= 2 * mm  # Space after line
-                                last_section = 'after_tavolina'
-
-                    # Multi-cell row (table data)
-                    elif len(cells) >= 2:
-                        # Filter out empty cells
-                        non_empty_cells = [cell for cell in cells if cell.get_text().strip()]
-
-                        if not non_empty_cells:
-                            continue
-
-                        # Extract cell texts from non-empty cells
-                        cell_texts = [cell.get_text().strip() for cell in non_empty_cells]
-
-                        # Check if this is a header row (contains <th> tags)
-                        is_header = any(cell.name == 'th' for cell in non_empty_cells)
-
-                        # Get styling from first non-empty cell
-                        first_cell = non_empty_cells[0]
-                        font_size_str = get_css_value(first_cell, 'font-size', '9px').replace('px', '').replace('pt', '')
-                        try:
-                            font_size = int(float(font_size_str))
-                        except:
-                            font_size = 10 if is_header else 9
-
-                        # Apply font scaling
-                        font_size = max(6, int(font_size * font_scale))
-
-                        weight = get_css_value(first_cell, 'font-weight', 'normal')
-                        bold = weight in ['bold', '500', '600', '700', '800', '900'] or is_header
-
-                        # Check if any cell contains h1/h2 (for TOTALI row)
-                        has_heading = any(cell.find(['h1', 'h2']) for cell in non_empty_cells)
-                        if has_heading:
-                            bold = True
-                            if font_size < 12:
-                                font_size = 12
-
-                        # Get text alignment from cells
-                        alignments = [get_css_value(cell, 'text-align', 'left') for cell in non_empty_cells]
-
-                        # Format based on number of non-empty columns
-                        if len(non_empty_cells) == 2:
-                            # Two columns: Could be TOTALI row OR Sasia/Artikull (Fature Porosi)
-                            left_text = cell_texts[0]
-                            right_text = cell_texts[1]
-
-                            # Check if this is TOTALI row (has heading)
-                            if has_heading:
-                                # Add solid line before TOTALI
-                                y -= 2 * mm
-                                draw_solid_line(y)
-                                y -= 3 * mm
-                                last_section = 'totali'
-
-                            # Check if this is a Fature Porosi table (Sasia + Artikull)
-                            # Detect by checking if left text contains "x" (quantity marker)
-                            is_fature_porosi = 'x' in left_text.lower() and not has_heading
-
-                            if is_fature_porosi and is_tbody_row:
-                                # Fature Porosi: Two columns with Sasia (left) and Artikull (right)
-                                # Need word wrapping for long Artikull names
-                                font_name = "Helvetica-Bold" if bold else "Helvetica"
-                                c.setFont(font_name, font_size)
-
-                                # Calculate column widths: 20% for Sasia, 80% for Artikull
-                                sasia_width = (width - 2 * margin) * 0.2
-                                artikull_width = (width - 2 * margin) * 0.8
-
-                                # Draw Sasia (left column)
-                                c.drawString(margin, y, left_text)
-
-                                # Check if Artikull text fits in one line
-                                artikull_x = margin + sasia_width
-                                text_width = c.stringWidth(right_text, font_name, font_size)
-
-                                if text_width <= (artikull_width - 2*mm):
-                                    # Fits in one line
-                                    c.drawString(artikull_x, y, right_text)
-                                else:
-                                    # Need to wrap - split into words
-                                    words = right_text.split()
-                                    lines = []
-                                    current_line = ""
-
-                                    for word in words:
-                                        test_line = current_line + " " + word if current_line else word
-                                        test_width = c.stringWidth(test_line, font_name, font_size)
-
-                                        if test_width <= (artikull_width - 2*mm):
-                                            current_line = test_line
-                                        else:
-                                            if current_line:
-                                                lines.append(current_line)
-                                            current_line = word
-
-                                    if current_line:
-                                        lines.append(current_line)
-
-                                    # Draw first line
-                                    if lines:
-                                        c.drawString(artikull_x, y, lines[0])
-
-                                        # Draw remaining lines (indented under Artikull column)
-                                        for additional_line in lines[1:]:
-                                            y -= (font_size * 0.35 + 0.8) * mm
-                                            c.drawString(artikull_x, y, additional_line)
-
-                                # Add extra spacing after Fature Porosi product row
-                                y -= 2 * mm  # Extra spacing between products
-                            else:
-                                # Regular 2-column format (TOTALI, etc.)
-                                # Check alignment of right cell
-                                if alignments[1] == 'center':
-                                    # Draw left text on left, right text centered on right side
-                                    c.setFont("Helvetica-Bold" if bold else "Helvetica", font_size)
-                                    c.drawString(margin, y, left_text)
-                                    c.drawCentredString(width - margin - 15*mm, y, right_text)
-                                elif alignments[1] == 'right':
-                                    # Traditional left-right alignment
-                                    line = f"{left_text:<35} {right_text:>10}"
-                                    c.setFont("Helvetica-Bold" if bold else "Helvetica", font_size)
-                                    c.drawString(margin, y, line)
-                                else:
-                                    # Both left-aligned with spacing
-                                    line = f"{left_text:<25} {right_text}"
-                                    c.setFont("Helvetica-Bold" if bold else "Helvetica", font_size)
-                                    c.drawString(margin, y, line)
-                        elif len(non_empty_cells) == 4:
-                            # Four columns: Artikull, Sasia, Cmimi, Vlera
-                            c.setFont("Helvetica-Bold" if (bold or is_header) else "Helvetica", font_size)
-
-                            # Define column widths to match alignment
-                            col_width = (width - 2 * margin) / 4
-
-                            if is_header:
-                                # Draw solid line before header (for ALL receipts)
-                                y -= 1 * mm  # Small space before line
-                                draw_solid_line(y)
-                                y -= 3 * mm  # More space after line, before text
-
-                                # Header row - centered in each column
-                                for i, text in enumerate(cell_texts):
-                                    x_pos = margin + (i * col_width) + (col_width / 2)
-                                    c.drawCentredString(x_pos, y, text)
-
-                                # Draw solid line after header (for ALL receipts)
-                                y -= 3 * mm  # More space before line, after text
-                                draw_solid_line(y)
-                                y -= 1 * mm  # Small space after line
-
-                                last_section = 'table_header'
-                            else:
-                                # Data row - align to match header columns
-                                # Artikull (left), Sasia (center), Cmimi (center), Vlera (center)
-
-                                # Handle first column (Artikull) with word wrapping if needed
-                                artikull_text = cell_texts[0]
-                                x_pos_artikull = margin
-
-                                # Calculate max width for Artikull column (leave space for other columns)
-                                max_artikull_width = col_width - 2*mm  # Add small padding
-
-                                # Check if text fits in one line
-                                font_name = "Helvetica-Bold" if (bold or is_header) else "Helvetica"
-                                text_width = c.stringWidth(artikull_text, font_name, font_size)
-
-                                if text_width <= max_artikull_width:
-                                    # Fits in one line - draw normally
-                                    c.drawString(x_pos_artikull, y, artikull_text)
-
-                                    # Draw other columns on same line
-                                    for i in range(1, len(cell_texts)):
-                                        text = cell_texts[i]
-                                        x_pos = margin + (i * col_width)
-                                        x_center = x_pos + (col_width / 2)
-                                        c.drawCentredString(x_center, y, text)
-                                else:
-                                    # Text too long - need to wrap
-                                    # Split into words and wrap
-                                    words = artikull_text.split()
-                                    lines = []
-                                    current_line = ""
-
-                                    for word in words:
-                                        test_line = current_line + " " + word if current_line else word
-                                        test_width = c.stringWidth(test_line, font_name, font_size)
-
-                                        if test_width <= max_artikull_width:
-                                            current_line = test_line
-                                        else:
-                                            if current_line:
-                                                lines.append(current_line)
-                                            current_line = word
-
-                                    if current_line:
-                                        lines.append(current_line)
-
-                                    # Draw first line with other columns
-                                    if lines:
-                                        c.drawString(x_pos_artikull, y, lines[0])
-
-                                        # Draw other columns on first line
-                                        for i in range(1, len(cell_texts)):
-                                            text = cell_texts[i]
-                                            x_pos = margin + (i * col_width)
-                                            x_center = x_pos + (col_width / 2)
-                                            c.drawCentredString(x_center, y, text)
-
-                                        # Draw remaining lines of Artikull text (if any)
-                                        for additional_line in lines[1:]:
-                                            y -= (font_size * 0.35 + 0.8) * mm
-                                            c.drawString(x_pos_artikull, y, additional_line)
-
-                                # Add extra spacing after product row if in tbody
-                                if is_tbody_row:
-                                    y -= 2 * mm  # Extra spacing between products (green arrows in image)
-                        else:
-                            # Check if this is a tax summary table row (contains TVSH or Tipi keywords)
-                            is_tax_table_row = any('TVSH' in text or 'Tipi' in text for text in cell_texts)
-
-                            # Also check if we're currently inside a tax table (last_section is tax_table_header)
-                            # This handles data rows that don't contain the keywords
-                            is_inside_tax_table = last_section == 'tax_table_header'
-
-                            if is_tax_table_row or is_inside_tax_table:
-                                # Skip if we've already rendered the complete tax table
-                                if last_section == 'tax_table_complete':
-                                    continue
-
-                                # Check if this is header row (must contain both Tipi AND TVSH)
-                                is_tax_header = 'Tipi' in cell_texts and 'TVSH' in cell_texts
-
-                                if is_tax_header:
-                                    # Skip if we've already rendered the header
-                                    if last_section == 'tax_table_header' or last_section == 'tax_table_complete':
-                                        continue
-
-                                    # Add line before tax table
-                                    y -= 2 * mm
-                                    draw_solid_line(y)
-                                    y -= 3 * mm
-
-                                    # Use readable font for tax table (9pt for better readability)
-                                    tax_font_size = 9
-
-                                    # Calculate column widths for tax table (4 columns)
-                                    num_cols = len(cell_texts)
-                                    tax_col_width = (width - 2 * margin) / num_cols
-
-                                    # Row height (increased for larger font)
-                                    row_height = 5.5 * mm
-
-                                    # Draw header row with borders
-                                    c.setFont("Helvetica-Bold", tax_font_size)
-                                    for i, text in enumerate(cell_texts):
-                                        x_pos = margin + (i * tax_col_width)
-                                        # Draw cell border
-                                        c.setLineWidth(0.3)
-                                        c.rect(x_pos, y - row_height,
-                                              tax_col_width, row_height,
-                                              stroke=1, fill=0)
-                                        # Draw text centered in cell (vertically and horizontally)
-                                        x_center = x_pos + (tax_col_width / 2)
-                                        y_center = y - (row_height / 2) + (tax_font_size * 0.3)
-                                        c.drawCentredString(x_center, y_center, text)
-
-                                    y -= row_height
-                                    last_section = 'tax_table_header'
-                                    continue
-
-                                elif is_inside_tax_table:
-                                    # Tax data row (we're inside tax table from header)
-                                    # Use readable font for tax table data
-                                    tax_font_size = 9
-
-                                    # Calculate column widths
-                                    num_cols = len(cell_texts)
-                                    tax_col_width = (width - 2 * margin) / num_cols
-
-                                    # Row height (increased for larger font)
-                                    row_height = 5.5 * mm
-
-                                    # Draw data row with borders
-                                    c.setFont("Helvetica", tax_font_size)
-                                    for i, text in enumerate(cell_texts):
-                                        x_pos = margin + (i * tax_col_width)
-                                        # Draw cell border
-                                        c.setLineWidth(0.3)
-                                        c.rect(x_pos, y - row_height,
-                                              tax_col_width, row_height,
-                                              stroke=1, fill=0)
-                                        # Draw text centered in cell
-                                        x_center = x_pos + (tax_col_width / 2)
-                                        y_center = y - (row_height / 2) + (tax_font_size * 0.3)
-                                        c.drawCentredString(x_center, y_center, text)
-
-                                    y -= row_height
-
-                                    # Add line after tax table and mark as complete
-                                    y -= 1 * mm
-                                    draw_solid_line(y)
-                                    y -= 2 * mm
-                                    last_section = 'tax_table_complete'
-                                    continue
-                            else:
-                                # General: space-separated
-                                line = "  ".join(cell_texts)
-                                c.setFont("Helvetica-Bold" if bold else "Helvetica", font_size)
-                                c.drawString(margin, y, line)
-
-                        # Tighter spacing for compact layout
-                        spacing = 1.5 if font_size >= 14 else (1.2 if font_size >= 12 else 0.8)
-                        y -= (font_size * 0.35 + spacing) * mm
-
-                    # Check for page break
-                    if y < 20 * mm:
-                        c.showPage()
-                        y = height - 10 * mm
-
-            c.save()
-            logger.info(f"Receipt PDF created successfully: {pdf_path}")
-            return pdf_path
+        pool = self._get_wkhtmltopdf_pool()
+
+        # Inject CSS to make title, company name, and address smaller
+        pdf_data = pool.convert(inject_stylesheet(html_content))
+
+        logger.info(f"HTML converted to PDF with wkhtmltopdf ({len(pdf_data)} bytes)")
+        return pdf_data
+
+    def _convert_html_to_pdf_weasyprint(self, html_content):
+        """Convert HTML to PDF using WeasyPrint (requires GTK on Windows)
+
+        Uses the long-lived renderer (shared font configuration, pre-compiled receipt CSS).
+        """
+        try:
+            pdf_data = self.weasyprint_renderer.render(html_content)
+
+            logger.info(f"HTML converted to PDF with WeasyPrint ({len(pdf_data)} bytes)")
+            return pdf_data
 
         except Exception as e:
-            logger.error(f"Error in optimized receipt renderer: {str(e)}")
+            logger.error(f"Error converting HTML to PDF with WeasyPrint: {str(e)}")
+            raise
+
+    def _convert_html_to_pdf_reportlab(self, html_content, max_length_mm=None):
+        """Convert HTML to PDF using reportlab
+
+        The document is parsed and laid out in one incremental pass (stream_render): a single
+        page of exactly the content height, or pages of max_length_mm when it is longer.
+        """
+        try:
+            if max_length_mm is None:
+                max_length_mm = Config.MAX_PAGE_LENGTH_MM
+            pdf_data = b''.join(self.iter_html_pdf(html_content, max_length_mm))
+            logger.info(f"HTML converted to PDF with ReportLab ({len(pdf_data)} bytes)")
+            return pdf_data
+
+        except Exception as e:
+            logger.error(f"Error converting HTML to PDF with ReportLab: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
             raise
 
-    def _convert_html_to_pdf_wkhtmltopdf(self, html_content):
-        """Convert HTML to PDF using wkhtmltopdf (best CSS support)"""
+    def get_job_copies(self, data, printer_name):
+        """Copies of a job and the marker for the extra copies
+
+        The job's "copies"/"copy_marker" fields win over the printer profile's "copies"
+        (default 1) and "copy_marker" (e.g. "KOPJE", default none).
+        """
+        profile = self.get_printer_profile(printer_name)
         try:
-            import pdfkit
-
-            # Try to find wkhtmltopdf executable
-            # First check if running as PyInstaller bundle
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                bundle_dir = os.path.dirname(sys.executable)
-                # PyInstaller extracts to _MEIPASS temporary folder
-                if hasattr(sys, '_MEIPASS'):
-                    meipass_dir = sys._MEIPASS
-                    logger.info(f"📦 Running as PyInstaller bundle")
-                    logger.info(f"   Executable dir: {bundle_dir}")
-                    logger.info(f"   Temp extract dir: {meipass_dir}")
-                else:
-                    meipass_dir = bundle_dir
-                    logger.info(f"📦 Running as compiled executable (no _MEIPASS)")
-            else:
-                # Running as script
-                bundle_dir = os.path.dirname(os.path.abspath(__file__))
-                meipass_dir = bundle_dir
-                logger.info(f"🐍 Running as Python script from: {bundle_dir}")
-
-            wkhtmltopdf_paths = [
-                # Check in PyInstaller temp directory (where bundled files are extracted)
-                os.path.join(meipass_dir, "wkhtmltopdf.exe") if hasattr(sys, '_MEIPASS') else None,
-                # Check in the same directory as the executable (for bundled version)
-                os.path.join(bundle_dir, "wkhtmltopdf.exe"),
-                # Check in standard installation paths
-                r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe",
-                r"C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe",
-                # Check in script directory (for development)
-                os.path.join(os.path.dirname(os.path.abspath(__file__)), "wkhtmltopdf.exe"),
-            ]
-
-            # Remove None values
-            wkhtmltopdf_paths = [p for p in wkhtmltopdf_paths if p is not None]
-
-            wkhtmltopdf_path = None
-            logger.info(f"🔍 Searching for wkhtmltopdf.exe in {len(wkhtmltopdf_paths)} locations...")
-            for path in wkhtmltopdf_paths:
-                logger.info(f"   Checking: {path}")
-                if os.path.exists(path):
-                    wkhtmltopdf_path = path
-                    logger.info(f"✅ Found wkhtmltopdf at: {path}")
-                    break
-                else:
-                    logger.info(f"   ❌ Not found")
-
-            if not wkhtmltopdf_path:
-                logger.error("❌ wkhtmltopdf.exe not found in any location!")
-                logger.error(f"   Searched locations: {wkhtmltopdf_paths}")
-                logger.error("   Falling back to ReportLab renderer...")
-                raise Exception("wkhtmltopdf not installed")
-
-            # Inject CSS to make title, company name, and address smaller
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Add CSS to adjust font sizes and improve text rendering
-            style_tag = soup.new_tag('style')
-            style_tag.string = """
-                /* Improve text rendering for better readability */
-                * {
-                    -webkit-font-smoothing: antialiased !important;
-                    -moz-osx-font-smoothing: grayscale !important;
-                    text-rendering: optimizeLegibility !important;
-                }
-
-                /* Center the "Fature" title */
-                h1 {
-                    text-align: center !important;
-                    font-size: 18px !important;
-                    margin: 5px 0 !important;
-                    font-weight: bold !important;
-                }
-
-                .title1 h1 {
-                    font-size: 18px !important;
-                    margin: 5px 0 !important;
-                    text-align: center !important;
-                }
-
-                .tds-footer {
-                    font-size: 14px !important;
-                }
-
-                /* Increase Artikull column font size for Full Invoice (4-column table) */
-                .columnsPershkrim {
-                    font-size: 14px !important;
-                    font-weight: 600 !important;
-                }
-
-                /* Increase Artikull column font size for Fature Porosi (2-column table) */
-                .columnsPershkrim_urdhri {
-                    font-size: 15px !important;
-                    font-weight: 600 !important;
-                }
-
-                /* Improve overall text clarity */
-                body, td, th, p, span, div {
-                    -webkit-font-smoothing: antialiased !important;
-                    -moz-osx-font-smoothing: grayscale !important;
-                }
-            """
-
-            if soup.head:
-                soup.head.append(style_tag)
-            else:
-                head = soup.new_tag('head')
-                head.append(style_tag)
-                if soup.html:
-                    soup.html.insert(0, head)
-
-            modified_html = str(soup)
-
-            # Create temp HTML file with modified CSS
-            html_fd, html_path = tempfile.mkstemp(suffix='.html')
-            with os.fdopen(html_fd, 'w', encoding='utf-8') as f:
-                f.write(modified_html)
-
-            # Create temp PDF file
-            pdf_fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
-            os.close(pdf_fd)
-
-            # Configure wkhtmltopdf
-            config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path)
-
-            # Same options as print_server/app.py
-            options = {
-                'page-width': '80mm',
-                'page-height': '297mm',
-                'margin-top': '0mm',
-                'margin-bottom': '0mm',
-                'margin-left': '0mm',
-                'margin-right': '0mm',
-                'zoom': 1,
-                'disable-smart-shrinking': '',
-            }
+            copies = max(1, int(data.get('copies') or profile.get('copies', 1)))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid copies value {data.get('copies')!r} - printing one copy")
+            copies = 1
+        return copies, data.get('copy_marker', profile.get('copy_marker'))
 
-            # Convert HTML to PDF
-            pdfkit.from_file(html_path, pdf_path, options=options, configuration=config)
+    def _create_printer_dc(self, hprinter, printer_name, copies=1):
+        """Printer device context; returns (dc, True) when the driver prints the copies itself"""
+        import win32ui
 
-            # Clean up temp HTML file
+        if copies > 1:
             try:
-                os.unlink(html_path)
-            except:
-                pass
+                import win32gui
+
+                devmode = win32print.GetPrinter(hprinter, 2)['pDevMode']
+                if devmode is not None:
+                    devmode.Copies = copies
+                    devmode.Fields |= win32con.DM_COPIES
+                    hdc = win32ui.CreateDCFromHandle(win32gui.CreateDC('WINSPOOL', printer_name, devmode))
+                    logger.info(f"Driver prints {copies} copies (DEVMODE)")
+                    return hdc, True
+            except Exception as e:
+                logger.warning(f"Driver copies unavailable, printing each copy: {str(e)}")
 
-            logger.info(f"HTML converted to PDF with wkhtmltopdf: {pdf_path}")
-            return pdf_path
+        hdc = win32ui.CreateDC()
+        hdc.CreatePrinterDC(printer_name)
+        return hdc, False
 
-        except ImportError:
-            # pdfkit not installed - silently raise to trigger fallback
-            raise Exception("pdfkit library not installed")
-        except Exception as e:
-            # Any error (missing executable, conversion failure) - silently raise to trigger fallback
-            raise
+    def _render_marked_copy(self, html_content, marker, printer_name):
+        """PDF of a receipt copy with a marker line on top, painted from the cached display list
 
-    def _convert_html_to_pdf_weasyprint(self, html_content):
-        """Convert HTML to PDF using WeasyPrint (requires GTK on Windows)"""
-        try:
-            from weasyprint import HTML, CSS
-
-            # Create a temporary file for the PDF
-            pdf_fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
-            os.close(pdf_fd)
-
-            # Add custom CSS for better receipt printing
-            custom_css = CSS(string='''
-                @page {
-                    size: 80mm auto;
-                    margin: 0;
-                    padding: 0;
-                }
-                body {
-                    margin: 0;
-                    padding: 5mm;
-                    font-family: Arial, sans-serif;
-                }
-            ''')
+        Returns None when the receipt isn't laid out in this process (copies are then unmarked).
+        """
+        _, font_scale = self._get_render_settings()
+        display_list = self.display_list_cache.get(self.display_list_cache.make_key(html_content, font_scale))
+        if display_list is None or not display_list.items:
+            logger.info(f"No cached display list - printing copies without the '{marker}' marker")
+            return None
 
-            # Convert HTML to PDF
-            HTML(string=html_content).write_pdf(pdf_path, stylesheets=[custom_css])
+        from reportlab.lib.units import mm
+        from display_list import marked_copy, paint_pdf
 
-            logger.info(f"HTML converted to PDF with WeasyPrint: {pdf_path}")
-            return pdf_path
+        max_length_mm = float(self.get_printer_profile(printer_name).get('max_length_mm', Config.MAX_PAGE_LENGTH_MM))
+        return paint_pdf(marked_copy(display_list, marker), 5 * mm, 5 * mm, max_length_mm * mm, 20 * mm, 10 * mm)
 
+    def _render_cache_key(self, html_content, profile):
+        """Render cache key of a document under the converter that would render it now"""
+        _, font_scale = self._get_render_settings()
+        return self.render_cache.make_key(html_content, self._expected_converter(html_content), font_scale, profile)
+
+    def _stream_converter(self, html_content):
+        """Converter to render a long document incrementally with, or None to render it whole
+
+        Streaming is only used where it prints what the normal path would: documents the
+        ReportLab renderer gets anyway, and table receipts rendered in-process, whose display
+        list is then paginated page by page (with render workers they go to the pool instead).
+        """
+        if Config.STREAM_RENDER_MIN_ROWS <= 0 or html_content.count('<tr') < Config.STREAM_RENDER_MIN_ROWS:
+            return None
+        converter = self._expected_converter(html_content)
+        if converter == 'reportlab' or (converter == 'receipt' and self._get_render_pool() is None):
+            return converter
+        return None
+
+    def _iter_stream_pdf(self, html_content, converter, max_length_mm):
+        """PDF chunks of a long document rendered by converter ('reportlab' or 'receipt')"""
+        try:
+            if converter == 'receipt':
+                from reportlab.lib.units import mm
+                from display_list import iter_paint_pdf
+
+                # Same margins and page breaks as _convert_receipt_html_to_pdf
+                display_list = self.get_receipt_display_list(html_content)
+                pages = iter_paint_pdf(display_list, 5 * mm, 5 * mm, max_length_mm * mm, 20 * mm, 10 * mm)
+            else:
+                pages = self.iter_html_pdf(html_content, max_length_mm)
+            yield from pages
         except Exception as e:
-            logger.error(f"Error converting HTML to PDF with WeasyPrint: {str(e)}")
+            # Failures still trip the breaker; no latency is recorded (it includes spooling)
+            self.converter_selector.record_failure(converter, self._document_kind(html_content), e)
             raise
 
-    def _convert_html_to_pdf_reportlab(self, html_content):
-        """Convert HTML to PDF using reportlab and BeautifulSoup"""
-        try:
-            from reportlab.lib.units import mm
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import portrait
-            from bs4 import BeautifulSoup
-            import re
-
-            # Create a temporary file for the PDF
-            pdf_fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
-            os.close(pdf_fd)
-
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Extract CSS styles from <style> tags with improved parser
-            css_rules = {}
-            for style_tag in soup.find_all('style'):
-                css_text = style_tag.string
-                if css_text:
-                    # Remove comments
-                    css_text = re.sub(r'/\*.*?\*/', '', css_text, flags=re.DOTALL)
-
-                    # Match CSS rules: selector { properties }
-                    # This handles both .class and tag selectors
-                    pattern = r'([\.#]?[a-zA-Z0-9_-]+(?:\s+[a-zA-Z0-9_-]+)*)\s*\{([^}]+)\}'
-                    matches = re.findall(pattern, css_text, re.MULTILINE)
-
-                    for selector, rules in matches:
-                        selector = selector.strip()
-
-                        # Extract class name (remove the dot)
-                        if selector.startswith('.'):
-                            rule_name = selector[1:]
-                        else:
-                            rule_name = selector
-
-                        # Skip complex selectors for now
-                        if ' ' in rule_name or '>' in rule_name or '+' in rule_name:
-                            continue
-
-                        css_rules[rule_name] = {}
-
-                        # Parse individual properties
-                        for rule in rules.split(';'):
-                            if ':' in rule:
-                                prop, value = rule.split(':', 1)
-                                prop = prop.strip()
-                                value = value.strip().replace('!important', '').strip()
-                                css_rules[rule_name][prop] = value
-
-            # Debug: Log parsed CSS rules
-            logger.info(f"Parsed {len(css_rules)} CSS rules")
-            for rule_name in list(css_rules.keys())[:5]:  # Log first 5
-                logger.info(f"  CSS rule '{rule_name}': {css_rules[rule_name]}")
-
-            def get_style(element, inherit_from_parent=True):
-                """Get computed style for an element, inheriting from parent"""
-                style = {
-                    'font-size': 9,
-                    'font-weight': 'normal',
-                    'text-align': 'left',
-                    'bold': False
-                }
-
-                element_classes = element.get('class', [])
-                logger.debug(f"Getting style for {element.name} with classes: {element_classes}")
-
-                # Inherit styles from parent elements if requested
-                if inherit_from_parent and element.parent:
-                    parent = element.parent
-                    # Check parent's classes for inherited styles
-                    parent_classes = parent.get('class', [])
-                    for class_name in parent_classes:
-                        if class_name in css_rules:
-                            parent_css = css_rules[class_name]
-                            if 'font-size' in parent_css:
-                                size_str = parent_css['font-size'].replace('px', '').replace('!important', '').strip()
-                                try:
-                                    style['font-size'] = int(float(size_str))
-                                except:
-                                    pass
-                            if 'font-weight' in parent_css:
-                                weight = parent_css['font-weight'].replace('!important', '').strip()
-                                if weight in ['bold', '500', '600', '700', '800', '900']:
-                                    style['bold'] = True
-                            if 'text-align' in parent_css:
-                                align = parent_css['text-align'].replace('!important', '').strip()
-                                style['text-align'] = align
-
-                # Apply tag-level CSS
-                if element.name in css_rules:
-                    tag_css = css_rules[element.name]
-                    if 'font-size' in tag_css:
-                        size_str = tag_css['font-size'].replace('px', '').replace('!important', '').strip()
-                        try:
-                            style['font-size'] = int(float(size_str))
-                        except:
-                            pass
-                    if 'font-weight' in tag_css:
-                        weight = tag_css['font-weight'].replace('!important', '').strip()
-                        if weight in ['bold', '600', '700', '800', '900']:
-                            style['bold'] = True
-                    if 'text-align' in tag_css:
-                        align = tag_css['text-align'].replace('!important', '').strip()
-                        style['text-align'] = align
-
-                # Apply class-level CSS (overrides tag and parent styles)
-                classes = element.get('class', [])
-                for class_name in classes:
-                    if class_name in css_rules:
-                        class_css = css_rules[class_name]
-                        if 'font-size' in class_css:
-                            size_str = class_css['font-size'].replace('px', '').replace('!important', '').strip()
-                            try:
-                                style['font-size'] = int(float(size_str))
-                            except:
-                                pass
-                        if 'font-weight' in class_css:
-                            weight = class_css['font-weight'].replace('!important', '').strip()
-                            if weight in ['bold', '500', '600', '700', '800', '900']:
-                                style['bold'] = True
-                        if 'text-align' in class_css:
-                            align = class_css['text-align'].replace('!important', '').strip()
-                            style['text-align'] = align
-
-                # Check inline styles (highest priority)
-                inline_style = element.get('style', '')
-                if inline_style:
-                    if 'bold' in inline_style or 'font-weight' in inline_style:
-                        style['bold'] = True
-                    if 'text-align' in inline_style:
-                        if 'center' in inline_style:
-                            style['text-align'] = 'center'
-                        elif 'right' in inline_style:
-                            style['text-align'] = 'right'
-                    if 'font-size' in inline_style:
-                        size_match = re.search(r'font-size:\s*(\d+)px', inline_style)
-                        if size_match:
-                            try:
-                                style['font-size'] = int(size_match.group(1))
-                            except:
-                                pass
-
-                return style
-
-            # Create PDF with 80mm width (thermal printer size)
-            width = 80 * mm
-            height = 297 * mm  # A4 height, will auto-adjust
-            margin_left = 5 * mm
-            margin_right = 5 * mm
-            usable_width = width - margin_left - margin_right
-
-            c = canvas.Canvas(pdf_path, pagesize=portrait((width, height)))
-
-            y_position = height - 10 * mm
-            line_height = 4 * mm
-
-            def add_text(text, font_size=9, align="left", bold=False):
-                nonlocal y_position
-
-                font_name = "Helvetica-Bold" if bold else "Helvetica"
-                c.setFont(font_name, font_size)
-
-                # Adjust line height based on font size
-                current_line_height = max(line_height, font_size * 0.35)
-
-                # Word wrap
-                words = text.split()
-                line = ""
-                lines_to_print = []
-
-                for word in words:
-                    test_line = line + " " + word if line else word
-                    if c.stringWidth(test_line, font_name, font_size) < usable_width:
-                        line = test_line
-                    else:
-                        if line:
-                            lines_to_print.append(line)
-                        line = word
-
-                if line:
-                    lines_to_print.append(line)
-
-                # Print each line
-                for text_line in lines_to_print:
-                    if y_position < 20 * mm:
-                        c.showPage()
-                        y_position = height - 10 * mm
-                        c.setFont(font_name, font_size)
-
-                    x_pos = margin_left
-                    if align == "center":
-                        text_width = c.stringWidth(text_line, font_name, font_size)
-                        x_pos = (width - text_width) / 2
-                    elif align == "right":
-                        text_width = c.stringWidth(text_line, font_name, font_size)
-                        x_pos = width - margin_right - text_width
-
-                    c.drawString(x_pos, y_position, text_line)
-                    y_position -= current_line_height
-
-            def add_line(style="dashed"):
-                nonlocal y_position
-                y_position -= 2 * mm
-
-                if y_position < 20 * mm:
-                    c.showPage()
-                    y_position = height - 10 * mm
-
-                if style == "dashed":
-                    c.setDash(3, 3)
-                else:
-                    c.setDash(1, 0)
+    def iter_html_pdf(self, html_content, max_length_mm):
+        """PDF of an HTML document in chunks, each finished page as soon as it is full"""
+        from stream_render import iter_html_pdf
+        return iter_html_pdf(html_content, max_length_mm)
+
+    def _print_escpos(self, html_content, printer_name, document_name='Print Job', copies=1, copy_marker=None):
+        """Print a table-based receipt as native ESC/POS commands in a RAW job
+
+        "backend": "escpos" prints text mode; "escpos_raster" prints the rasterized layout
+        (full typography) as GS v 0 bands streamed to the printer while they are produced.
+        Printer profile keys: "columns" (default 48), "codepage" (default cp858), "cut" (default true),
+        "dpi" (default 203), "dither" (default false - plain threshold);
+        "tcp"/"file" send the commands to a network printer or a file instead of the spooler.
+        Copies are sent in the same job, each cut; copies after the first carry copy_marker.
+        Returns None when the document is not a table-based receipt (caller uses the PDF path).
+        """
+        display_list = self.get_receipt_display_list(html_content)
+        if not display_list.items:
+            logger.info("Not a table-based receipt - using the PDF path for ESC/POS printer")
+            return None
+
+        from spool_backends import RawPrinterBackend, get_byte_backend
+
+        profile = self.get_printer_profile(printer_name)
+        backend = get_byte_backend(printer_name, profile) or RawPrinterBackend(printer_name)
+
+        copy_list = display_list
+        if copies > 1 and copy_marker:
+            from display_list import marked_copy
+            copy_list = marked_copy(display_list, copy_marker)
+
+        if profile.get('backend') == 'escpos_raster':
+            from escpos_backend import iter_escpos_display_list
+
+            def raster(dl):
+                return iter_escpos_display_list(
+                    dl,
+                    dpi=int(profile.get('dpi', 203)),
+                    dither=profile.get('dither', False),
+                    cut=profile.get('cut', True),
+                )
 
-                c.line(margin_left, y_position, width - margin_right, y_position)
-                c.setDash(1, 0)  # Reset to solid
-                y_position -= 3 * mm
+            bands = raster(display_list)
+            if copies > 1:
+                # Rasterized once per version, the bands are re-sent for every copy
+                bands = list(bands)
+                copy_bands = list(raster(copy_list)) if copy_list is not display_list else bands
+                bands = itertools.chain(bands, *([copy_bands] * (copies - 1)))
+            logger.info(f"🧾 Streaming ESC/POS raster receipt to {printer_name} via {backend.name} backend"
+                        + (f" ({copies} copies)" if copies > 1 else ""))
+            return backend.send_stream(bands, document_name)
+
+        from escpos_backend import paint_escpos_text
+
+        def text_commands(dl):
+            return paint_escpos_text(
+                dl,
+                columns=int(profile.get('columns', 48)),
+                codepage=profile.get('codepage', 'cp858'),
+                cut=profile.get('cut', True),
+            )
+
+        escpos_data = text_commands(display_list)
+        copy_data = text_commands(copy_list) if copy_list is not display_list else escpos_data
+
+        logger.info(f"🧾 Sending ESC/POS receipt to {printer_name} via {backend.name} backend ({len(escpos_data)} bytes"
+                    + (f", {copies} copies)" if copies > 1 else ")"))
+        if copies > 1:
+            return backend.send_stream([escpos_data] + [copy_data] * (copies - 1), document_name)
+        return backend.send(escpos_data, document_name)
+
+    def _print_gdi(self, html_content, printer_name, document_name='Print Job', copies=1, copy_marker=None):
+        """Paint a table-based receipt straight onto the printer's device context - no PDF, no viewer
+
+        For drivers that print PDFs poorly (or slowly); enabled with the profile key "painter": "gdi".
+        Unmarked copies are left to the driver when it supports them, otherwise (and for marked
+        copies) every copy is painted as its own page.
+        Returns None when the document is not a table-based receipt (caller uses the PDF path).
+        """
+        display_list = self.get_receipt_display_list(html_content)
+        if not display_list.items:
+            logger.info("Not a table-based receipt - using the PDF path for GDI printer")
+            return None
 
-            # Track processed elements to avoid duplicates
-            processed_elements = set()
+        from reportlab.lib.units import mm
+        from display_list import marked_copy, paint_gdi
 
-            # Process HTML elements (skip those inside tables - handled separately)
-            for element in soup.find_all(['h1', 'h2', 'p', 'hr', 'div']):
-                # Skip if inside a table (tables are handled separately)
-                if element.find_parent('table'):
-                    continue
+        copy_list = display_list
+        if copies > 1 and copy_marker:
+            copy_list = marked_copy(display_list, copy_marker)
 
-                # Skip if already processed
-                if id(element) in processed_elements:
-                    continue
+        hprinter = win32print.OpenPrinter(printer_name)
+        hdc = None
+        try:
+            hdc, driver_copies = self._create_printer_dc(
+                hprinter, printer_name, copies if copy_list is display_list else 1
+            )
+            hdc.StartDoc(document_name)
+            dpi = hdc.GetDeviceCaps(win32con.LOGPIXELSY)
+            page_height = hdc.GetDeviceCaps(win32con.VERTRES)
+
+            pages = [display_list] if driver_copies else [display_list] + [copy_list] * (copies - 1)
+            for page_list in pages:
+                hdc.StartPage()
+                paint_gdi(page_list, hdc, dpi, 5 * mm, page_height)
+                hdc.EndPage()
+            hdc.EndDoc()
 
-                # Get text and computed style
-                text = element.get_text().strip()
-                if not text and element.name != 'hr':
-                    continue
+            logger.info(f"🖌️ Painted receipt onto {printer_name} DC ({len(display_list.items)} items"
+                        + (f", {copies} copies)" if copies > 1 else ")"))
+            return True
+        finally:
+            if hdc is not None:
+                hdc.DeleteDC()
+            win32print.ClosePrinter(hprinter)
 
-                # Mark as processed
-                processed_elements.add(id(element))
-
-                style = get_style(element)
-
-                # Handle different elements
-                if element.name == 'h1':
-                    # h1 typically larger and bold - inherit parent styles
-                    size = style.get('font-size', 16)
-                    add_text(text, font_size=size, align=style['text-align'], bold=True)
-                    y_position -= 2 * mm
-                elif element.name == 'h2':
-                    # h2 medium size and bold
-                    size = style.get('font-size', 14)
-                    add_text(text, font_size=size, align=style['text-align'], bold=True)
-                    y_position -= 2 * mm
-                elif element.name == 'hr':
-                    # Check if dashed
-                    style_attr = element.get('style', '')
-                    class_attr = element.get('class', [])
-                    if 'dashed' in style_attr or any('dashed' in str(c) for c in class_attr):
-                        add_line("dashed")
-                    else:
-                        add_line("solid")
-                elif text:
-                    # Use computed style
-                    add_text(text, font_size=style['font-size'], align=style['text-align'], bold=style['bold'])
-
-            # Handle tables with CSS styling
-            for table in soup.find_all('table'):
-                table_rows = []
-                for row in table.find_all('tr'):
-                    cells = row.find_all(['td', 'th'])
-                    if cells:
-                        # Store cell data with styles
-                        cell_info = []
-                        for cell in cells:
-                            # Get the cell's own style
-                            cell_style = get_style(cell, inherit_from_parent=False)
-
-                            # Check if cell contains a heading (h1, h2) - inherit cell's classes
-                            child_heading = cell.find(['h1', 'h2'])
-                            if child_heading:
-                                # Heading inherits from parent cell's classes
-                                child_style = get_style(child_heading, inherit_from_parent=True)
-                                cell_style = child_style
-
-                            cell_info.append({
-                                'text': cell.get_text().strip(),
-                                'style': cell_style,
-                                'is_th': cell.name == 'th',
-                                'has_heading': child_heading is not None
-                            })
-                        table_rows.append(cell_info)
-
-                # Print table rows with proper styling
-                for row_cells in table_rows:
-                    if len(row_cells) == 1:
-                        # Single column (like title or single info line)
-                        cell = row_cells[0]
-                        font_size = cell['style']['font-size']
-
-                        # Add extra spacing for headings
-                        if cell['has_heading']:
-                            y_position -= 1 * mm
-
-                        add_text(
-                            cell['text'],
-                            font_size=font_size,
-                            align=cell['style']['text-align'],
-                            bold=cell['style']['bold'] or cell['is_th']
-                        )
-
-                        # Add extra spacing after headings
-                        if cell['has_heading']:
-                            y_position -= 1 * mm
-                    elif len(row_cells) == 2:
-                        # Two columns - formatted side by side
-                        left_cell = row_cells[0]
-                        right_cell = row_cells[1]
-
-                        # Determine alignment based on styles
-                        if right_cell['style']['text-align'] == 'right':
-                            line = f"{left_cell['text']:<35} {right_cell['text']:>10}"
-                        else:
-                            line = f"{left_cell['text']:<25} {right_cell['text']:<20}"
-
-                        # Use the larger font size and check if either is bold
-                        font_size = max(left_cell['style']['font-size'], right_cell['style']['font-size'])
-                        is_bold = left_cell['style']['bold'] or right_cell['style']['bold'] or left_cell['is_th'] or right_cell['is_th']
-
-                        add_text(line, font_size=font_size, align="left", bold=is_bold)
-                    elif len(row_cells) >= 3:
-                        # Multiple columns
-                        if len(row_cells) == 4:
-                            # 4 columns (Artikull, Sasia, Cmimi, Vlera)
-                            # Don't truncate Artikull - let it wrap naturally
-                            # Format: Full Artikull text + aligned numeric columns
-                            artikull_full = row_cells[0]['text']
-                            sasia = row_cells[1]['text']
-                            cmimi = row_cells[2]['text']
-                            vlera = row_cells[3]['text']
-
-                            # Build line with full Artikull text (no truncation)
-                            # Only align the numeric columns
-                            line = f"{artikull_full}  {sasia:>6} {cmimi:>8} {vlera:>8}"
-                        else:
-                            # General multi-column formatting
-                            line = "  ".join([cell['text'] for cell in row_cells])
-
-                        # Use max font size and check if any cell is bold
-                        font_size = max([cell['style']['font-size'] for cell in row_cells])
-                        is_bold = any(cell['style']['bold'] or cell['is_th'] for cell in row_cells)
-
-                        add_text(line, font_size=font_size, align="left", bold=is_bold)
-
-                y_position -= 2 * mm  # Space after table
-
-            c.save()
-            logger.info(f"HTML converted to PDF with ReportLab: {pdf_path}")
-            return pdf_path
+    def _write_scratch_file(self, data, suffix='.pdf'):
+        """Write bytes (or an iterable of byte chunks) to the scratch directory for print methods that need a file path"""
+        return self.scratch_janitor.create(data, suffix)
 
-        except Exception as e:
-            logger.error(f"Error converting HTML to PDF with ReportLab: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            raise
+    def _print_pdf_data(self, pdf_data, printer_name, document_name='Print Job', copies=1):
+        """Print PDF bytes using Windows printing
+
+        Backends that accept bytes (TCP, RAW spooler job) consume the data directly;
+        a file is only written (to the scratch directory) for SumatraPDF / ShellExecute.
+        pdf_data may also be an iterable of chunks (a streamed render), which byte backends
+        send as they are produced. Copies are printed by SumatraPDF through the driver;
+        the other methods send the same bytes once per copy.
+        The scratch file is handed to the janitor afterwards - nothing here waits for the spooler.
+        """
+        from spool_backends import RawPrinterBackend, get_byte_backend
 
-    def _print_pdf_file(self, pdf_path, printer_name):
-        """Print a PDF file using Windows printing"""
+        pdf_path = None
+        shell_executed = False  # The file is then read by another application some time later
         try:
-            # Method 1: Try using SumatraPDF (lightweight and good for silent printing)
-            # Check if running as PyInstaller bundle
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                bundle_dir = os.path.dirname(sys.executable)
-            else:
-                # Running as script
-                bundle_dir = os.path.dirname(os.path.abspath(__file__))
-
-            sumatra_paths = [
-                # Check in the same directory as the executable (for bundled version)
-                os.path.join(bundle_dir, "SumatraPDF.exe"),
-                # Check in standard installation paths
-                r"C:\Program Files\SumatraPDF\SumatraPDF.exe",
-                r"C:\Program Files (x86)\SumatraPDF\SumatraPDF.exe",
-            ]
-
-            logger.info("🔍 Searching for SumatraPDF.exe...")
-            for sumatra_path in sumatra_paths:
-                logger.debug(f"   Checking: {sumatra_path}")
-                if os.path.exists(sumatra_path):
-                    logger.info(f"✅ Found SumatraPDF at: {sumatra_path}")
-                    logger.info(f"🖨️ Using SumatraPDF to print PDF to {printer_name}...")
-                    cmd = [sumatra_path, "-print-to", printer_name, "-silent", pdf_path]
-                    result = subprocess.run(cmd, capture_output=True)
-                    if result.returncode == 0:
+            # Method 0: Printer profile routes the bytes straight to a byte backend
+            backend = get_byte_backend(printer_name, self.get_printer_profile(printer_name))
+            if backend:
+                logger.info(f"🖨️ Sending PDF bytes to {printer_name} via {backend.name} backend...")
+                if isinstance(pdf_data, bytes):
+                    return all(backend.send(pdf_data, document_name) for _ in range(copies))
+                return backend.send_stream(pdf_data, document_name)
+
+            # Method 1: SumatraPDF (lightweight and good for silent printing), through the
+            # resident helper that prints queued files in one run
+            helper = self._get_sumatra_helper()
+            if helper:
+                logger.info(f"🖨️ Using SumatraPDF to print PDF to {printer_name}...")
+                pdf_path = self._write_scratch_file(pdf_data)
+                try:
+                    if helper.print_file(pdf_path, printer_name, copies):
                         logger.info(f"✅ PDF printed successfully using SumatraPDF to {printer_name}")
                         return True
-                    else:
-                        logger.warning(f"⚠️ SumatraPDF failed: {result.stderr}")
-                else:
-                    logger.debug(f"   ❌ Not found")
+                except TimeoutError as e:
+                    # The printer isn't taking jobs - another method would hang or print twice
+                    logger.error(f"❌ {str(e)}")
+                    return False
 
             # Method 2: Try Windows ShellExecute
-            logger.info("SumatraPDF not found, trying Windows ShellExecute...")
+            logger.info("SumatraPDF not available, trying Windows ShellExecute...")
             try:
                 import win32api
-                win32api.ShellExecute(
-                    0,
-                    "print",
-                    pdf_path,
-                    f'/d:"{printer_name}"',
-                    ".",
-                    0
-                )
+                if pdf_path is None:
+                    pdf_path = self._write_scratch_file(pdf_data)
+                for _ in range(copies):
+                    win32api.ShellExecute(
+                        0,
+                        "print",
+                        pdf_path,
+                        f'/d:"{printer_name}"',
+                        ".",
+                        0
+                    )
                 logger.info(f"✅ PDF sent to printer using ShellExecute: {printer_name}")
-                import time
-                time.sleep(1)
+                shell_executed = True
                 return True
             except Exception as shell_error:
                 logger.warning(f"⚠️ ShellExecute failed: {shell_error}")
@@ -1741,50 +1393,38 @@ class PrinterHandler:
             # Method 3: Send raw PDF bytes to printer using win32print
             # This is more reliable when ShellExecute fails
             logger.info("📄 Using win32print to send raw PDF data...")
-
-            # Read PDF file as binary
-            with open(pdf_path, 'rb') as pdf_file:
-                pdf_data = pdf_file.read()
-
-            # Open printer
-            hprinter = win32print.OpenPrinter(printer_name)
-
             try:
-                # Start a print job
-                job_id = win32print.StartDocPrinter(hprinter, 1, (os.path.basename(pdf_path), None, "RAW"))
-                logger.info(f"Started print job {job_id} on {printer_name}")
-
-                # Start the first page
-                win32print.StartPagePrinter(hprinter)
-
-                # Send PDF data to printer
-                win32print.WritePrinter(hprinter, pdf_data)
-                logger.info(f"Sent {len(pdf_data)} bytes to printer")
-
-                # End the page and document
-                win32print.EndPagePrinter(hprinter)
-                win32print.EndDocPrinter(hprinter)
-
+                if not isinstance(pdf_data, bytes):
+                    # A streamed render has already been written to the scratch file
+                    if pdf_path is None:
+                        pdf_path = self._write_scratch_file(pdf_data)
+                    with open(pdf_path, 'rb') as f:
+                        pdf_data = f.read()
+                raw_backend = RawPrinterBackend(printer_name)
+                result = all(raw_backend.send(pdf_data, document_name) for _ in range(copies))
                 logger.info(f"✅ PDF printed successfully using raw printer method")
-                return True
-
+                return result
             except Exception as raw_error:
                 logger.error(f"❌ Raw printing also failed: {raw_error}")
                 import traceback
                 logger.error(traceback.format_exc())
                 return False
-            finally:
-                win32print.ClosePrinter(hprinter)
 
         except Exception as e:
-            logger.error(f"❌ Error printing PDF file: {str(e)}")
+            logger.error(f"❌ Error printing PDF data: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
             return False
 
+        finally:
+            # The scratch file (only written for path-based methods) is deleted once it is spooled
+            if pdf_path:
+                self.scratch_janitor.release(pdf_path, printer_name, confirmed=not shell_executed)
+
     def _print_html(self, hdc, data, page_width, page_height):
         """Print HTML content by converting to PDF first"""
-        pdf_path = None
+        import win32ui
+
         try:
             html_content = data.get('html', data.get('content', ''))
 
@@ -1794,9 +1434,9 @@ class PrinterHandler:
 
             # Convert HTML to PDF
             logger.info("Converting HTML to PDF...")
-            pdf_path = self._convert_html_to_pdf(html_content)
+            pdf_data, _ = self._convert_html_to_pdf(html_content, data.get('printer_name', self.default_printer))
 
-            if not pdf_path or not os.path.exists(pdf_path):
+            if not pdf_data:
                 raise Exception("Failed to create PDF from HTML")
 
             # End the current document (we'll print the PDF separately)
@@ -1807,9 +1447,9 @@ class PrinterHandler:
             # Get printer name from data
             printer_name = data.get('printer_name', self.default_printer)
 
-            # Print the PDF file
+            # Print the PDF data
             logger.info(f"Printing PDF to {printer_name}...")
-            self._print_pdf_file(pdf_path, printer_name)
+            self._print_pdf_data(pdf_data, printer_name, data.get('document_name', 'Print Job'))
 
             logger.info("HTML printed successfully via PDF conversion")
 
@@ -1842,18 +1482,6 @@ class PrinterHandler:
             except Exception as fallback_error:
                 logger.error(f"Fallback printing also failed: {str(fallback_error)}")
 
-        finally:
-            # Clean up temporary PDF file
-            if pdf_path and os.path.exists(pdf_path):
-                try:
-                    # Wait a bit for the print job to be spooled
-                    import time
-                    time.sleep(2)
-                    os.remove(pdf_path)
-                    logger.info(f"Cleaned up temporary PDF: {pdf_path}")
-                except Exception as e:
-                    logger.warning(f"Could not delete temporary PDF: {str(e)}")
-
     def add_to_queue(self, data, printer_name):
         """Add failed print job to queue"""
         queue_item = {
@@ -1865,8 +1493,21 @@ class PrinterHandler:
         self.print_queue.append(queue_item)
         logger.info(f"Added to queue: {printer_name} (Queue size: {len(self.print_queue)})")
 
+    def purge_expired_jobs(self):
+        """Drop queued jobs that are past their deadline; returns the dropped items"""
+        expired = []
+        for item in list(self.print_queue):
+            try:
+                check_deadline(item['data'], self.get_job_ttl(item['data'], item['printer_name']))
+            except JobExpired as e:
+                self.print_queue.remove(item)
+                expired.append(item)
+                logger.info(f"⏰ Dropped expired job from queue: {str(e)}")
+        return expired
+
     def get_queue(self):
-        """Get current print queue including Windows spooler jobs"""
+        """Get current print queue including Windows spooler jobs (expired jobs are dropped first)"""
+        self.purge_expired_jobs()
         combined_queue = list(self.print_queue)  # Start with our internal queue
 
         # Add jobs from Windows print spooler for all printers
@@ -1905,10 +1546,14 @@ class PrinterHandler:
         return combined_queue
 
     def retry_queue_item(self, index):
-        """Retry a specific queue item"""
+        """Retry a specific queue item (raises JobExpired, after removing it, when it is past its deadline)"""
         if 0 <= index < len(self.print_queue):
             item = self.print_queue[index]
-            result = self.print_document(item['data'], item['printer_name'])
+            try:
+                result = self.print_document(item['data'], item['printer_name'])
+            except JobExpired:
+                self.print_queue.remove(item)
+                raise
             if result:
                 self.print_queue.pop(index)
                 logger.info(f"Queue item {index} printed successfully")
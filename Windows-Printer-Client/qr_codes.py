@@ -0,0 +1,54 @@
+"""
+QR Code Module
+Vector QR codes for fiscal receipts (NIVF/NSLF), drawn straight onto the canvas
+"""
+import functools
+
+
+@functools.lru_cache(maxsize=256)
+def get_qr_matrix(payload):
+    """Encode a payload into a QR module matrix (tuple of rows of booleans, including a 1-module border)
+
+    Cached by payload so reprints of the same fiscal receipt skip the encode step.
+    """
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=1,
+        border=1,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(tuple(bool(module) for module in row) for row in qr.get_matrix())
+
+
+def iter_dark_runs(matrix):
+    """Yield (row, start_col, length) for each horizontal run of dark modules"""
+    for row_index, row in enumerate(matrix):
+        start = None
+        for col, dark in enumerate(row):
+            if dark and start is None:
+                start = col
+            elif not dark and start is not None:
+                yield row_index, start, col - start
+                start = None
+        if start is not None:
+            yield row_index, start, len(row) - start
+
+
+def draw_qr_code(canvas, payload, x, y_top, size):
+    """Draw a QR code as vector modules with its top-left corner at (x, y_top), size in points"""
+    matrix = get_qr_matrix(payload)
+    module = size / len(matrix)
+
+    # One filled path for the whole symbol - adjacent dark modules are merged into runs
+    path = canvas.beginPath()
+    for row, start, length in iter_dark_runs(matrix):
+        path.rect(x + start * module, y_top - (row + 1) * module, length * module, module)
+
+    canvas.saveState()
+    canvas.setFillColorRGB(0, 0, 0)
+    canvas.drawPath(path, stroke=0, fill=1)
+    canvas.restoreState()
@@ -0,0 +1,134 @@
+"""
+Receipt Index Module
+Single-pass row index of table-based receipts (sections, stripped texts, fiscal codes, line-only rows, headings)
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+LINE_DIV_CLASSES = ['div_line', 'dashed-line']
+FISCAL_CODE_LABELS = ('NIVF:', 'NSLF:')
+HEADER_CLASSES = ('title1', 'title1_urdhri', 'tds-footer')  # Title and company block
+FOOTER_MARKERS = ('Gjeneruar', 'Generated')
+
+
+class CellInfo:
+    """Pre-computed facts about one table cell"""
+
+    __slots__ = ('element', 'name', 'text', 'classes', 'style', 'colspan', 'heading', 'has_br', 'has_svg', 'is_line')
+
+    def __init__(self, element):
+        self.element = element
+        self.name = element.name
+        self.text = element.get_text().strip()
+        self.classes = element.get('class', [])
+        self.style = element.get('style')
+        self.colspan = element.get('colspan')
+        self.heading = element.find(['h1', 'h2'])
+        self.has_br = element.find('br') is not None
+        self.has_svg = element.find('svg') is not None
+        # A cell that only contains a separator (hr or div with dashed-line/div_line) and no text
+        has_line = element.find('div', class_=LINE_DIV_CLASSES) or element.find('hr')
+        self.is_line = bool(has_line) and not self.text
+
+
+class RowInfo:
+    """Pre-computed facts about one table row"""
+
+    __slots__ = ('element', 'section', 'cells', 'in_tfoot', 'in_tbody', 'is_line_only', 'fiscal_code')
+
+    def __init__(self, element, cells, in_tfoot, in_tbody, fiscal_code):
+        self.element = element
+        self.section = element.parent.name  # thead, tbody, tfoot or table
+        self.cells = cells
+        self.in_tfoot = in_tfoot
+        self.in_tbody = in_tbody
+        self.is_line_only = any(cell.is_line for cell in cells)
+        self.fiscal_code = fiscal_code
+
+    @property
+    def non_empty_cells(self):
+        return [cell for cell in self.cells if cell.text]
+
+
+class TableIndex:
+    """All indexed rows of one table plus the table's QR payload (first NIVF/NSLF code)"""
+
+    __slots__ = ('element', 'rows', 'qr_payload')
+
+    def __init__(self, element, rows):
+        self.element = element
+        self.rows = rows
+        self.qr_payload = next((row.fiscal_code for row in rows if row.fiscal_code is not None), "")
+
+
+def _extract_fiscal_code(row_text):
+    """Return the code after 'NIVF:'/'NSLF:' in a row's text, or None"""
+    if any(label in row_text for label in FISCAL_CODE_LABELS):
+        parts = row_text.split(':', 1)
+        if len(parts) > 1:
+            return parts[1].strip()
+    return None
+
+
+def build_row_index(soup):
+    """Index every row of every table in one traversal
+
+    Returns a list of TableIndex, in document order.
+    """
+    tables = []
+    for table in soup.find_all('table'):
+        rows = []
+        for row in table.find_all('tr'):
+            parent_names = {parent.name for parent in row.parents}
+            cells = [CellInfo(cell) for cell in row.find_all(['td', 'th'])]
+            rows.append(RowInfo(
+                row,
+                cells,
+                in_tfoot='tfoot' in parent_names,
+                in_tbody='tbody' in parent_names,
+                fiscal_code=_extract_fiscal_code(row.get_text()),
+            ))
+        tables.append(TableIndex(table, rows))
+
+    logger.debug(f"Indexed {sum(len(t.rows) for t in tables)} rows in {len(tables)} tables")
+    return tables
+
+
+def row_signature(row):
+    """Everything about a row that its layout depends on (apart from the stylesheet)"""
+    cells = tuple(
+        (cell.name, tuple(cell.element.stripped_strings) if cell.has_br else cell.text, tuple(cell.classes), cell.style, cell.colspan,
+         cell.heading.name if cell.heading else None, cell.has_br, cell.has_svg, cell.is_line)
+        for cell in row.cells
+    )
+    return row.section, row.in_tfoot, row.in_tbody, cells
+
+
+def is_single_cell(row):
+    """Title/info rows: one cell, or a colspan cell with one more"""
+    return len(row.cells) == 1 or (len(row.cells) == 2 and bool(row.cells[0].colspan))
+
+
+def find_static_regions(table):
+    """Rows of a table that are the same on every receipt of a store
+
+    Returns a list of (start, end) row ranges: the title and company block at the top of
+    the table (title1/tds-footer cells) and the "Gjeneruar" line in the footer.
+    """
+    regions = []
+    end = 0
+    while end < len(table.rows):
+        row = table.rows[end]
+        if not (row.cells and is_single_cell(row) and not row.cells[0].has_svg
+                and any(cls in HEADER_CLASSES for cls in row.cells[0].classes)):
+            break
+        end += 1
+    if end:
+        regions.append((0, end))
+
+    for number, row in enumerate(table.rows):
+        if (number >= end and row.in_tfoot and row.cells and is_single_cell(row)
+                and any(marker in row.cells[0].text for marker in FOOTER_MARKERS)):
+            regions.append((number, number + 1))
+    return regions
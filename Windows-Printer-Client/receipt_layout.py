@@ -0,0 +1,601 @@
+"""
+Receipt Layout Module
+Lays out table-based receipt HTML (CSS classes, sections, tax table, QR code) into a display list
+"""
+import logging
+import re
+
+from display_list import DisplayList
+
+logger = logging.getLogger(__name__)
+
+# Built-in receipt for warm-up: title/company block, items (one long name to wrap), total,
+# tax table, fiscal code with QR and footer - every path a real receipt takes
+WARM_UP_RECEIPT_HTML = """<html><head><style>
+.title1 { font-size: 20px; text-align: center; font-weight: bold; }
+.tds-footer { font-size: 11px; font-weight: bold; text-align: center; }
+.columnsSkontrino { font-weight: 500; font-size: 11px; }
+.columnsPershkrim { font-weight: 600; font-size: 11px; }
+</style></head><body>
+<table><thead>
+<tr><td class="title1" colspan="5"><h1>Fature Tatimore</h1></td></tr>
+<tr><td class="tds-footer" colspan="5">Warm-up</td></tr>
+<tr><td colspan="5"><div class="dashed-line"></div></td></tr>
+<tr><td class="columnsSkontrino">Data: -</td></tr>
+<tr><td class="columnsSkontrino">Tavolina: 0</td></tr>
+</thead></table>
+<table><thead><tr><th>Artikull</th><th>Sasia</th><th>Cmimi</th><th>Vlera</th></tr></thead>
+<tbody>
+<tr><td class="columnsPershkrim">Kafe</td><td>1 x</td><td>80</td><td>80</td></tr>
+<tr><td class="columnsPershkrim">Artikull me emer shume te gjate per rreshtim</td><td>2 x</td><td>100</td><td>200</td></tr>
+</tbody>
+<tr><td class="columnsTotal"><h1>Totali</h1></td><td class="columnsTotal" colspan="3"><h1>280</h1></td></tr>
+<tr><td>Tipi</td><td>TVSH</td><td>Vlera pa TVSH</td><td>Vlera me TVSH</td></tr>
+<tr><td>A</td><td>0</td><td>280</td><td>280</td></tr>
+<tfoot>
+<tr><td colspan="5">NIVF:<br>WARM-UP-0000</td></tr>
+<tr><td colspan="4"><svg width="10" height="10"></svg></td></tr>
+<tr><td colspan="5">Gjeneruar nga Warm-up</td></tr>
+</tfoot></table></body></html>"""
+
+
+def layout_receipt(html_content, font_scale, fragment_cache=None, plan_cache=None, steps=None):
+    """Lay out a table-based receipt once; returns a DisplayList for any painter
+
+    With a fragment_cache (any get/put cache), the title/company block and the "Gjeneruar"
+    footer are laid out once per content and stylesheet and placed from the cache after that.
+    With a plan_cache (LayoutPlanCache), rows follow the layout plan of receipts with the same
+    stylesheet and skeleton instead of being detected again. A steps list receives the
+    (RowStep, section state after it) of every laid-out row, in order.
+    """
+    import hashlib
+    from reportlab.lib.units import mm
+    from bs4 import BeautifulSoup
+    from text_wrap import text_width, wrap_text
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Parse CSS into a simple dictionary
+    css_styles = {}
+    for style_tag in soup.find_all('style'):
+        css_text = style_tag.string or ''
+
+        # Parse .classname { rules }
+        for match in re.finditer(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}', css_text):
+            class_name = match.group(1)
+            rules_text = match.group(2)
+            css_styles[class_name] = {}
+
+            for rule in rules_text.split(';'):
+                if ':' in rule:
+                    prop, val = rule.split(':', 1)
+                    prop = prop.strip()
+                    val = val.replace('!important', '').strip()
+                    css_styles[class_name][prop] = val
+
+        # Parse tag selectors like tfoot, thead, hr, td, th, etc.
+        for match in re.finditer(r'\b([a-z]+)\s*\{([^}]+)\}', css_text):
+            tag_name = match.group(1)
+            rules_text = match.group(2)
+
+            # Skip if already parsed as class or if it's a CSS keyword
+            if tag_name in ['html', 'body', 'import', 'media', 'font']:
+                continue
+
+            css_styles[tag_name] = {}
+            for rule in rules_text.split(';'):
+                if ':' in rule:
+                    prop, val = rule.split(':', 1)
+                    prop = prop.strip()
+                    val = val.replace('!important', '').strip()
+                    css_styles[tag_name][prop] = val
+
+    # Override font sizes for specific classes to make them smaller
+    font_size_overrides = {
+        'title1': '14px',          # Fature Tatimore - smaller
+        'title1_urdhri': '14px',   # Urdhri titles - smaller
+        'tds-footer': '11px',      # Company, NIPT, Address - smaller
+    }
+
+    for class_name, size in font_size_overrides.items():
+        if class_name in css_styles:
+            css_styles[class_name]['font-size'] = size
+
+    logger.info(f"Parsed {len(css_styles)} CSS rules (classes + tags)")
+    # Log some key CSS rules for debugging
+    for key in ['title1', 'tds-footer', 'columnsSkontrino', 'columnsPershkrim', 'columnsTotal', 'tfoot', 'center-text']:
+        if key in css_styles:
+            logger.info(f"  CSS '{key}': {css_styles[key]}")
+
+    # Helper to get CSS value
+    def get_css_value(element, css_prop, default):
+        """Get CSS property value from element classes, inline styles, and parent tags"""
+        # Priority: inline style > element classes > element tag > parent tag
+
+        # 1. Check inline styles first (highest priority)
+        inline_style = element.get('style', '')
+        if inline_style and css_prop in inline_style:
+            # Simple parsing for inline styles
+            for style_part in inline_style.split(';'):
+                if ':' in style_part:
+                    prop, val = style_part.split(':', 1)
+                    if prop.strip() == css_prop:
+                        return val.strip()
+
+        # 2. Check element's own classes (reverse order for last-defined wins)
+        classes = element.get('class', [])
+        for cls in reversed(classes):
+            if cls in css_styles and css_prop in css_styles[cls]:
+                return css_styles[cls][css_prop]
+
+        # 3. Check element's own tag
+        if element.name in css_styles and css_prop in css_styles[element.name]:
+            return css_styles[element.name][css_prop]
+
+        # 4. Check parent elements (tfoot, thead, tbody, etc.)
+        parent = element.parent
+        while parent:
+            if parent.name in css_styles and css_prop in css_styles[parent.name]:
+                return css_styles[parent.name][css_prop]
+            parent = parent.parent
+            # Only check up to 2 levels to avoid over-inheritance
+            if parent and parent.name == 'table':
+                break
+
+        return default
+
+    # 80mm paper - the page height is decided by the painter from the content height
+    width = 80 * mm
+    margin = 3 * mm  # Smaller side margins
+    dl = DisplayList(width)
+
+    logger.info(f"Using font scale: {font_scale} ({int(font_scale * 100)}%)")
+
+    def draw_text(text, y_pos, font_size=9, bold=False, align='left'):
+        """Draw text with alignment"""
+        # Apply font scaling
+        scaled_font_size = max(6, int(font_size * font_scale))  # Minimum 6pt
+
+        font = "Helvetica-Bold" if bold else "Helvetica"
+
+        if align == 'center':
+            dl.text(width / 2, y_pos, text, font, scaled_font_size, 'center')
+        elif align == 'right':
+            dl.text(width - margin, y_pos, text, font, scaled_font_size, 'right')
+        else:
+            dl.text(margin, y_pos, text, font, scaled_font_size)
+
+        return scaled_font_size * 0.35  # Return line height in mm (tighter spacing)
+
+    def draw_solid_line(y_pos, line_width=0.5):
+        """Draw a solid separator line"""
+        dl.rule(margin, width - margin, y_pos, line_width)
+
+    def draw_qr_code(data, y_pos, qr_size=30):
+        """Place a QR code block (encoded here so a failure leaves no gap, painted as vector modules)"""
+        try:
+            from qr_codes import get_qr_matrix
+            get_qr_matrix(data)
+
+            # Draw QR code centered
+            qr_x = (width - qr_size * mm) / 2
+            dl.qr(qr_x, y_pos, qr_size * mm, data)
+
+            return qr_size  # Return height used in mm
+        except Exception as e:
+            logger.warning(f"Could not generate QR code: {e}")
+            return 0
+
+    # Index all rows once (sections, stripped texts, fiscal codes, line-only rows, headings)
+    from receipt_index import build_row_index, find_static_regions, row_signature
+    table_index = build_row_index(soup)
+
+    # Static regions are keyed by their rows, the stylesheet and the font scale
+    style_key = repr((sorted((name, sorted(rules.items())) for name, rules in css_styles.items()), font_scale))
+
+    def fragment_key(rows, last_section):
+        signature = repr(([row_signature(row) for row in rows], last_section))
+        return hashlib.sha256(f"{style_key}|{signature}".encode('utf-8')).hexdigest()
+
+    # Rows with the same skeleton and section state always become the same step, so the
+    # detection below runs once per kind of row and stylesheet (plans outlive the document)
+    from receipt_profiles import LayoutPlan, SKIP_STEP, RowStep, is_single_cell, row_key
+    plan = plan_cache.plan_for(style_key) if plan_cache is not None else LayoutPlan()
+
+    def detect_step(row, last_section):
+        """Decide what a row becomes, with its styles resolved; returns (RowStep, next section state)"""
+        cells = row.cells
+
+        # Rows that only contain a line (hr or div with dashed-line/div_line) are dropped -
+        # solid lines are added strategically instead
+        if not cells or row.is_line_only:
+            return SKIP_STEP, last_section
+
+        # Single cell (title, info, etc.)
+        if is_single_cell(row):
+            cell_info = cells[0]
+            cell = cell_info.element
+
+            # QR code - its data is the table's NIVF/NSLF code (found by the index)
+            if cell_info.has_svg:
+                return SKIP_STEP._replace(kind='qr'), last_section
+
+            text = cell_info.text
+
+            if not text:
+                return SKIP_STEP, last_section
+
+            # Get CSS styling from the cell
+            font_size_str = get_css_value(cell, 'font-size', '9px').replace('px', '').replace('pt', '')
+            try:
+                font_size = int(float(font_size_str))
+            except:
+                font_size = 9
+
+            # Apply font scaling
+            font_size = max(6, int(font_size * font_scale))
+
+            weight = get_css_value(cell, 'font-weight', 'normal')
+            bold = weight in ['bold', '500', '600', '700', '800', '900']
+
+            align_val = get_css_value(cell, 'text-align', 'left')
+            rule_before = False
+
+            # Footer rows should be centered (tfoot has text-align: center)
+            if row.in_tfoot:
+                align_val = 'center'
+                # Add line before footer (if not QR code or NSLF/NIVF)
+                if 'Gjeneruar' in text or 'Generated' in text:
+                    if last_section != 'footer_line_added':
+                        rule_before = True
+                        last_section = 'footer_line_added'
+
+            # Check if contains h1/h2 (makes it bold automatically and larger)
+            heading = cell_info.heading
+            if heading:
+                bold = True
+                # h1 should be larger - but respect CSS if it's already set larger
+                if heading.name == 'h1' and font_size < 12:
+                    font_size = 12
+                elif heading.name == 'h2' and font_size < 10:
+                    font_size = 10
+
+            # draw_text scales the size once more; this is the height of one drawn line in mm
+            line_height = max(6, int(font_size * font_scale)) * 0.35
+
+            # <br> tags: each part on its own line (like the NSLF field)
+            if cell_info.has_br:
+                return RowStep('lines', font_size, bold, align_val, rule_before, False,
+                               line_height + 1.5, 0, True), last_section
+
+            # Check if this is end of company header section (tds-footer class)
+            cell_classes = cell_info.classes
+            if 'tds-footer' in cell_classes:
+                last_section = 'company_header'
+            # Check if this is operator/tavolina/data info (columnsSkontrino)
+            elif 'columnsSkontrino' in cell_classes and last_section == 'company_header':
+                # Add solid line BEFORE the receipt info section (Data, Operator, etc)
+                rule_before = True
+                last_section = 'receipt_info'
+
+            # Tighter spacing for more compact layout
+            if font_size >= 14:
+                spacing = 1.5
+            elif font_size >= 12:
+                spacing = 1.2
+            else:
+                spacing = 0.8
+
+            # "Tavolina" and "Menyra e Pageses" fields get a solid line AFTER them
+            rule_after = 'Tavolina:' in text or 'Menyra e Pageses:' in text
+            if rule_after:
+                last_section = 'after_tavolina'
+
+            return RowStep('text', font_size, bold, align_val, rule_before, rule_after,
+                           line_height + spacing, 0, True), last_section
+
+        # Multi-cell row (table data)
+        non_empty_info = row.non_empty_cells
+
+        if not non_empty_info:
+            return SKIP_STEP, last_section
+
+        cell_texts = [cell.text for cell in non_empty_info]
+        non_empty_cells = [cell.element for cell in non_empty_info]
+
+        # Check if this is a header row (contains <th> tags)
+        is_header = any(cell.name == 'th' for cell in non_empty_info)
+
+        # Get styling from first non-empty cell
+        first_cell = non_empty_cells[0]
+        font_size_str = get_css_value(first_cell, 'font-size', '9px').replace('px', '').replace('pt', '')
+        try:
+            font_size = int(float(font_size_str))
+        except:
+            font_size = 10 if is_header else 9
+
+        # Apply font scaling
+        font_size = max(6, int(font_size * font_scale))
+
+        weight = get_css_value(first_cell, 'font-weight', 'normal')
+        bold = weight in ['bold', '500', '600', '700', '800', '900'] or is_header
+
+        # Check if any cell contains h1/h2 (for TOTALI row)
+        has_heading = any(cell.heading for cell in non_empty_info)
+        if has_heading:
+            bold = True
+            if font_size < 12:
+                font_size = 12
+
+        # Get text alignment from cells
+        alignments = [get_css_value(cell, 'text-align', 'left') for cell in non_empty_cells]
+
+        # Tighter spacing for compact layout
+        spacing = 1.5 if font_size >= 14 else (1.2 if font_size >= 12 else 0.8)
+        step = RowStep('joined', font_size, bold, 'left', False, False, font_size * 0.35 + spacing, 0, True)
+
+        # Format based on number of non-empty columns
+        if len(non_empty_cells) == 2:
+            # Two columns: Could be TOTALI row OR Sasia/Artikull (Fature Porosi)
+            if has_heading:
+                # Add solid line before TOTALI
+                step = step._replace(rule_before=True)
+                last_section = 'totali'
+
+            # Fature Porosi table (Sasia + Artikull): the left text contains "x" (quantity marker)
+            is_fature_porosi = 'x' in cell_texts[0].lower() and not has_heading
+
+            if is_fature_porosi and row.in_tbody:
+                # Extra spacing after Fature Porosi product row
+                return step._replace(kind='porosi', extra=2), last_section
+            # Regular 2-column format (TOTALI, etc.), placed by the alignment of the right cell
+            return step._replace(kind='two', align=alignments[1]), last_section
+
+        if len(non_empty_cells) == 4:
+            # Four columns: Artikull, Sasia, Cmimi, Vlera
+            if is_header:
+                return step._replace(kind='item_header'), 'table_header'
+            # Extra spacing between products in tbody
+            return step._replace(kind='item', extra=2 if row.in_tbody else 0), last_section
+
+        # Check if this is a tax summary table row (contains TVSH or Tipi keywords)
+        is_tax_table_row = any('TVSH' in text or 'Tipi' in text for text in cell_texts)
+
+        # Data rows of a tax table don't contain the keywords - they follow its header
+        is_inside_tax_table = last_section == 'tax_table_header'
+
+        if is_tax_table_row or is_inside_tax_table:
+            # Skip if we've already rendered the complete tax table
+            if last_section == 'tax_table_complete':
+                return SKIP_STEP, last_section
+
+            # Check if this is header row (must contain both Tipi AND TVSH)
+            if 'Tipi' in cell_texts and 'TVSH' in cell_texts:
+                # Skip if we've already rendered the header
+                if last_section == 'tax_table_header':
+                    return SKIP_STEP, last_section
+                # Readable 9pt font, bordered cells, line before the table
+                return RowStep('tax_header', 9, True, 'center', True, False, 0, 0, False), 'tax_table_header'
+
+            if is_inside_tax_table:
+                # Tax data row; the line after it completes the table
+                return RowStep('tax_row', 9, False, 'center', False, True, 0, 0, False), 'tax_table_complete'
+
+            # Tax keyword outside a tax table: only the row spacing
+            return step._replace(kind='space'), last_section
+
+        # General: space-separated
+        return step, last_section
+
+    def draw_step(step, row, table, y):
+        """Draw one row as planned; returns the y position below it"""
+        kind = step.kind
+
+        if kind == 'qr':
+            qr_data = table.qr_payload
+            if qr_data:
+                y -= 3 * mm  # Space before QR
+                qr_height = draw_qr_code(qr_data, y, qr_size=30)
+                y -= (qr_height + 3) * mm  # Space after QR
+            return y
+
+        if step.rule_before:
+            y -= 2 * mm
+            draw_solid_line(y)
+            y -= 3 * mm
+
+        font_size = step.font_size
+        font_name = "Helvetica-Bold" if step.bold else "Helvetica"
+        font = (font_name, font_size)
+
+        if kind == 'text':
+            draw_text(row.cells[0].text, y, font_size, step.bold, step.align)
+            y -= step.advance * mm
+            if step.rule_after:
+                y -= 1 * mm  # Extra space before line
+                draw_solid_line(y)
+                y -= 2 * mm  # Space after line
+            return y
+
+        if kind == 'lines':
+            for part in row.cells[0].element.stripped_strings:
+                draw_text(part, y, font_size, step.bold, step.align)
+                y -= step.advance * mm
+            return y
+
+        cell_texts = [cell.text for cell in row.cells if cell.text]
+
+        if kind in ('tax_header', 'tax_row'):
+            # Calculate column widths for tax table
+            num_cols = len(cell_texts)
+            tax_col_width = (width - 2 * margin) / num_cols
+
+            # Row height (increased for larger font)
+            row_height = 5.5 * mm
+
+            for i, text in enumerate(cell_texts):
+                x_pos = margin + (i * tax_col_width)
+                # Draw cell border
+                dl.box(x_pos, y - row_height, tax_col_width, row_height, 0.3)
+                # Draw text centered in cell (vertically and horizontally)
+                x_center = x_pos + (tax_col_width / 2)
+                y_center = y - (row_height / 2) + (font_size * 0.3)
+                dl.text(x_center, y_center, text, *font, align='center')
+
+            y -= row_height
+
+            if step.rule_after:
+                # Add line after tax table
+                y -= 1 * mm
+                draw_solid_line(y)
+                y -= 2 * mm
+            return y
+
+        if kind == 'porosi':
+            # Fature Porosi: Two columns with Sasia (left) and Artikull (right)
+            left_text, right_text = cell_texts
+
+            # Calculate column widths: 20% for Sasia, 80% for Artikull
+            sasia_width = (width - 2 * margin) * 0.2
+            artikull_width = (width - 2 * margin) * 0.8
+
+            # Draw Sasia (left column)
+            dl.text(margin, y, left_text, *font)
+
+            # Check if Artikull text fits in one line
+            artikull_x = margin + sasia_width
+
+            if text_width(right_text, font_name, font_size) <= (artikull_width - 2*mm):
+                # Fits in one line
+                dl.text(artikull_x, y, right_text, *font)
+            else:
+                # Need to wrap (cached per product name)
+                lines = wrap_text(right_text, font_name, font_size, artikull_width - 2*mm)
+
+                # Draw first line
+                if lines:
+                    dl.text(artikull_x, y, lines[0], *font)
+
+                    # Draw remaining lines (indented under Artikull column)
+                    for additional_line in lines[1:]:
+                        y -= (font_size * 0.35 + 0.8) * mm
+                        dl.text(artikull_x, y, additional_line, *font)
+        elif kind == 'two':
+            left_text, right_text = cell_texts
+            if step.align == 'center':
+                # Draw left text on left, right text centered on right side
+                dl.text(margin, y, left_text, *font)
+                dl.text(width - margin - 15*mm, y, right_text, *font, align='center')
+            elif step.align == 'right':
+                # Traditional left-right alignment
+                dl.text(margin, y, f"{left_text:<35} {right_text:>10}", *font)
+            else:
+                # Both left-aligned with spacing
+                dl.text(margin, y, f"{left_text:<25} {right_text}", *font)
+        elif kind == 'item_header':
+            col_width = (width - 2 * margin) / 4
+
+            # Draw solid line before header (for ALL receipts)
+            y -= 1 * mm  # Small space before line
+            draw_solid_line(y)
+            y -= 3 * mm  # More space after line, before text
+
+            # Header row - centered in each column
+            for i, text in enumerate(cell_texts):
+                x_pos = margin + (i * col_width) + (col_width / 2)
+                dl.text(x_pos, y, text, *font, align='center')
+
+            # Draw solid line after header (for ALL receipts)
+            y -= 3 * mm  # More space before line, after text
+            draw_solid_line(y)
+            y -= 1 * mm  # Small space after line
+        elif kind == 'item':
+            # Data row - Artikull (left, wrapped if needed), Sasia, Cmimi, Vlera (centered)
+            col_width = (width - 2 * margin) / 4
+            artikull_text = cell_texts[0]
+
+            # Calculate max width for Artikull column (leave space for other columns)
+            max_artikull_width = col_width - 2*mm  # Add small padding
+
+            if text_width(artikull_text, font_name, font_size) <= max_artikull_width:
+                lines = [artikull_text]
+            else:
+                # Text too long - need to wrap (cached per product name)
+                lines = wrap_text(artikull_text, font_name, font_size, max_artikull_width)
+
+            # Draw first line with other columns
+            if lines:
+                dl.text(margin, y, lines[0], *font)
+
+                for i in range(1, len(cell_texts)):
+                    x_center = margin + (i * col_width) + (col_width / 2)
+                    dl.text(x_center, y, cell_texts[i], *font, align='center')
+
+                # Draw remaining lines of Artikull text (if any)
+                for additional_line in lines[1:]:
+                    y -= (font_size * 0.35 + 0.8) * mm
+                    dl.text(margin, y, additional_line, *font)
+        elif kind == 'joined':
+            dl.text(margin, y, "  ".join(cell_texts), *font)
+
+        if step.extra:
+            y -= step.extra * mm
+        y -= step.advance * mm
+        return y
+
+    row_keys = []
+    step_kinds = set()
+
+    def lay_out(y):
+        """Lay out all rows starting at y; returns the final y position"""
+        # Section state (what we just processed) - decides where solid lines go
+        last_section = None
+
+        # Process all tables
+        for table in table_index:
+            regions = dict(find_static_regions(table)) if fragment_cache is not None else {}
+            skip_to = 0
+            recording = None  # (end row, key, display list mark, y) of a region being laid out
+
+            for row_number, row in enumerate(table.rows):
+                skeleton = row_key(row)
+                row_keys.append(skeleton)
+
+                if recording and row_number == recording[0]:
+                    fragment_cache.put(recording[1], dl.capture(recording[2], recording[3], y, last_section))
+                    recording = None
+                if row_number < skip_to:
+                    continue
+
+                if row_number in regions:
+                    end = regions[row_number]
+                    key = fragment_key(table.rows[row_number:end], last_section)
+                    fragment = fragment_cache.get(key)
+                    if fragment is not None:
+                        # Same rows laid out before - place them instead of laying out again
+                        y = dl.place(fragment, y)
+                        logger.debug(f"Placed cached fragment for rows {row_number}-{end - 1} ({len(fragment.items)} items)")
+                        last_section = fragment.state
+                        skip_to = end
+                        continue
+                    recording = (end, key, dl.mark(), y)
+
+                step, last_section = plan.step(skeleton, last_section, lambda: detect_step(row, last_section))
+                step_kinds.add(step.kind)
+                if steps is not None:
+                    steps.append((step, last_section))
+                y = draw_step(step, row, table, y)
+
+                # Painters may start a new page here (only when the receipt is longer than the printer allows)
+                if step.ends_row:
+                    dl.end_row(y)
+
+            if recording:
+                fragment_cache.put(recording[1], dl.capture(recording[2], recording[3], y, last_section))
+
+        return y
+
+    display_list = dl.finish(lay_out(0))
+    profile = plan.classify(row_keys, step_kinds)
+    logger.info(f"Receipt laid out as '{profile}' ({len(plan.transitions)} planned row kinds, {plan.detections} detected)")
+    return display_list
@@ -0,0 +1,143 @@
+"""
+Receipt Profiles Module
+Classifies table-based receipts by structure into named profiles and caches their layout plans,
+so receipts with a known skeleton follow the plan instead of detecting every row again
+"""
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+from receipt_index import FOOTER_MARKERS, is_single_cell
+
+logger = logging.getLogger(__name__)
+
+TITLE_CLASSES = ('title1', 'title1_urdhri')
+WORK_ORDER_WORDS = ('urdhri', 'punes')
+FIELD_END_MARKERS = ('Tavolina:', 'Menyra e Pageses:')  # Info fields followed by a separator line
+TAX_WORDS = ('TVSH', 'Tipi')
+
+# The only text facts the layout depends on: (marker, row kind, test on the texts the layout uses).
+# Together with the tags, classes and column counts they make up the skeleton of a row.
+ROW_MARKERS = (
+    ('work_order', 'title', lambda texts: any(word in texts[0].lower() for word in WORK_ORDER_WORDS)),
+    ('field_end', 'single', lambda texts: any(marker in texts[0] for marker in FIELD_END_MARKERS)),
+    ('footer', 'single', lambda texts: any(marker in texts[0] for marker in FOOTER_MARKERS)),
+    ('quantity', 'multi', lambda texts: 'x' in texts[0].lower()),
+    ('tax', 'multi', lambda texts: any(word in text for text in texts for word in TAX_WORDS)),
+    ('tax_header', 'multi', lambda texts: 'Tipi' in texts and 'TVSH' in texts),
+)
+
+ReceiptProfile = namedtuple('ReceiptProfile', 'name markers steps')
+
+# First match wins: a profile matches when the receipt has all of its row markers and step kinds
+PROFILES = (
+    ReceiptProfile('urdhri_punes', ('work_order',), ()),
+    ReceiptProfile('fature_porosi', (), ('porosi',)),
+    ReceiptProfile('fature_tatimore', (), ('item', 'tax_header')),
+    ReceiptProfile('fature', (), ('item',)),
+)
+GENERIC_PROFILE = 'generic'
+MAX_SKELETONS = 256  # Document fingerprints remembered per plan
+
+# What a row becomes once its styles are resolved. font_size is the size the row was styled
+# with, advance the distance (mm) moved down after drawing, extra an additional gap (mm).
+RowStep = namedtuple('RowStep', 'kind font_size bold align rule_before rule_after advance extra ends_row')
+
+SKIP_STEP = RowStep('skip', 0, False, 'left', False, False, 0, 0, False)
+EMPTY_KEY = ('empty',)
+LINE_KEY = ('line',)
+
+
+def _cell_key(cell):
+    return cell.name, tuple(cell.classes), cell.style, cell.heading.name if cell.heading else None
+
+
+def _markers(kind, texts):
+    return tuple(name for name, applies_to, test in ROW_MARKERS if applies_to == kind and test(texts))
+
+
+def row_key(row):
+    """Skeleton of one indexed row: everything its layout step depends on, apart from the stylesheet"""
+    if not row.cells:
+        return EMPTY_KEY
+    if row.is_line_only:
+        return LINE_KEY
+    section = row.section
+    if is_single_cell(row):
+        cell = row.cells[0]
+        if cell.has_svg or not cell.text:
+            return 'single', section, cell.has_svg, cell.text != ''
+        markers = _markers('single', [cell.text])
+        if any(cls in TITLE_CLASSES for cls in cell.classes) or (cell.heading and cell.heading.name == 'h1'):
+            markers += _markers('title', [cell.text])
+        return 'single', section, row.in_tfoot, _cell_key(cell), cell.has_br, markers
+    texts = [cell.text for cell in row.cells if cell.text]
+    if not texts:
+        return EMPTY_KEY
+    cells = tuple(_cell_key(cell) for cell in row.cells if cell.text)
+    return 'multi', section, row.in_tfoot, row.in_tbody, cells, _markers('multi', texts)
+
+
+def fingerprint(keys):
+    """Skeleton of a whole document: its row keys with repeated rows (items, tax lines) collapsed"""
+    collapsed = []
+    for key in keys:
+        if not collapsed or collapsed[-1] != key:
+            collapsed.append(key)
+    return tuple(collapsed)
+
+
+class LayoutPlan:
+    """Layout plan of one stylesheet and font scale
+
+    Maps (row key, section state) to (RowStep, next section state); the state is what the
+    layout remembers between rows (company header seen, inside the tax table, ...).
+    """
+
+    def __init__(self):
+        self.transitions = {}
+        self.profiles = {}  # Document fingerprint -> profile name
+        self.detections = 0
+
+    def step(self, key, state, detect):
+        """The planned step for a row; detect() is only called for rows not seen before"""
+        planned = self.transitions.get((key, state))
+        if planned is None:
+            planned = detect()
+            self.transitions[(key, state)] = planned
+            self.detections += 1
+        return planned
+
+    def classify(self, keys, kinds):
+        """Profile name of a document from its row keys and the step kinds it used"""
+        document = fingerprint(keys)
+        name = self.profiles.get(document)
+        if name is None:
+            if len(self.profiles) >= MAX_SKELETONS:
+                self.profiles.clear()
+            markers = {marker for key in document if key[0] == 'single' and len(key) > 4 for marker in key[5]}
+            name = next((profile.name for profile in PROFILES
+                         if all(marker in markers for marker in profile.markers)
+                         and all(kind in kinds for kind in profile.steps)), GENERIC_PROFILE)
+            self.profiles[document] = name
+            logger.info(f"🧾 New receipt skeleton ({len(document)} row kinds): profile '{name}'")
+        return name
+
+
+class LayoutPlanCache:
+    """Layout plans per stylesheet and font scale (LRU)"""
+
+    def __init__(self, max_plans=16):
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def plan_for(self, style_key):
+        with self._lock:
+            plan = self._plans.get(style_key)
+            if plan is None:
+                plan = self._plans[style_key] = LayoutPlan()
+                while len(self._plans) > self.max_plans:
+                    self._plans.popitem(last=False)
+            self._plans.move_to_end(style_key)
+            return plan
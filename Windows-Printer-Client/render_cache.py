@@ -0,0 +1,236 @@
+"""
+Render Cache Module
+Content-addressed disk cache for rendered documents, so reprints and retries skip conversion
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Part of every key - bump it with any change that alters rendered output, so PDFs cached
+# by an older client are not replayed after an upgrade
+RENDER_VERSION = 1
+
+
+def normalize_html(html_content):
+    """Normalize HTML so cosmetic differences (line endings, trailing spaces) hash the same"""
+    lines = html_content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+
+class RenderCache:
+    """Disk-backed LRU cache of rendered bytes with an in-memory index"""
+
+    FILE_SUFFIX = '.bin'
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(html_content, converter, font_scale, printer_profile=None):
+        """Build the cache key from normalized HTML, render version, converter, font scale and printer profile
+
+        converter is the one that actually rendered the document (not the configured one,
+        which may have fallen back to another).
+        """
+        html_hash = hashlib.sha256(normalize_html(html_content).encode('utf-8')).hexdigest()
+        # Profiles from a config snapshot are read-only mappings - serialized like the dicts they wrap
+        profile = json.dumps(printer_profile or {}, sort_keys=True, ensure_ascii=False, default=dict)
+
+        key = hashlib.sha256()
+        key.update(html_hash.encode('ascii'))
+        key.update(f"|{RENDER_VERSION}|{converter}|{float(font_scale):.4f}|{profile}".encode('utf-8'))
+        return key.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.FILE_SUFFIX)
+
+    def _load_index(self):
+        """Rebuild the in-memory index from the files on disk (oldest first)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.FILE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(self.FILE_SUFFIX)], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+        self._evict()
+        logger.info(f"Render cache: {len(self._index)} entries, {self._total_bytes} bytes in {self.cache_dir}")
+
+    def get(self, key):
+        """Return cached bytes for key, or None on a miss"""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            self._forget(key)
+            return None
+
+    def __contains__(self, key):
+        """Whether key is cached (not counted as a hit or miss)"""
+        with self._lock:
+            return key in self._index
+
+    def get_path(self, key):
+        """Return the path of the cached file for key, or None on a miss"""
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            if not os.path.exists(path):
+                self._total_bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+
+            self._index.move_to_end(key)
+            self.hits += 1
+
+        # Persist recency so LRU order survives restarts
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, data):
+        """Store rendered bytes under key, evicting least recently used entries over budget"""
+        if len(data) > self.max_bytes:
+            logger.debug(f"Render cache: {len(data)} bytes exceeds budget, not cached")
+            return
+
+        tmp_path = self._tmp_path(key)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Render cache: could not store entry: {e}")
+            self._discard(tmp_path)
+            return
+        self._store(key, tmp_path, len(data))
+
+    def put_stream(self, key, chunks):
+        """Pass rendered chunks through, storing them under key once the last one has passed
+
+        The chunks are written to the cache file as they go by, so a streamed document is never
+        held in memory. Nothing is stored when it grows over budget or isn't consumed to the end.
+        """
+        tmp_path = self._tmp_path(key)
+        try:
+            f = open(tmp_path, 'wb')
+        except OSError as e:
+            logger.warning(f"Render cache: could not store entry: {e}")
+            f = None
+        size = 0
+        complete = False
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                if f is not None:
+                    try:
+                        if size > self.max_bytes:
+                            raise OverflowError(f"{size} bytes exceeds budget")
+                        f.write(chunk)
+                    except (OSError, OverflowError) as e:
+                        logger.debug(f"Render cache: streamed document not cached: {e}")
+                        f.close()
+                        self._discard(tmp_path)
+                        f = None
+                yield chunk
+            complete = True
+        finally:
+            if f is not None:
+                f.close()
+                if complete:
+                    self._store(key, tmp_path, size)
+                else:
+                    self._discard(tmp_path)
+
+    def _tmp_path(self, key):
+        return f"{self._path(key)}.{threading.get_ident()}.tmp"
+
+    @staticmethod
+    def _discard(tmp_path):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    def _store(self, key, tmp_path, size):
+        """Move a written temporary file into place and index it"""
+        try:
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Render cache: could not store entry: {e}")
+            self._discard(tmp_path)
+            return
+
+        with self._lock:
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            self._index[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _forget(self, key):
+        with self._lock:
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+
+    def _evict(self):
+        """Drop least recently used entries until under budget (caller holds the lock)"""
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            logger.debug(f"Render cache: evicted {key[:12]} ({size} bytes)")
+
+    def clear(self):
+        """Remove all cached entries"""
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Return cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
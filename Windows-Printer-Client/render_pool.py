@@ -0,0 +1,269 @@
+"""
+Render Pool Module
+Renders receipts in worker processes: pre-imported ReportLab/bs4, per-job deadlines, restart on
+crash or memory ceiling, and PDF bytes handed back through shared memory instead of pickling
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss():
+    """Resident memory of this process in bytes (0 if unknown)"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return 0
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return 0
+
+
+_fragment_cache = None  # Header/footer fragments of the receipts this worker has laid out
+_layout_plans = None  # Row plans of the receipt skeletons this worker has laid out
+_templates = None  # Compiled render functions of the receipt structures this worker has seen
+
+
+def _render_receipts(parts, font_scale, max_length_mm):
+    """PDF of (html_content, marker) parts, a page per part (a single receipt is one part)"""
+    global _fragment_cache, _layout_plans, _templates
+    from reportlab.lib.units import mm
+    from config import Config
+    from receipt_profiles import LayoutPlanCache
+    from template_compiler import ReceiptTemplates
+    from display_list import DisplayListCache, marked_copy, paint_pdf_batch
+
+    if _fragment_cache is None:
+        _fragment_cache = DisplayListCache(max_entries=32)
+        _layout_plans = LayoutPlanCache()
+        _templates = ReceiptTemplates() if Config.TEMPLATE_COMPILER_ENABLED else None
+    display_lists = []
+    layouts = {}  # Copies of a receipt are laid out once
+    for html_content, marker in parts:
+        display_list = layouts.get(html_content)
+        if display_list is None:
+            if _templates is not None:
+                display_list = _templates.layout(html_content, font_scale, _fragment_cache, _layout_plans)
+            else:
+                from receipt_layout import layout_receipt
+                display_list = layout_receipt(html_content, font_scale, _fragment_cache, _layout_plans)
+            layouts[html_content] = display_list
+        display_lists.append(marked_copy(display_list, marker) if marker else display_list)
+    return paint_pdf_batch(display_lists, 5 * mm, 5 * mm, max_length_mm * mm, 20 * mm, 10 * mm)
+
+
+def _worker_main(conn):
+    """Worker process loop: render jobs from the pipe, answer with a shared memory block name"""
+    # Pay the import cost once per worker, not per job
+    import reportlab.pdfgen.canvas  # noqa: F401
+    import bs4  # noqa: F401
+    import receipt_layout  # noqa: F401
+    import template_compiler  # noqa: F401
+    import display_list  # noqa: F401
+
+    logging.disable(logging.INFO)  # Job logging happens in the client process
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        job_id, parts, font_scale, max_length_mm = message
+        try:
+            pdf_data = _render_receipts(parts, font_scale, max_length_mm)
+        except Exception as e:
+            conn.send((job_id, 'error', f"{type(e).__name__}: {e}", _current_rss()))
+            continue
+
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(pdf_data)))
+        try:
+            block.buf[:len(pdf_data)] = pdf_data
+            conn.send((job_id, block.name, len(pdf_data), _current_rss()))
+            # Keep the block alive until the client has copied it (Windows frees it on last close)
+            conn.recv()
+        except (EOFError, OSError):
+            return
+        finally:
+            block.close()
+            try:
+                block.unlink()
+            except Exception:
+                pass
+
+
+def _read_shared_block(name, size):
+    """Copy and detach a result block created by a worker"""
+    # Workers share this process's resource tracker, so attaching needs no extra bookkeeping
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(block.buf[:size])
+    finally:
+        block.close()
+
+
+class _Worker:
+    """One render process and the client end of its pipe"""
+
+    def __init__(self, context, index):
+        self.index = index
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,),
+                                       name=f'render-worker-{index}', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+        self.conn.close()
+
+
+class RenderPool:
+    """Pool of receipt render processes
+
+    Each job runs in an idle worker; a job that misses its deadline gets its worker killed,
+    a crashed worker is replaced, and a worker over the memory ceiling is recycled after
+    its job. Callers block only their own thread, so concurrent jobs use separate cores.
+    """
+
+    def __init__(self, workers=2, timeout=30, memory_limit_mb=300):
+        self.size = max(1, workers)
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._job_counter = 0
+        self._counter_lock = threading.Lock()
+        self._workers_started = 0
+        self.restarts = 0
+        for _ in range(self.size):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        self._workers_started += 1
+        return _Worker(self._context, self._workers_started)
+
+    def _replace(self, worker, reason, graceful=False):
+        logger.warning(f"♻️ Restarting render worker {worker.index}: {reason}")
+        self.restarts += 1
+        if graceful:
+            worker.stop()  # Lets the worker release its last result block first
+        else:
+            try:
+                worker.process.kill()
+            except Exception:
+                pass
+            worker.process.join(timeout=2)
+            worker.conn.close()
+        self._idle.put(self._start_worker())
+
+    def render_receipt(self, html_content, font_scale, max_length_mm, timeout=None):
+        """Render a table-based receipt to PDF bytes in a worker process"""
+        return self.render_receipts([(html_content, None)], font_scale, max_length_mm, timeout)
+
+    def render_receipts(self, parts, font_scale, max_length_mm, timeout=None):
+        """Render receipts into one PDF in a worker process, each part starting on a page of its own
+
+        parts are (html_content, marker) pairs; a marker (e.g. "KOPJE") is printed above that copy.
+        """
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No render worker free within {timeout}s")
+
+        with self._counter_lock:
+            self._job_counter += 1
+            job_id = self._job_counter
+
+        try:
+            worker.conn.send((job_id, parts, font_scale, max_length_mm))
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                self._replace(worker, f"job {job_id} missed its {timeout}s deadline")
+                raise TimeoutError(f"Render job timed out after {timeout}s")
+            reply = worker.conn.recv()
+        except TimeoutError:
+            raise
+        except (EOFError, OSError) as e:
+            self._replace(worker, f"worker crashed ({type(e).__name__})")
+            raise Exception(f"Render worker crashed during job {job_id}")
+
+        reply_id, name, size, rss = reply
+        if reply_id != job_id:
+            # Never expected - but a worker out of step would hand every later job the wrong PDF
+            self._replace(worker, f"answered job {reply_id} during job {job_id}")
+            raise Exception(f"Render worker out of step during job {job_id}")
+        if name == 'error':
+            self._recycle_or_return(worker, rss)
+            raise Exception(size)  # Error message from the worker
+
+        try:
+            pdf_data = _read_shared_block(name, size)
+        finally:
+            # Always acknowledged - the worker waits for it before it frees the block and takes
+            # its next job, so a failed read must not leave it expecting an 'ack'
+            try:
+                worker.conn.send('ack')
+            except (EOFError, OSError) as e:
+                self._replace(worker, f"worker crashed handing over job {job_id} ({type(e).__name__})")
+            else:
+                self._recycle_or_return(worker, rss)
+        return pdf_data
+
+    def _recycle_or_return(self, worker, rss):
+        worker.jobs += 1
+        if self.memory_limit and rss > self.memory_limit:
+            self._replace(worker, f"{rss // (1024 * 1024)}MB over the {self.memory_limit // (1024 * 1024)}MB ceiling",
+                          graceful=True)
+        else:
+            self._idle.put(worker)
+
+    def close(self):
+        """Stop all idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
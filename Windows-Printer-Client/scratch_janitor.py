@@ -0,0 +1,161 @@
+"""
+Scratch Janitor Module
+Owns the scratch directory of the print methods that need a file path: writes the files and
+deletes them in the background once the spooler has them, so no print job waits for cleanup
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ScratchJanitor:
+    """Writes scratch files and deletes them once they are no longer needed
+
+    A released file is deleted as soon as its consumption is confirmed - the printing process
+    has exited, or a spooler job carrying its name has appeared - or at the latest after
+    grace seconds. Files that are still locked then are retried until give_up seconds and
+    counted as leaked; leftovers of earlier runs are reclaimed when the janitor starts.
+    """
+
+    def __init__(self, directory, grace=30, interval=0.5, give_up=600):
+        self.directory = directory
+        self.grace = grace
+        self.interval = interval
+        self.give_up = give_up
+        self._pending = {}  # path -> [released at, printer name, confirmed]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._started = time.time()
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+        self.reclaimed_files = 0  # Leftovers of earlier runs (crashes, killed processes)
+        self.reclaimed_bytes = 0
+        self.leaked_files = 0  # Given up on - still locked; reclaimed at the next start
+        self.leaked_bytes = 0
+
+    def start(self):
+        """Start the janitor thread (reclaims leftovers first)"""
+        if self._thread is None:
+            self._started = time.time()
+            self._thread = threading.Thread(target=self._run, name='scratch-janitor', daemon=True)
+            self._thread.start()
+
+    def create(self, data, suffix='.pdf'):
+        """Write bytes (or an iterable of byte chunks) to a new scratch file; returns its path"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix='job_', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in ([data] if isinstance(data, bytes) else data):
+                f.write(chunk)
+        return path
+
+    def release(self, path, printer_name=None, confirmed=False):
+        """Hand a scratch file over for deletion
+
+        confirmed: the file has been consumed (e.g. the printing process exited). Otherwise
+        the janitor watches printer_name's spooler queue for a job with the file's name.
+        """
+        with self._lock:
+            self._pending[path] = [time.monotonic(), printer_name, confirmed]
+        self._wake.set()
+
+    def stats(self):
+        """Counters of the janitor (files and bytes)"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending_files': pending,
+            'deleted_files': self.deleted_files,
+            'deleted_bytes': self.deleted_bytes,
+            'reclaimed_files': self.reclaimed_files,
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'leaked_files': self.leaked_files,
+            'leaked_bytes': self.leaked_bytes,
+        }
+
+    def reclaim_leftovers(self):
+        """Delete the files earlier runs left in the scratch directory"""
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+                if stat.st_mtime >= self._started:
+                    continue  # Written by this run
+                size = stat.st_size
+                os.remove(entry.path)
+            except OSError as e:
+                logger.debug(f"Could not reclaim {entry.path}: {str(e)}")
+                continue
+            self.reclaimed_files += 1
+            self.reclaimed_bytes += size
+        if self.reclaimed_files:
+            logger.info(f"🧹 Reclaimed {self.reclaimed_files} leftover scratch files ({self.reclaimed_bytes} bytes)")
+
+    def _run(self):
+        try:
+            self.reclaim_leftovers()
+        except Exception as e:
+            logger.warning(f"Scratch directory sweep failed: {str(e)}")
+
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                pending = list(self._pending.items())
+            for path, (released, printer_name, confirmed) in pending:
+                age = time.monotonic() - released
+                if not confirmed and printer_name and age < self.grace:
+                    confirmed = self._spooled(printer_name, os.path.basename(path))
+                    if confirmed:
+                        with self._lock:
+                            if path in self._pending:
+                                self._pending[path][2] = True
+                if confirmed or age >= self.grace:
+                    self._delete(path, age)
+
+    def _delete(self, path, age):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._pending.pop(path, None)
+            return
+        except OSError:
+            # Still open by the printing application - try again on the next round
+            if age >= self.give_up:
+                with self._lock:
+                    self._pending.pop(path, None)
+                self.leaked_files += 1
+                self.leaked_bytes += os.path.getsize(path) if os.path.exists(path) else 0
+                logger.warning(f"Scratch file still in use after {age:.0f}s, leaving it: {path}")
+            return
+
+        with self._lock:
+            self._pending.pop(path, None)
+        self.deleted_files += 1
+        self.deleted_bytes += size
+        logger.debug(f"Deleted scratch file {path} after {age:.1f}s")
+
+    @staticmethod
+    def _spooled(printer_name, file_name):
+        """Whether a spooler job with the file's name is in the printer's queue"""
+        try:
+            import win32print
+
+            handle = win32print.OpenPrinter(printer_name)
+            try:
+                jobs = win32print.EnumJobs(handle, 0, -1, 1)
+            finally:
+                win32print.ClosePrinter(handle)
+        except Exception:
+            return False
+        return any(file_name in (job.get('pDocument') or '') for job in jobs)
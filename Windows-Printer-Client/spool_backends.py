@@ -0,0 +1,119 @@
+"""
+Spool Backends Module
+Send rendered documents to a printer straight from memory (RAW spooler job, TCP socket, file)
+"""
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+
+class SpoolBackend:
+    """Base class for backends that consume rendered bytes directly"""
+
+    name = 'base'
+
+    def send(self, data, document_name='Print Job'):
+        """Send a complete document; returns True on success"""
+        return self.send_stream([data], document_name)
+
+    def send_stream(self, chunks, document_name='Print Job'):
+        """Send a document produced as an iterable of byte chunks; returns True on success"""
+        raise NotImplementedError
+
+
+class RawPrinterBackend(SpoolBackend):
+    """Windows spooler RAW job (win32print WritePrinter)"""
+
+    name = 'raw'
+
+    def __init__(self, printer_name):
+        self.printer_name = printer_name
+
+    def send_stream(self, chunks, document_name='Print Job'):
+        import win32print
+
+        hprinter = win32print.OpenPrinter(self.printer_name)
+        try:
+            job_id = win32print.StartDocPrinter(hprinter, 1, (document_name, None, "RAW"))
+            logger.info(f"Started RAW print job {job_id} on {self.printer_name}")
+            try:
+                win32print.StartPagePrinter(hprinter)
+                total = 0
+                for chunk in chunks:
+                    if chunk:
+                        win32print.WritePrinter(hprinter, bytes(chunk))
+                        total += len(chunk)
+                win32print.EndPagePrinter(hprinter)
+            finally:
+                win32print.EndDocPrinter(hprinter)
+            logger.info(f"Sent {total} bytes to {self.printer_name}")
+            return True
+        finally:
+            win32print.ClosePrinter(hprinter)
+
+
+class TcpBackend(SpoolBackend):
+    """Direct socket printing (JetDirect / port 9100)"""
+
+    name = 'tcp'
+
+    def __init__(self, host, port=9100, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    @classmethod
+    def from_address(cls, address, timeout=10):
+        """Create from a 'host' or 'host:port' string"""
+        host, _, port = address.strip().partition(':')
+        return cls(host, int(port) if port else 9100, timeout)
+
+    def send_stream(self, chunks, document_name='Print Job'):
+        total = 0
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            for chunk in chunks:
+                if chunk:
+                    sock.sendall(chunk)
+                    total += len(chunk)
+        logger.info(f"Sent {total} bytes to {self.host}:{self.port} ({document_name})")
+        return True
+
+
+class FileBackend(SpoolBackend):
+    """Write the byte stream to a file (print-to-file, or a stand-in printer for testing)"""
+
+    name = 'file'
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.append = append
+
+    def send_stream(self, chunks, document_name='Print Job'):
+        total = 0
+        with open(self.path, 'ab' if self.append else 'wb') as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    total += len(chunk)
+        logger.info(f"Wrote {total} bytes to {self.path} ({document_name})")
+        return True
+
+
+def get_byte_backend(printer_name, profile):
+    """Get the backend that can take bytes directly for a printer, or None if it needs a file path
+
+    Printer profile keys (printer_settings.json):
+        "tcp": "host:port"  - send straight to a network printer
+        "file": "path"      - write the job to a file
+        "backend": "raw"    - send as a RAW spooler job (printer understands the data natively)
+    """
+    profile = profile or {}
+    if profile.get('tcp'):
+        return TcpBackend.from_address(profile['tcp'])
+    if profile.get('file'):
+        return FileBackend(os.path.expandvars(profile['file']))
+    if profile.get('backend') == 'raw':
+        return RawPrinterBackend(printer_name)
+    return None
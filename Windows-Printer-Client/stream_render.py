@@ -0,0 +1,606 @@
+"""
+Stream Render Module
+Renders HTML documents in one incremental pass: elements and table rows are laid out as they are
+parsed and pages are finished as they fill, so long reports print while later rows are still parsed
+"""
+import io
+import itertools
+import logging
+import re
+import zlib
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+BLOCK_TAGS = ('h1', 'h2', 'p', 'hr', 'div')
+VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                       'param', 'source', 'track', 'wbr'))
+CHUNK_SIZE = 64 * 1024  # HTML characters parsed per step
+
+
+def parse_css(css_text, css_rules):
+    """Add the rules of a stylesheet to css_rules ({class or tag: {property: value}})"""
+    # Remove comments
+    css_text = re.sub(r'/\*.*?\*/', '', css_text, flags=re.DOTALL)
+
+    # Match CSS rules: selector { properties }
+    # This handles both .class and tag selectors
+    pattern = r'([\.#]?[a-zA-Z0-9_-]+(?:\s+[a-zA-Z0-9_-]+)*)\s*\{([^}]+)\}'
+    matches = re.findall(pattern, css_text, re.MULTILINE)
+
+    for selector, rules in matches:
+        selector = selector.strip()
+
+        # Extract class name (remove the dot)
+        if selector.startswith('.'):
+            rule_name = selector[1:]
+        else:
+            rule_name = selector
+
+        # Skip complex selectors for now
+        if ' ' in rule_name or '>' in rule_name or '+' in rule_name:
+            continue
+
+        css_rules[rule_name] = {}
+
+        # Parse individual properties
+        for rule in rules.split(';'):
+            if ':' in rule:
+                prop, value = rule.split(':', 1)
+                prop = prop.strip()
+                value = value.strip().replace('!important', '').strip()
+                css_rules[rule_name][prop] = value
+
+
+def get_style(element, css_rules, inherit_from_parent=True):
+    """Get computed style for an element, inheriting from parent"""
+    style = {
+        'font-size': 9,
+        'font-weight': 'normal',
+        'text-align': 'left',
+        'bold': False
+    }
+
+    # Inherit styles from parent elements if requested
+    if inherit_from_parent and element.parent:
+        parent = element.parent
+        # Check parent's classes for inherited styles
+        parent_classes = parent.get('class', [])
+        for class_name in parent_classes:
+            if class_name in css_rules:
+                parent_css = css_rules[class_name]
+                if 'font-size' in parent_css:
+                    size_str = parent_css['font-size'].replace('px', '').replace('!important', '').strip()
+                    try:
+                        style['font-size'] = int(float(size_str))
+                    except:
+                        pass
+                if 'font-weight' in parent_css:
+                    weight = parent_css['font-weight'].replace('!important', '').strip()
+                    if weight in ['bold', '500', '600', '700', '800', '900']:
+                        style['bold'] = True
+                if 'text-align' in parent_css:
+                    align = parent_css['text-align'].replace('!important', '').strip()
+                    style['text-align'] = align
+
+    # Apply tag-level CSS
+    if element.name in css_rules:
+        tag_css = css_rules[element.name]
+        if 'font-size' in tag_css:
+            size_str = tag_css['font-size'].replace('px', '').replace('!important', '').strip()
+            try:
+                style['font-size'] = int(float(size_str))
+            except:
+                pass
+        if 'font-weight' in tag_css:
+            weight = tag_css['font-weight'].replace('!important', '').strip()
+            if weight in ['bold', '600', '700', '800', '900']:
+                style['bold'] = True
+        if 'text-align' in tag_css:
+            align = tag_css['text-align'].replace('!important', '').strip()
+            style['text-align'] = align
+
+    # Apply class-level CSS (overrides tag and parent styles)
+    classes = element.get('class', [])
+    for class_name in classes:
+        if class_name in css_rules:
+            class_css = css_rules[class_name]
+            if 'font-size' in class_css:
+                size_str = class_css['font-size'].replace('px', '').replace('!important', '').strip()
+                try:
+                    style['font-size'] = int(float(size_str))
+                except:
+                    pass
+            if 'font-weight' in class_css:
+                weight = class_css['font-weight'].replace('!important', '').strip()
+                if weight in ['bold', '500', '600', '700', '800', '900']:
+                    style['bold'] = True
+            if 'text-align' in class_css:
+                align = class_css['text-align'].replace('!important', '').strip()
+                style['text-align'] = align
+
+    # Check inline styles (highest priority)
+    inline_style = element.get('style', '')
+    if inline_style:
+        if 'bold' in inline_style or 'font-weight' in inline_style:
+            style['bold'] = True
+        if 'text-align' in inline_style:
+            if 'center' in inline_style:
+                style['text-align'] = 'center'
+            elif 'right' in inline_style:
+                style['text-align'] = 'right'
+        if 'font-size' in inline_style:
+            size_match = re.search(r'font-size:\s*(\d+)px', inline_style)
+            if size_match:
+                try:
+                    style['font-size'] = int(size_match.group(1))
+                except:
+                    pass
+
+    return style
+
+
+def row_ops(row_cells, mm):
+    """Layout operations of one table row (cells as {'text', 'style', 'is_th', 'has_heading'})"""
+    ops = []
+    if len(row_cells) == 1:
+        # Single column (like title or single info line)
+        cell = row_cells[0]
+        font_size = cell['style']['font-size']
+
+        # Add extra spacing for headings
+        if cell['has_heading']:
+            ops.append(('space', 1 * mm))
+
+        ops.append(('text', cell['text'], font_size, cell['style']['text-align'], cell['style']['bold'] or cell['is_th']))
+
+        # Add extra spacing after headings
+        if cell['has_heading']:
+            ops.append(('space', 1 * mm))
+    elif len(row_cells) == 2:
+        # Two columns - formatted side by side
+        left_cell = row_cells[0]
+        right_cell = row_cells[1]
+
+        # Determine alignment based on styles
+        if right_cell['style']['text-align'] == 'right':
+            line = f"{left_cell['text']:<35} {right_cell['text']:>10}"
+        else:
+            line = f"{left_cell['text']:<25} {right_cell['text']:<20}"
+
+        # Use the larger font size and check if either is bold
+        font_size = max(left_cell['style']['font-size'], right_cell['style']['font-size'])
+        is_bold = left_cell['style']['bold'] or right_cell['style']['bold'] or left_cell['is_th'] or right_cell['is_th']
+
+        ops.append(('text', line, font_size, "left", is_bold))
+    elif len(row_cells) >= 3:
+        # Multiple columns
+        if len(row_cells) == 4:
+            # 4 columns (Artikull, Sasia, Cmimi, Vlera)
+            # Full Artikull text (it wraps naturally) + aligned numeric columns
+            artikull_full = row_cells[0]['text']
+            sasia = row_cells[1]['text']
+            cmimi = row_cells[2]['text']
+            vlera = row_cells[3]['text']
+            line = f"{artikull_full}  {sasia:>6} {cmimi:>8} {vlera:>8}"
+        else:
+            # General multi-column formatting
+            line = "  ".join([cell['text'] for cell in row_cells])
+
+        # Use max font size and check if any cell is bold
+        font_size = max([cell['style']['font-size'] for cell in row_cells])
+        is_bold = any(cell['style']['bold'] or cell['is_th'] for cell in row_cells)
+
+        ops.append(('text', line, font_size, "left", is_bold))
+    return ops
+
+
+class StreamElement:
+    """An open element while parsing - tag, attributes and parent, what get_style looks at"""
+
+    __slots__ = ('name', 'attrs', 'parent', 'parts', 'heading', 'cells')
+
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.parts = None  # Text is only collected for blocks, cells and stylesheets
+        self.heading = None
+        self.cells = None
+
+    def get(self, key, default=None):
+        value = self.attrs.get(key)
+        if value is None:
+            return default
+        return value.split() if key == 'class' else value
+
+
+class _DocumentParser(HTMLParser):
+    """Turns HTML into layout operations while it is fed
+
+    Only the open elements are kept: text is collected for the block elements outside tables,
+    table cells and stylesheets, and dropped once the element is laid out.
+    """
+
+    def __init__(self):
+        from reportlab.lib.units import mm
+
+        super().__init__()
+        self.mm = mm
+        self.css_rules = {}
+        self.ops = []
+        self._stack = []
+        self._collectors = []
+        self._tables = 0
+
+    def _cell(self):
+        return next((element for element in reversed(self._stack) if element.name in ('td', 'th')), None)
+
+    def _row(self):
+        return next((element for element in reversed(self._stack) if element.name == 'tr'), None)
+
+    def handle_starttag(self, tag, attrs):
+        parent = self._stack[-1] if self._stack else None
+        element = StreamElement(tag, dict(attrs), parent)
+
+        if tag in VOID_TAGS:
+            if tag == 'hr' and not self._tables:
+                self._lay_out_block(element, '')
+            return
+
+        if tag == 'table':
+            # A block around a table would repeat all of the table's text - it is not laid out
+            for collector in [c for c in self._collectors if c.name in BLOCK_TAGS]:
+                collector.parts = None
+                self._collectors.remove(collector)
+            self._tables += 1
+        elif tag == 'tr':
+            element.cells = []
+        elif tag in ('h1', 'h2'):
+            cell = self._cell()
+            if cell is not None and cell.heading is None:
+                cell.heading = element
+
+        if tag == 'style' or tag in ('td', 'th') or (tag in BLOCK_TAGS and not self._tables):
+            element.parts = []
+            self._collectors.append(element)
+        self._stack.append(element)
+
+    def handle_endtag(self, tag):
+        # Close up to the most recent open element with this tag (like the tree builder does)
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index].name == tag:
+                while len(self._stack) > index:
+                    self._close(self._stack.pop())
+                return
+
+    def handle_data(self, data):
+        for collector in self._collectors:
+            collector.parts.append(data)
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self._close(self._stack.pop())
+
+    def _close(self, element):
+        if element.parts is None:
+            if element.name == 'table':
+                self._tables -= 1
+                self.ops.append(('space', 2 * self.mm))  # Space after table
+            elif element.name == 'tr' and element.cells:
+                self.ops.extend(row_ops(element.cells, self.mm))
+            return
+
+        self._collectors.remove(element)
+        text = ''.join(element.parts)
+        element.parts = None
+
+        if element.name == 'style':
+            parse_css(text, self.css_rules)
+            logger.info(f"Parsed {len(self.css_rules)} CSS rules")
+        elif element.name in ('td', 'th'):
+            row = self._row()
+            if row is not None:
+                # Headings inherit from the cell's classes
+                if element.heading is not None:
+                    cell_style = get_style(element.heading, self.css_rules, inherit_from_parent=True)
+                else:
+                    cell_style = get_style(element, self.css_rules, inherit_from_parent=False)
+                row.cells.append({
+                    'text': text.strip(),
+                    'style': cell_style,
+                    'is_th': element.name == 'th',
+                    'has_heading': element.heading is not None,
+                })
+        else:
+            text = text.strip()
+            if text:
+                self._lay_out_block(element, text)
+
+    def _lay_out_block(self, element, text):
+        style = get_style(element, self.css_rules)
+        mm = self.mm
+
+        if element.name == 'h1':
+            # h1 typically larger and bold - inherit parent styles
+            self.ops.append(('text', text, style.get('font-size', 16), style['text-align'], True))
+            self.ops.append(('space', 2 * mm))
+        elif element.name == 'h2':
+            # h2 medium size and bold
+            self.ops.append(('text', text, style.get('font-size', 14), style['text-align'], True))
+            self.ops.append(('space', 2 * mm))
+        elif element.name == 'hr':
+            # Check if dashed
+            style_attr = element.get('style', '')
+            class_attr = element.get('class', [])
+            if 'dashed' in style_attr or any('dashed' in str(c) for c in class_attr):
+                self.ops.append(('line', "dashed"))
+            else:
+                self.ops.append(('line', "solid"))
+        else:
+            self.ops.append(('text', text, style['font-size'], style['text-align'], style['bold']))
+
+    def take_ops(self):
+        ops, self.ops = self.ops, []
+        return ops
+
+
+def iter_layout_ops(html_content, chunk_size=CHUNK_SIZE):
+    """Layout operations of a document, produced while it is parsed chunk by chunk"""
+    parser = _DocumentParser()
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start:start + chunk_size])
+        yield from parser.take_ops()
+    parser.close()
+    yield from parser.take_ops()
+
+
+class MeasureCanvas:
+    """Stand-in canvas for measure passes - accepts any drawing call and draws nothing"""
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        return self  # Also serves as a no-op path for beginPath()
+
+
+def _pdf_number(value):
+    return ('%.4f' % value).rstrip('0').rstrip('.')
+
+
+def _pdf_string(text):
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r')
+
+
+class StreamingPdfCanvas:
+    """Canvas that writes every page to the PDF as soon as it is finished
+
+    Supports what the document and display list painters draw (text, lines, rectangles, dashes
+    and line widths) with the standard Helvetica faces, so no fonts are embedded. take() returns the PDF bytes
+    produced since the last call; only the page being drawn is held in memory.
+    """
+
+    FONTS = (('Helvetica', b'F1', 3), ('Helvetica-Bold', b'F2', 4))  # name, resource, object number
+    FIRST_PAGE_OBJECT = 5  # 1 catalog, 2 page tree, 3-4 fonts
+
+    def __init__(self, pagesize):
+        self.width, self.height = pagesize
+        self.page_count = 0
+        self._pending = []
+        self._position = 0
+        self._offsets = {}
+        self._page_objects = []
+        self._next_object = self.FIRST_PAGE_OBJECT
+        self._code = []
+        self._font = ('Helvetica', b'F1', 12)
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self._pending.append(data)
+        self._position += len(data)
+
+    def _write_object(self, number, body):
+        self._offsets[number] = self._position
+        self._write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def setFont(self, name, size):
+        name, resource = next(((font, resource) for font, resource, _ in self.FONTS if font == name), ('Helvetica', b'F1'))
+        self._font = (name, resource, size)
+
+    def drawString(self, x, y, text):
+        _, resource, size = self._font
+        self._code.append(b'BT /%s %s Tf %s %s Td (%s) Tj ET' % (
+            resource, _pdf_number(size).encode(), _pdf_number(x).encode(), _pdf_number(y).encode(), _pdf_string(text)))
+
+    def drawCentredString(self, x, y, text):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        name, _, size = self._font
+        self.drawString(x - stringWidth(text, name, size) / 2, y, text)
+
+    def drawRightString(self, x, y, text):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        name, _, size = self._font
+        self.drawString(x - stringWidth(text, name, size), y, text)
+
+    def setLineWidth(self, width):
+        self._code.append(b'%s w' % _pdf_number(width).encode())
+
+    def setDash(self, array=(), phase=0):
+        if isinstance(array, (int, float)):
+            self._code.append(b'[%s %s] 0 d' % (_pdf_number(array).encode(), _pdf_number(phase).encode()))
+        else:
+            self._code.append(b'[%s] %s d' % (b' '.join(_pdf_number(v).encode() for v in array), _pdf_number(phase).encode()))
+
+    def line(self, x1, y1, x2, y2):
+        self._code.append(b'%s %s m %s %s l S' % tuple(_pdf_number(v).encode() for v in (x1, y1, x2, y2)))
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        self._code.append(b'%s %s %s %s re %s' % (*(_pdf_number(v).encode() for v in (x, y, width, height)),
+                                                  b'B' if stroke and fill else b'f' if fill else b'S'))
+
+    def showPage(self):
+        """Finish the current page and write it out"""
+        content = zlib.compress(b'\n'.join(self._code))
+        content_object, page_object = self._next_object, self._next_object + 1
+        self._next_object += 2
+        self._write_object(content_object, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content)
+                           + content + b'\nendstream')
+        fonts = b' '.join(b'/%s %d 0 R' % (resource, number) for _, resource, number in self.FONTS)
+        self._write_object(page_object, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s %s] '
+                           b'/Resources << /Font << %s >> >> /Contents %d 0 R >>' % (
+                               _pdf_number(self.width).encode(), _pdf_number(self.height).encode(), fonts, content_object))
+        self._page_objects.append(page_object)
+        self._code = []
+        self.page_count += 1
+
+    def save(self):
+        """Finish the last page and write the page tree, fonts and cross-reference table"""
+        if self._code or not self._page_objects:
+            self.showPage()
+        kids = b' '.join(b'%d 0 R' % number for number in self._page_objects)
+        self._write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_objects)))
+        for name, _, number in self.FONTS:
+            self._write_object(number, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                               % name.encode())
+
+        xref_position = self._position
+        entries = [b'0000000000 65535 f \n'] + [b'%010d 00000 n \n' % self._offsets[number]
+                                                for number in range(1, self._next_object)]
+        self._write(b'xref\n0 %d\n' % self._next_object + b''.join(entries))
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self._next_object, xref_position))
+
+    def take(self):
+        """PDF bytes written since the last call"""
+        data = b''.join(self._pending)
+        self._pending = []
+        return data
+
+
+class _PagePainter:
+    """Paints layout operations onto a canvas, starting a new page below page_break_y"""
+
+    def __init__(self, canvas, y, page_break_y=None, page_top_y=None):
+        from reportlab.lib.units import mm
+
+        self.c = canvas
+        self.y = y
+        self.page_break_y = page_break_y  # Only set when the document is longer than the printer allows
+        self.page_top_y = page_top_y
+        self.mm = mm
+        self.width = 80 * mm
+        self.margin_left = 5 * mm
+        self.margin_right = 5 * mm
+        self.usable_width = self.width - self.margin_left - self.margin_right
+        self.line_height = 4 * mm
+
+    def paint(self, op):
+        if op[0] == 'text':
+            self.paint_text(*op[1:])
+        elif op[0] == 'line':
+            self.paint_line(op[1])
+        else:
+            self.y -= op[1]
+
+    def paint_text(self, text, font_size=9, align="left", bold=False):
+        from text_wrap import text_width, wrap_text
+
+        c = self.c
+        font_name = "Helvetica-Bold" if bold else "Helvetica"
+        c.setFont(font_name, font_size)
+
+        # Adjust line height based on font size
+        current_line_height = max(self.line_height, font_size * 0.35)
+
+        # Word wrap (lines must be strictly narrower than the usable width)
+        lines_to_print = wrap_text(text, font_name, font_size, self.usable_width, inclusive=False)
+
+        # Print each line
+        for text_line in lines_to_print:
+            if self.page_break_y is not None and self.y < self.page_break_y:
+                c.showPage()
+                self.y = self.page_top_y
+                c.setFont(font_name, font_size)
+
+            x_pos = self.margin_left
+            if align == "center":
+                line_width = text_width(text_line, font_name, font_size)
+                x_pos = (self.width - line_width) / 2
+            elif align == "right":
+                line_width = text_width(text_line, font_name, font_size)
+                x_pos = self.width - self.margin_right - line_width
+
+            c.drawString(x_pos, self.y, text_line)
+            self.y -= current_line_height
+
+    def paint_line(self, style="dashed"):
+        c = self.c
+        self.y -= 2 * self.mm
+
+        if self.page_break_y is not None and self.y < self.page_break_y:
+            c.showPage()
+            self.y = self.page_top_y
+
+        if style == "dashed":
+            c.setDash(3, 3)
+        else:
+            c.setDash(1, 0)
+
+        c.line(self.margin_left, self.y, self.width - self.margin_right, self.y)
+        c.setDash(1, 0)  # Reset to solid
+        self.y -= 3 * self.mm
+
+
+def iter_html_pdf(html_content, max_length_mm, chunk_size=CHUNK_SIZE):
+    """Render an HTML document to PDF, yielding the bytes as pages are finished
+
+    Up to one page of layout is held back: a document that fits gets a single page of exactly
+    its content height (drawn with ReportLab). A longer one gets pages of max_length_mm, each
+    written out as soon as it is full while the rest of the document is still being parsed.
+    """
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    width = 80 * mm
+    top_margin = 10 * mm
+    bottom_margin = 5 * mm
+    max_length = max_length_mm * mm
+
+    ops = iter_layout_ops(html_content, chunk_size)
+
+    # Measure pass over the first page's worth of operations
+    measure = _PagePainter(MeasureCanvas(), 0)
+    held_back = []
+    for op in ops:
+        held_back.append(op)
+        measure.paint(op)
+        if top_margin + -measure.y + bottom_margin > max_length:
+            break
+    else:
+        # Explicit (width, height) - portrait() would swap a receipt shorter than it is wide
+        height = top_margin + -measure.y + bottom_margin
+        pdf_buffer = io.BytesIO()
+        c = canvas.Canvas(pdf_buffer, pagesize=(width, height), invariant=1)
+        painter = _PagePainter(c, height - top_margin)
+        for op in held_back:
+            painter.paint(op)
+        c.save()
+        logger.info(f"HTML rendered on one {height / mm:.0f}mm page ({len(held_back)} layout operations)")
+        yield pdf_buffer.getvalue()
+        return
+
+    logger.info(f"Document is longer than the printer maximum of {max_length_mm}mm - streaming pages as they fill")
+    c = StreamingPdfCanvas((width, max_length))
+    painter = _PagePainter(c, max_length - top_margin, page_break_y=20 * mm, page_top_y=max_length - 10 * mm)
+    for op in itertools.chain(held_back, ops):
+        painter.paint(op)
+        if c.page_count:
+            data = c.take()
+            if data:
+                yield data
+    c.save()
+    yield c.take()
+    logger.info(f"HTML streamed as {c.page_count} pages of {max_length_mm}mm")
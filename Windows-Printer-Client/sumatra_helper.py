@@ -0,0 +1,160 @@
+"""
+SumatraPDF Helper Module
+Executable discovery (once per process) and a resident print helper per printer that prints
+all PDFs queued while it was busy in a single SumatraPDF run, killed when it hangs
+"""
+import functools
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+IDLE_SECONDS = 60  # A printer's helper thread exits after this long without work
+
+
+@functools.lru_cache(maxsize=1)
+def find_sumatra():
+    """Locate SumatraPDF.exe once per process; returns the path or None"""
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        bundle_dir = os.path.dirname(sys.executable)
+    else:
+        # Running as script
+        bundle_dir = os.path.dirname(os.path.abspath(__file__))
+
+    candidates = [
+        # Same directory as the executable (bundled version) or the script (development)
+        os.path.join(bundle_dir, "SumatraPDF.exe"),
+        # Standard installation paths
+        r"C:\Program Files\SumatraPDF\SumatraPDF.exe",
+        r"C:\Program Files (x86)\SumatraPDF\SumatraPDF.exe",
+    ]
+
+    for path in candidates:
+        if os.path.exists(path):
+            logger.info(f"✅ Found SumatraPDF at: {path}")
+            return path
+
+    logger.info(f"SumatraPDF.exe not found (searched: {candidates})")
+    return None
+
+
+class _PrintCommand:
+    __slots__ = ('path', 'copies', 'result', 'done')
+
+    def __init__(self, path, copies):
+        self.path = path
+        self.copies = copies
+        self.result = False
+        self.done = threading.Event()
+
+
+class SumatraHelper:
+    """Resident SumatraPDF printing, one helper thread per printer
+
+    Commands wait in the printer's queue while a run is in progress; the next run prints all
+    of them (up to max_files with the same copies) with one SumatraPDF process, so sustained
+    printing costs one process start per burst instead of per job. A run that takes longer
+    than timeout seconds is killed and its commands fail.
+    """
+
+    def __init__(self, executable, timeout=60, max_files=16):
+        self.executable = executable
+        self.timeout = timeout
+        self.max_files = max_files
+        self._queues = {}  # Printer -> pending commands
+        self._workers = set()
+        self._cond = threading.Condition()
+        self.runs = 0
+        self.files = 0
+        self.timeouts = 0
+
+    def print_file(self, path, printer_name, copies=1):
+        """Print a PDF file; blocks until it is printed (True) or the run failed (False)
+
+        Raises TimeoutError when the run hung, or when the file wasn't printed within the
+        time a run in progress, its own run and one-by-one retries of a failed run can take.
+        """
+        command = _PrintCommand(path, copies)
+        with self._cond:
+            self._queues.setdefault(printer_name, []).append(command)
+            if printer_name not in self._workers:
+                self._workers.add(printer_name)
+                threading.Thread(target=self._work, args=(printer_name,),
+                                 name=f'sumatra-{printer_name}', daemon=True).start()
+            self._cond.notify_all()
+        if not command.done.wait(self.timeout * (self.max_files + 2)):
+            with self._cond:
+                pending = self._queues.get(printer_name)
+                if pending and command in pending:
+                    pending.remove(command)
+            raise TimeoutError(f"SumatraPDF did not print {os.path.basename(path)} to {printer_name} "
+                               f"within {self.timeout * (self.max_files + 2)}s")
+        if command.result is None:
+            raise TimeoutError(f"SumatraPDF hung printing {os.path.basename(path)} to {printer_name}")
+        return command.result
+
+    def _work(self, printer_name):
+        while True:
+            with self._cond:
+                pending = self._queues.get(printer_name)
+                if not pending:
+                    self._cond.wait(IDLE_SECONDS)
+                    pending = self._queues.get(printer_name)
+                    if not pending:
+                        self._workers.discard(printer_name)
+                        self._queues.pop(printer_name, None)
+                        return
+                copies = pending[0].copies
+                batch = [command for command in pending if command.copies == copies][:self.max_files]
+                for command in batch:
+                    pending.remove(command)
+
+            results = self._run(printer_name, [command.path for command in batch], copies)
+            if results is False and len(batch) > 1:
+                # One bad file fails the whole run - print the files one by one instead
+                results = [self._run(printer_name, [command.path], copies) for command in batch]
+            for index, command in enumerate(batch):
+                result = results[index] if isinstance(results, list) else results
+                command.result = None if result is None else bool(result)  # None: the run hung
+                command.done.set()
+
+    def _run(self, printer_name, paths, copies):
+        """One SumatraPDF run printing paths; returns True on success, None when it hung"""
+        cmd = [self.executable, "-print-to", printer_name, "-silent"]
+        if copies > 1:
+            cmd += ["-print-settings", f"{copies}x"]  # Copies through the driver
+        cmd += paths
+        timeout = self.timeout  # Per run - the files go to the spooler, not to paper
+
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+            )
+        except OSError as e:
+            logger.warning(f"⚠️ Could not start SumatraPDF: {str(e)}")
+            return False
+
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            self.timeouts += 1
+            logger.error(f"❌ SumatraPDF hung printing {len(paths)} files to {printer_name} - killed after {timeout}s")
+            return None  # Not retried file by file - the printer isn't taking jobs
+
+        self.runs += 1
+        if process.returncode != 0:
+            logger.warning(f"⚠️ SumatraPDF failed (exit code {process.returncode}): {stderr.decode('utf-8', 'replace').strip()}")
+            return False
+        self.files += len(paths)
+        if len(paths) > 1:
+            logger.info(f"🖨️ SumatraPDF printed {len(paths)} queued files to {printer_name} in one run")
+        return True
@@ -0,0 +1,501 @@
+"""
+Template Compiler Module
+Compiles the layout of a receipt structure into a specialized render function (styles and column
+geometry folded into constants), which later receipts of that structure call with their cell texts
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from html.parser import HTMLParser
+
+from receipt_index import LINE_DIV_CLASSES, _extract_fiscal_code
+from receipt_profiles import row_key
+
+logger = logging.getLogger(__name__)
+
+TABLE_KEY = ('table',)
+MANY = 3  # Runs of this many rows or more share one template (the row code runs in a loop)
+
+Heading = namedtuple('Heading', 'name')
+
+
+class TemplateCell:
+    """A table cell as read by the template parser (the facts receipt_index.CellInfo has)"""
+
+    __slots__ = ('name', 'text', 'strings', 'classes', 'style', 'colspan', 'heading',
+                 'has_br', 'has_svg', 'is_line', '_parts')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.classes = (attrs.get('class') or '').split()
+        self.style = attrs.get('style')
+        self.colspan = attrs.get('colspan')
+        self.heading = None
+        self.has_br = False
+        self.has_svg = False
+        self.is_line = False  # Set to "has a separator" while parsing, resolved in close()
+        self._parts = []
+
+    def close(self):
+        self.text = ''.join(self._parts).strip()
+        self.strings = [part.strip() for part in self._parts if part.strip()]
+        self.is_line = self.is_line and not self.text
+
+
+class TemplateRow:
+    """A table row as read by the template parser (the facts receipt_index.RowInfo has)"""
+
+    __slots__ = ('section', 'cells', 'in_tfoot', 'in_tbody', 'is_line_only', 'fiscal_code', 'texts', '_parts')
+
+    def __init__(self, section):
+        self.section = section
+        self.in_tfoot = section == 'tfoot'
+        self.in_tbody = section == 'tbody'
+        self.cells = []
+        self._parts = []
+
+    def close(self):
+        self.is_line_only = any(cell.is_line for cell in self.cells)
+        self.fiscal_code = _extract_fiscal_code(''.join(self._parts))
+        self.texts = [cell.text for cell in self.cells if cell.text]
+
+
+class _TemplateParser(HTMLParser):
+    """Reads the stylesheet and the table rows of a receipt in one pass, without building a tree
+
+    Anything the layout could see differently (nested tables, unclosed cells or rows) marks
+    the document as unsupported, and it takes the regular layout path.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.styles = []
+        self.tables = []
+        self.unsupported = False
+        self._in_style = False
+        self._section = None  # None outside tables
+        self._row = None
+        self._cell = None
+        self._data = []
+
+    def _flush(self):
+        if self._data:
+            text = ''.join(self._data)
+            self._data = []
+            if self._in_style:
+                self.styles.append(text)
+            if self._row is not None:
+                self._row._parts.append(text)
+            if self._cell is not None:
+                self._cell._parts.append(text)
+
+    def _close_cell(self):
+        if self._cell is not None:
+            self._cell.close()
+            self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self._row.close()
+            self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        attrs = dict(attrs)
+        if tag == 'style':
+            self._in_style = True
+        elif tag == 'table':
+            if self._section is not None:
+                self.unsupported = True
+            self._section = 'table'
+            self.tables.append([])
+        elif tag in ('thead', 'tbody', 'tfoot'):
+            if self._section != 'table' or self._row is not None:
+                self.unsupported = True
+            self._section = tag
+        elif tag == 'tr':
+            if self._section is None or self._row is not None:
+                self.unsupported = True
+                return
+            self._row = TemplateRow(self._section)
+            self.tables[-1].append(self._row)
+        elif tag in ('td', 'th'):
+            if self._row is None or self._cell is not None:
+                self.unsupported = True
+                return
+            self._cell = TemplateCell(tag, attrs)
+            self._row.cells.append(self._cell)
+        elif self._cell is not None:
+            cell = self._cell
+            if tag in ('h1', 'h2') and cell.heading is None:
+                cell.heading = Heading(tag)
+            elif tag == 'br':
+                cell.has_br = True
+            elif tag == 'svg':
+                cell.has_svg = True
+            elif tag == 'hr' or (tag == 'div' and any(cls in LINE_DIV_CLASSES for cls in (attrs.get('class') or '').split())):
+                cell.is_line = True
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag == 'style':
+            self._in_style = False
+        elif tag in ('td', 'th'):
+            self._close_cell()
+        elif tag == 'tr':
+            self._close_row()
+        elif tag in ('thead', 'tbody', 'tfoot'):
+            self._close_row()
+            if self._section is not None:
+                self._section = 'table'
+        elif tag == 'table':
+            self._close_row()
+            self._section = None
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+        if self._in_style:
+            self.styles.append('<!---->')  # The layout ignores a stylesheet with a comment in it
+
+
+class TemplateDocument:
+    """Stylesheet and rows of one receipt, grouped into runs of rows with the same skeleton"""
+
+    def __init__(self, styles, tables):
+        self.styles = styles
+        self.tables = tables
+        self.qr_payloads = [next((row.fiscal_code for row in rows if row.fiscal_code is not None), "")
+                            for rows in tables]
+        self.runs = []  # [skeleton, rows, table number]
+        for number, rows in enumerate(tables):
+            self.runs.append([TABLE_KEY, [], number])
+            for row in rows:
+                key = row_key(row)
+                if self.runs[-1][0] == key:
+                    self.runs[-1][1].append(row)
+                else:
+                    self.runs.append([key, [row], number])
+
+    def structure_key(self, font_scale):
+        """Hash of the stylesheet, font scale and row skeletons (run lengths 1, 2 or many)"""
+        structure = (font_scale, self.styles, [(key, min(len(rows), MANY)) for key, rows, _ in self.runs])
+        return hashlib.sha256(repr(structure).encode('utf-8')).hexdigest()
+
+
+def parse_template_document(html_content):
+    """Read a receipt for the template path; None if it has to take the regular layout path"""
+    parser = _TemplateParser()
+    try:
+        parser.feed(html_content)
+        parser.close()
+    except Exception as e:
+        logger.debug(f"Template parser gave up: {e}")
+        return None
+    if parser.unsupported or parser._row is not None:
+        return None
+    return TemplateDocument(parser.styles, parser.tables)
+
+
+def _place_qr(add, x, size, y, payload):
+    """QR block of a compiled template (encoded here so a failure leaves no gap)"""
+    from display_list import QrBlock
+    try:
+        from qr_codes import get_qr_matrix
+        get_qr_matrix(payload)
+        add(QrBlock(x, y, size, payload))
+        return 30
+    except Exception as e:
+        logger.warning(f"Could not generate QR code: {e}")
+        return 0
+
+
+class _SourceWriter:
+    """Python source of one render function; numbers are written as exact float literals"""
+
+    def __init__(self, font_scale):
+        from reportlab.lib.units import mm
+
+        self.mm = mm
+        self.font_scale = font_scale
+        self.width = 80 * mm
+        self.margin = 3 * mm
+        self.lines = []
+        self.indent = 1
+
+    def emit(self, line):
+        self.lines.append('    ' * self.indent + line)
+
+    def rule(self):
+        self.emit(f"add(Rule({self.margin!r}, {self.width - self.margin!r}, y, 0.5))")
+
+    def move(self, distance_mm):
+        self.emit(f"y -= {distance_mm * self.mm!r}")
+
+    def step(self, step, row, table_number):
+        """Code of one planned row (mirrors receipt_layout's draw_step with the styles folded in)"""
+        mm, width, margin = self.mm, self.width, self.margin
+        kind = step.kind
+        if kind == 'skip':
+            return
+
+        if kind == 'qr':
+            self.emit(f"payload = qr_payloads[{table_number}]")
+            self.emit("if payload:")
+            self.indent += 1
+            self.move(3)
+            self.emit(f"qr_height = place_qr(add, {(width - 30 * mm) / 2!r}, {30 * mm!r}, y, payload)")
+            self.emit(f"y -= (qr_height + 3) * {mm!r}")
+            self.indent -= 1
+            return
+
+        if step.rule_before:
+            self.move(2)
+            self.rule()
+            self.move(3)
+
+        font_size = step.font_size
+        font = f"{'Helvetica-Bold' if step.bold else 'Helvetica'!r}, {font_size!r}"
+
+        if kind in ('text', 'lines'):
+            size = max(6, int(font_size * self.font_scale))  # draw_text scales once more
+            x, align = {'center': (width / 2, 'center'), 'right': (width - margin, 'right')}.get(step.align, (margin, 'left'))
+            text_font = f"{'Helvetica-Bold' if step.bold else 'Helvetica'!r}, {size!r}, {align!r}"
+            if kind == 'text':
+                self.emit(f"add(TextRun({x!r}, y, row.cells[0].text, {text_font}))")
+                self.move(step.advance)
+                if step.rule_after:
+                    self.move(1)
+                    self.rule()
+                    self.move(2)
+            else:
+                self.emit("for part in row.cells[0].strings:")
+                self.indent += 1
+                self.emit(f"add(TextRun({x!r}, y, part, {text_font}))")
+                self.move(step.advance)
+                self.indent -= 1
+            if step.ends_row:
+                self.emit("ends.append((len(items), y))")
+            return
+
+        self.emit("texts = row.texts")
+        if kind in ('tax_header', 'tax_row'):
+            num_cols = len(row.texts)
+            tax_col_width = (width - 2 * margin) / num_cols
+            row_height = 5.5 * mm
+            for i in range(num_cols):
+                x_pos = margin + (i * tax_col_width)
+                self.emit(f"add(CellBox({x_pos!r}, y - {row_height!r}, {tax_col_width!r}, {row_height!r}, 0.3))")
+                self.emit(f"add(TextRun({x_pos + (tax_col_width / 2)!r}, y - {row_height / 2!r} + {font_size * 0.3!r}, "
+                          f"texts[{i}], {font}, 'center'))")
+            self.emit(f"y -= {row_height!r}")
+            if step.rule_after:
+                self.move(1)
+                self.rule()
+                self.move(2)
+            return
+
+        wrap_advance = (font_size * 0.35 + 0.8) * mm
+        if kind == 'porosi':
+            column = (width - 2 * margin)
+            artikull_x = margin + column * 0.2
+            limit = column * 0.8 - 2 * mm
+            self.emit("left_text, right_text = texts")
+            self.emit(f"add(TextRun({margin!r}, y, left_text, {font}, 'left'))")
+            self.emit(f"if text_width(right_text, {font}) <= {limit!r}:")
+            self.emit(f"    add(TextRun({artikull_x!r}, y, right_text, {font}, 'left'))")
+            self.emit("else:")
+            self.emit(f"    lines = wrap_text(right_text, {font}, {limit!r})")
+            self.emit("    if lines:")
+            self.emit(f"        add(TextRun({artikull_x!r}, y, lines[0], {font}, 'left'))")
+            self.emit("        for line in lines[1:]:")
+            self.emit(f"            y -= {wrap_advance!r}")
+            self.emit(f"            add(TextRun({artikull_x!r}, y, line, {font}, 'left'))")
+        elif kind == 'two':
+            self.emit("left_text, right_text = texts")
+            if step.align == 'center':
+                self.emit(f"add(TextRun({margin!r}, y, left_text, {font}, 'left'))")
+                self.emit(f"add(TextRun({width - margin - 15 * mm!r}, y, right_text, {font}, 'center'))")
+            elif step.align == 'right':
+                self.emit(f"add(TextRun({margin!r}, y, f'{{left_text:<35}} {{right_text:>10}}', {font}, 'left'))")
+            else:
+                self.emit(f"add(TextRun({margin!r}, y, f'{{left_text:<25}} {{right_text}}', {font}, 'left'))")
+        elif kind == 'item_header':
+            col_width = (width - 2 * margin) / 4
+            self.move(1)
+            self.rule()
+            self.move(3)
+            for i in range(len(row.texts)):
+                self.emit(f"add(TextRun({margin + (i * col_width) + (col_width / 2)!r}, y, texts[{i}], {font}, 'center'))")
+            self.move(3)
+            self.rule()
+            self.move(1)
+        elif kind == 'item':
+            col_width = (width - 2 * margin) / 4
+            max_width = col_width - 2 * mm
+            self.emit(f"lines = [texts[0]] if text_width(texts[0], {font}) <= {max_width!r} "
+                      f"else wrap_text(texts[0], {font}, {max_width!r})")
+            self.emit("if lines:")
+            self.emit(f"    add(TextRun({margin!r}, y, lines[0], {font}, 'left'))")
+            for i in range(1, len(row.texts)):
+                self.emit(f"    add(TextRun({margin + (i * col_width) + (col_width / 2)!r}, y, texts[{i}], {font}, 'center'))")
+            self.emit("    for line in lines[1:]:")
+            self.emit(f"        y -= {wrap_advance!r}")
+            self.emit(f"        add(TextRun({margin!r}, y, line, {font}, 'left'))")
+        elif kind == 'joined':
+            self.emit(f"add(TextRun({margin!r}, y, '  '.join(texts), {font}, 'left'))")
+
+        if step.extra:
+            self.move(step.extra)
+        self.move(step.advance)
+        if step.ends_row:
+            self.emit("ends.append((len(items), y))")
+
+
+def _run_steps(steps, states):
+    """Split the planned steps of a run into (steps of its first rows, step of all further rows)
+
+    A run can only share a template across lengths once the section state stops changing
+    (rows in it then always become the same step); returns None if that isn't reached.
+    """
+    if len(steps) < MANY:
+        return steps, None
+    for first in range(MANY - 1):
+        if states[first + 1] == states[first]:
+            return steps[:first], steps[first]
+    return None
+
+
+def compile_template(document, font_scale, steps):
+    """Generate the render function of a document's structure from its planned layout steps
+
+    steps is the (RowStep, section state after it) list layout_receipt recorded for the
+    document. Returns (render function, source) or None if the structure can't be compiled.
+    """
+    from display_list import DisplayList, TextRun, Rule, CellBox
+    from text_wrap import text_width, wrap_text
+
+    writer = _SourceWriter(font_scale)
+    writer.indent = 0
+    writer.emit("def render(runs, qr_payloads):")
+    writer.indent = 1
+    writer.emit("items = []")
+    writer.emit("add = items.append")
+    writer.emit("ends = []")
+    writer.emit("y = 0")
+
+    position = 0
+    state = None
+    for run_number, (key, rows, table_number) in enumerate(document.runs):
+        if key == TABLE_KEY:
+            continue
+        run_steps = [step for step, _ in steps[position:position + len(rows)]]
+        states = [state] + [after for _, after in steps[position:position + len(rows)]]
+        position += len(rows)
+        state = states[-1]
+
+        split = _run_steps(run_steps, states)
+        if split is None:
+            return None
+        first_steps, repeated = split
+
+        writer.emit(f"run = runs[{run_number}]")
+        for index, step in enumerate(first_steps):
+            if step.kind != 'skip':
+                writer.emit(f"row = run[{index}]")
+                writer.step(step, rows[index], table_number)
+        if repeated is not None and repeated.kind != 'skip':
+            writer.emit(f"for row in run[{len(first_steps)}:]:")
+            writer.indent += 1
+            writer.step(repeated, rows[len(first_steps)], table_number)
+            writer.indent -= 1
+
+    if position != len(steps):
+        return None  # The parsers saw different rows
+
+    writer.emit(f"display_list = DisplayList({writer.width!r})")
+    writer.emit("display_list.items = items")
+    writer.emit("display_list.row_ends = ends")
+    writer.emit("return display_list.finish(y)")
+
+    source = '\n'.join(writer.lines) + '\n'
+    namespace = {
+        'DisplayList': DisplayList, 'TextRun': TextRun, 'Rule': Rule, 'CellBox': CellBox,
+        'text_width': text_width, 'wrap_text': wrap_text, 'place_qr': _place_qr,
+    }
+    exec(compile(source, '<receipt template>', 'exec'), namespace)
+    return namespace['render'], source
+
+
+def _same_display_list(first, second):
+    def items(display_list):
+        return [(type(item).__name__,) + tuple(getattr(item, slot) for slot in type(item).__slots__)
+                for item in display_list.items]
+    return (items(first) == items(second) and first.row_ends == second.row_ends
+            and first.height == second.height)
+
+
+class ReceiptTemplates:
+    """Compiled render functions per receipt structure (LRU)
+
+    The first receipt of a structure takes the regular layout and is compiled from it; the
+    generated function is checked against that layout before it is used for later receipts.
+    """
+
+    def __init__(self, max_templates=32):
+        self.max_templates = max_templates
+        self._templates = OrderedDict()  # Structure key -> render function, or None if not compilable
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.compiled = 0
+
+    def layout(self, html_content, font_scale, fragment_cache=None, plan_cache=None):
+        """Display list of a table-based receipt, from its compiled template when there is one"""
+        from receipt_layout import layout_receipt
+
+        document = parse_template_document(html_content)
+        if document is None:
+            return layout_receipt(html_content, font_scale, fragment_cache, plan_cache)
+
+        key = document.structure_key(font_scale)
+        with self._lock:
+            known = key in self._templates
+            render = self._templates.get(key)
+            if known:
+                self._templates.move_to_end(key)
+
+        if render is not None:
+            self.hits += 1
+            logger.info(f"⚡ Receipt rendered from compiled template {key[:12]}")
+            return render([rows for _, rows, _ in document.runs], document.qr_payloads)
+        if known:
+            return layout_receipt(html_content, font_scale, fragment_cache, plan_cache)
+
+        # First receipt of this structure: lay out every row (no fragments) and compile the steps
+        steps = []
+        display_list = layout_receipt(html_content, font_scale, None, plan_cache, steps)
+        render = None
+        try:
+            compiled = compile_template(document, font_scale, steps)
+            if compiled is not None:
+                render, source = compiled
+                check = render([rows for _, rows, _ in document.runs], document.qr_payloads)
+                if _same_display_list(check, display_list):
+                    self.compiled += 1
+                    logger.info(f"🛠️ Compiled receipt template {key[:12]} ({source.count(chr(10))} lines)")
+                else:
+                    logger.warning(f"Compiled receipt template {key[:12]} differs from the layout, not using it")
+                    render = None
+        except Exception as e:
+            logger.warning(f"Could not compile receipt template: {e}")
+            render = None
+
+        with self._lock:
+            self._templates[key] = render
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return display_list
@@ -0,0 +1,88 @@
+"""
+Test script for the config snapshot store
+Edits a .env and printer_settings.json in a temporary directory and checks what the watcher swaps in
+"""
+import sys
+import os
+import json
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config_snapshot import ConfigStore
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() holds; returns whether it did"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+directory = tempfile.mkdtemp(prefix='config_snapshot_test_')
+store = None
+try:
+    env_path = os.path.join(directory, '.env')
+    settings_path = os.path.join(directory, 'printer_settings.json')
+    write(env_path, "PDF_CONVERTER=wkhtmltopdf\nFONT_SCALE=1.0\n")
+    write(settings_path, json.dumps({'Kitchen': {'copies': 2}}))
+
+    store = ConfigStore(env_path, settings_path, interval=0.05)
+    first = store.current
+    assert (first.version, first.pdf_converter, first.font_scale) == (1, 'wkhtmltopdf', 1.0), f"initial load: {first}"
+    assert first.printer_settings['Kitchen']['copies'] == 2, "initial profiles"
+    try:
+        first.printer_settings['Kitchen']['copies'] = 3
+        raise AssertionError("snapshot profiles are writable")
+    except TypeError:
+        pass
+
+    # A changed .env is swapped in as a new version; the old snapshot stays as it was
+    store.start_watching()
+    write(env_path, "PDF_CONVERTER=ReportLab\nFONT_SCALE=0.9\n# edited\n")
+    assert wait_for(lambda: store.current.version == 2), f".env change not picked up (v{store.current.version})"
+    assert (store.current.pdf_converter, store.current.font_scale) == ('reportlab', 0.9), f"new settings: {store.current}"
+    assert (first.pdf_converter, first.font_scale) == ('wkhtmltopdf', 1.0), "old snapshot changed"
+
+    # A broken printer_settings.json keeps the last good profiles
+    write(settings_path, '{"Kitchen": {"copies": ')
+    time.sleep(0.3)  # Several watcher rounds
+    assert store.current.version == 2, "a broken settings file must not create a new version"
+    assert store.current.printer_settings['Kitchen']['copies'] == 2, "last good profiles lost"
+
+    # Settings changes made while the file was broken still apply once it is fixed
+    write(env_path, "PDF_CONVERTER=sumatrapdf\nFONT_SCALE=0.9\n")
+    assert wait_for(lambda: store.current.pdf_converter == 'sumatrapdf'), ".env change ignored while settings broken"
+    assert store.current.printer_settings['Kitchen']['copies'] == 2, "profiles lost on an .env reload"
+    write(settings_path, json.dumps({'Kitchen': {'copies': 1}, 'Bar': {'cut': False}}))
+    assert wait_for(lambda: 'Bar' in store.current.printer_settings), "fixed settings file not picked up"
+    assert store.current.printer_settings['Kitchen']['copies'] == 1, "fixed profiles not swapped in"
+
+    print(f"\n{'='*60}")
+    print(f"Config Snapshot Test - PASSED")
+    print(f"{'='*60}")
+    print(f"Final snapshot: v{store.current.version}, {store.current.pdf_converter}, "
+          f"{len(store.current.printer_settings)} printer profiles")
+    print(f"{'='*60}\n")
+
+except AssertionError as e:
+    print(f"\n[ERROR] Config snapshot test failed: {str(e)}")
+    sys.exit(1)
+except Exception as e:
+    print(f"\n[ERROR] Exception during test: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+finally:
+    if store is not None:
+        store.stop_watching()
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,159 @@
+"""
+Test script for the native ESC/POS text and raster backends
+Runs without a printer (also on Linux): the byte stream goes to a file and a local TCP stand-in
+"""
+import sys
+import os
+import re
+import socket
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from receipt_layout import layout_receipt
+from escpos_backend import (paint_escpos_text, iter_escpos_display_list, iter_escpos_raster,
+                            qr_code_commands, INIT, PARTIAL_CUT)
+from spool_backends import FileBackend, TcpBackend
+
+test_html = """
+<html>
+<head>
+<style>
+.title1 { font-size: 22px; font-weight: bold; text-align: center; }
+.tds-footer { font-size: 14px; text-align: center; }
+.columnsSkontrino { font-size: 12px; }
+th { font-size: 12px; }
+td { font-size: 12px; }
+</style>
+</head>
+<body>
+<table>
+    <tr><td class="title1">Fature Tatimore</td></tr>
+    <tr><td class="tds-footer">Parid Smart Solution</td></tr>
+    <tr><td class="columnsSkontrino">Operator: Andi</td></tr>
+    <tr><td class="columnsSkontrino">Tavolina: 25</td></tr>
+</table>
+<table>
+    <thead>
+        <tr><th>Artikull</th><th>Sasia</th><th>Cmimi</th><th>Vlera</th></tr>
+    </thead>
+    <tbody>
+        <tr><td>Kafe</td><td>1 x</td><td>80</td><td>80</td></tr>
+        <tr><td>Birrë e çelur</td><td>2 x</td><td>200</td><td>400</td></tr>
+    </tbody>
+</table>
+<table>
+    <tr><td><h1>Totali</h1></td><td><h1>480</h1></td></tr>
+</table>
+<table>
+    <tr><td>Tipi</td><td>TVSH</td><td>Vlera pa TVSH</td><td>Vlera me TVSH</td></tr>
+    <tr><td>20%</td><td>80</td><td>400</td><td>480</td></tr>
+</table>
+<table>
+    <tfoot>
+        <tr><td>NIVF: TEST123456</td></tr>
+        <tr><td><svg></svg></td></tr>
+        <tr><td>Gjeneruar nga Parid Smart Solution</td></tr>
+    </tfoot>
+</table>
+</body>
+</html>
+"""
+
+
+def printable(line):
+    """Strip ESC/POS mode commands from a printed line"""
+    return re.sub(rb'\x1b@|\x1b[taEd].|\x1d[!V].', b'', line)
+
+
+def receive_once(server, received):
+    conn, _ = server.accept()
+    with conn:
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            received.append(chunk)
+
+
+try:
+    display_list = layout_receipt(test_html, 0.8)
+    escpos_data = paint_escpos_text(display_list)
+
+    # File stand-in
+    result_path = os.path.join(tempfile.gettempdir(), 'test_escpos.bin')
+    FileBackend(result_path).send(escpos_data, 'ESC/POS Test')
+    with open(result_path, 'rb') as f:
+        file_data = f.read()
+
+    # TCP stand-in (like a JetDirect port 9100 printer)
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    received = []
+    receiver = threading.Thread(target=receive_once, args=(server, received))
+    receiver.start()
+    TcpBackend('127.0.0.1', server.getsockname()[1]).send(escpos_data, 'ESC/POS Test')
+    receiver.join(5)
+    server.close()
+    tcp_data = b''.join(received)
+
+    lines = escpos_data.split(b'\n')
+    assert escpos_data.startswith(INIT), "stream must start with ESC @"
+    assert escpos_data.endswith(PARTIAL_CUT), "stream must end with a cut"
+    assert any(b'Fature Tatimore' in line for line in lines), "title missing"
+    assert any(b'Kafe' in line and b'80' in line for line in lines), "four-column row not on one line"
+    assert any(b'Tipi' in line and b'Vlera me TVSH' in line for line in lines), "tax table header not on one line"
+    assert 'Birrë'.encode('cp858') in escpos_data and 'çelur'.encode('cp858') in escpos_data, "cp858 text missing"
+    assert all(len(printable(line)) <= 48 for line in lines if b'(k' not in line), "line wider than paper"
+    assert b'-' * 48 + b'\n' in escpos_data, "separator missing"
+    assert qr_code_commands('TEST123456', 9)[-8:] in escpos_data, "QR print command missing"
+    assert b'1P0TEST123456' in escpos_data, "QR payload not stored"
+    assert file_data == escpos_data, "file stand-in received different bytes"
+    assert tcp_data == escpos_data, "TCP stand-in received different bytes"
+
+    # Raster mode: bands are produced lazily and streamed as they come
+    raster_path = os.path.join(tempfile.gettempdir(), 'test_escpos_raster.bin')
+    bands = list(iter_escpos_display_list(display_list))
+    FileBackend(raster_path).send_stream(iter(bands), 'ESC/POS Raster Test')
+    raster_data = b''.join(bands)
+    band_commands = [band for band in bands if band.startswith(b'\x1dv0')]
+    assert bands[0] == INIT, "raster stream must start with ESC @"
+    assert band_commands, "no GS v 0 bands"
+    assert all(band[4:6] == (72).to_bytes(2, 'little') for band in band_commands), "bands must be 576 dots wide"
+    with open(raster_path, 'rb') as f:
+        assert f.read() == raster_data, "file stand-in received different raster bytes"
+
+    # Blank bands become paper feeds instead of image data
+    from PIL import Image
+    blank_gap = Image.new('L', (576, 400), 255)
+    blank_gap.paste(0, (0, 0, 576, 10))
+    blank_gap.paste(0, (0, 390, 576, 400))
+    gap_stream = list(iter_escpos_raster(blank_gap, band_height=100, cut=False))
+    assert sum(band.startswith(b'\x1dv0') for band in gap_stream) == 2, "blank bands were not skipped"
+    assert b'\x1bJ\xc8' in gap_stream, "blank bands must become a 200-dot feed"
+    dithered = list(iter_escpos_raster(Image.new('L', (576, 100), 128), band_height=50, dither=True, cut=False))
+    dark_bits = sum(bin(byte).count('1') for band in dithered[1:] for byte in band[8:])
+    assert abs(dark_bits - 576 * 100 // 2) < 576, "50% gray should dither to about half dark dots"
+
+    print(f"\n{'='*60}")
+    print(f"ESC/POS Backend Test - PASSED")
+    print(f"{'='*60}")
+    print(f"Byte stream: {result_path} ({len(escpos_data):,} bytes)")
+    print(f"Raster stream: {raster_path} ({len(raster_data):,} bytes, {len(band_commands)} bands)")
+    print(f"\nPrinted lines:")
+    for line in lines:
+        if b'(k' in line:
+            print(f"  |<QR code>")
+        else:
+            print(f"  |{printable(line).decode('cp858', errors='replace')}")
+    print(f"{'='*60}\n")
+
+except AssertionError as e:
+    print(f"\n[ERROR] ESC/POS test failed: {str(e)}")
+    sys.exit(1)
+except Exception as e:
+    print(f"\n[ERROR] Exception during test: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
@@ -0,0 +1,108 @@
+"""
+Test script for print job coalescing
+Runs without a printer: the flush callback records the batches it is handed
+"""
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from job_coalescer import JobCoalescer
+
+
+def submit_all(coalescer, jobs, results, gap=0.02):
+    """Submit jobs from their own threads, gap seconds apart; returns the threads"""
+    threads = []
+    for job in jobs:
+        thread = threading.Thread(target=lambda job=job: results.__setitem__(job, coalescer.submit(job)))
+        thread.start()
+        threads.append(thread)
+        time.sleep(gap)
+    return threads
+
+
+try:
+    # Each job gets its own result back from one flush
+    batches = []
+
+    def flush(jobs):
+        batches.append(list(jobs))
+        return [f"printed {job}" for job in jobs]
+
+    coalescer = JobCoalescer(0.2, 8, flush)
+    results = {}
+    for thread in submit_all(coalescer, ['a', 'b', 'c'], results):
+        thread.join()
+    assert batches == [['a', 'b', 'c']], f"burst not coalesced: {batches}"
+    assert results == {'a': 'printed a', 'b': 'printed b', 'c': 'printed c'}, f"results mixed up: {results}"
+    assert (coalescer.batches, coalescer.coalesced_jobs) == (1, 3), "batch counters wrong"
+
+    # max_jobs closes a batch early; the next job opens a new one
+    batches.clear()
+    coalescer = JobCoalescer(0.2, 2, flush)
+    results = {}
+    for thread in submit_all(coalescer, ['a', 'b', 'c'], results):
+        thread.join()
+    assert batches == [['a', 'b'], ['c']], f"max_jobs not honoured: {batches}"
+
+    # A failing flush fails every job of its batch
+    def broken_flush(jobs):
+        raise OSError("spooler gone")
+
+    coalescer = JobCoalescer(0.1, 8, broken_flush)
+    results = {}
+    for thread in submit_all(coalescer, ['a', 'b'], results):
+        thread.join()
+    assert results == {'a': False, 'b': False}, f"failed flush not reported: {results}"
+
+    # A follower that times out while its batch prints waits for the real result
+    printed = []
+
+    def slow_flush(jobs):
+        time.sleep(0.5)
+        printed.extend(jobs)
+        return [True] * len(jobs)
+
+    coalescer = JobCoalescer(0.05, 8, slow_flush, timeout=0.2)
+    results = {}
+    for thread in submit_all(coalescer, ['a', 'b'], results, gap=0.01):
+        thread.join()
+    assert printed == ['a', 'b'], f"batch not printed whole: {printed}"
+    assert results == {'a': True, 'b': True}, f"printing job reported as failed: {results}"
+
+    # A follower whose batch is still queued behind an earlier one is withdrawn unprinted,
+    # and batches reach the spooler in arrival order
+    batches.clear()
+    gate = threading.Event()
+
+    def gated_flush(jobs):
+        if jobs == ['a']:
+            gate.wait(5)
+        batches.append(list(jobs))
+        return [True] * len(jobs)
+
+    coalescer = JobCoalescer(0.05, 8, gated_flush, timeout=0.2)
+    results = {}
+    threads = submit_all(coalescer, ['a'], results)
+    time.sleep(0.1)  # 'a' is flushing and holds the spooler
+    threads += submit_all(coalescer, ['b', 'c'], results, gap=0.01)
+    time.sleep(0.4)  # 'c' gives up while its batch waits
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert batches == [['a'], ['b']], f"withdrawn job printed or batches out of order: {batches}"
+    assert results == {'a': True, 'b': True, 'c': False}, f"withdrawn job not reported as failed: {results}"
+
+    print(f"\n{'='*60}")
+    print(f"Job Coalescer Test - PASSED")
+    print(f"{'='*60}\n")
+
+except AssertionError as e:
+    print(f"\n[ERROR] Job coalescer test failed: {str(e)}")
+    sys.exit(1)
+except Exception as e:
+    print(f"\n[ERROR] Exception during test: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
@@ -0,0 +1,72 @@
+"""
+Test script for print job deadlines
+Checks time parsing (epochs, ISO 8601), lane TTLs and the expiry decision without a printer
+"""
+import sys
+import os
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from job_deadlines import JobExpired, check_deadline, job_deadline, parse_lane_ttls, parse_time
+
+EPOCH = 1760000000  # 2025-10-09T08:53:20Z
+
+try:
+    # Epochs: seconds or JavaScript milliseconds, as numbers or numeric strings
+    assert parse_time(EPOCH) == EPOCH, "epoch seconds"
+    assert parse_time(EPOCH * 1000) == EPOCH, "epoch milliseconds"
+    assert parse_time(EPOCH + 0.5) == EPOCH + 0.5, "fractional epoch seconds"
+    assert parse_time(str(EPOCH)) == EPOCH, "epoch seconds as a string"
+    assert parse_time(str(EPOCH * 1000)) == EPOCH, "epoch milliseconds as a string"
+    assert parse_time(f" {EPOCH}.5 ") == EPOCH + 0.5, "padded epoch string"
+
+    # ISO 8601: Z and offsets are absolute, naive times are local time
+    assert parse_time('2025-10-09T08:53:20Z') == EPOCH, "ISO time with Z"
+    assert parse_time('2025-10-09T10:53:20+02:00') == EPOCH, "ISO time with an offset"
+    naive = '2025-10-09T08:53:20'
+    assert parse_time(naive) == datetime.fromisoformat(naive).timestamp(), "naive ISO time is local time"
+    assert parse_time(naive + 'Z') == datetime(2025, 10, 9, 8, 53, 20, tzinfo=timezone.utc).timestamp()
+
+    # Unreadable and non-finite values give no time at all
+    for value in (None, '', 'soon', 'nan', 'inf', '-inf', float('nan'), float('inf')):
+        assert parse_time(value) is None, f"{value!r} should not parse"
+
+    # Lane TTLs
+    assert parse_lane_ttls('kitchen=600, bar=900,broken,x=y') == {'kitchen': 600.0, 'bar': 900.0}, "lane TTLs"
+    assert parse_lane_ttls('') == {} and parse_lane_ttls(None) == {}, "empty lane TTLs"
+
+    # Deadlines: the earlier of "deadline" and creation + TTL
+    assert job_deadline({}) is None, "no deadline without a deadline or a TTL"
+    assert job_deadline({'deadline': str(EPOCH * 1000)}) == EPOCH, "deadline from a millisecond string"
+    assert job_deadline({'created_at': EPOCH}, 600) == EPOCH + 600, "TTL from created_at"
+    assert job_deadline({'created_at': '2025-10-09T08:53:20Z', 'deadline': EPOCH + 60}, 600) == EPOCH + 60, \
+        "the earlier deadline wins"
+    assert job_deadline({'received_at': EPOCH}, 600) == EPOCH + 600, "TTL from received_at without created_at"
+    assert job_deadline({'created_at': 'garbage', 'received_at': EPOCH}, 600) == EPOCH + 600, \
+        "unreadable created_at falls back to received_at"
+    before = time.time()
+    assert before + 600 <= job_deadline({}, 600) <= time.time() + 600, "TTL from now without any creation time"
+    assert job_deadline({'deadline': 'nan'}) is None, "non-finite deadline ignored"
+
+    # Expiry
+    check_deadline({'deadline': EPOCH}, now=EPOCH - 1)
+    try:
+        check_deadline({'deadline': EPOCH, 'document_name': 'Order 12'}, now=EPOCH + 30)
+        raise AssertionError("expired job not rejected")
+    except JobExpired as e:
+        assert "'Order 12' expired 30s ago" in str(e), f"unexpected message: {e}"
+    check_deadline({'created_at': EPOCH * 1000}, ttl=None, now=EPOCH + 10 ** 6)  # No TTL - never expires
+
+    print(f"\n{'='*60}")
+    print(f"Job Deadlines Test - PASSED")
+    print(f"{'='*60}\n")
+
+except AssertionError as e:
+    print(f"\n[ERROR] Job deadlines test failed: {str(e)}")
+    sys.exit(1)
+except Exception as e:
+    print(f"\n[ERROR] Exception during test: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
@@ -2,6 +2,7 @@
 Test QR code rendering in ReportLab
 """
 import os
+import tempfile
 
 # HTML similar to what's sent from the frontend
 test_html = """
@@ -109,11 +110,15 @@ try:
     print("-" * 60)
 
     # Create PDF
-    pdf_path = printer_handler._convert_html_to_pdf(test_html)
+    pdf_data, converter = printer_handler._convert_html_to_pdf(test_html)
 
-    if pdf_path and os.path.exists(pdf_path):
-        pdf_size = os.path.getsize(pdf_path)
-        print(f"[OK] PDF created successfully!")
+    if pdf_data:
+        # Renderers return PDF bytes - save a copy so it can be opened
+        pdf_path = os.path.join(tempfile.gettempdir(), 'test_qr_code.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_data)
+        pdf_size = len(pdf_data)
+        print(f"[OK] PDF created successfully! (converter: {converter})")
         print(f"  Path: {pdf_path}")
         print(f"  Size: {pdf_size:,} bytes")
         print(f"\n[OK] Features:")
@@ -0,0 +1,74 @@
+"""
+Test script for the receipt render process pool
+Runs one spawned worker: normal renders, a missed deadline that replaces the worker and a
+render error that leaves the worker in service
+"""
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from reportlab.lib.units import mm
+from display_list import marked_copy, paint_pdf, paint_pdf_batch
+from receipt_layout import WARM_UP_RECEIPT_HTML, layout_receipt
+from render_pool import RenderPool
+
+
+def page_count(pdf_data):
+    return len(re.findall(rb'/Type /Page\b(?!s)', pdf_data))
+
+
+if __name__ == '__main__':
+    pool = None
+    try:
+        pool = RenderPool(workers=1, timeout=30)
+        display_list = layout_receipt(WARM_UP_RECEIPT_HTML, 0.8)
+
+        # Normal render: the PDF comes back through shared memory, byte-identical to in-process
+        pdf_data = pool.render_receipt(WARM_UP_RECEIPT_HTML, 0.8, 3000)
+        assert pdf_data == paint_pdf(display_list, 5 * mm, 5 * mm, 3000 * mm, 20 * mm, 10 * mm), \
+            "worker PDF differs from the in-process render"
+
+        # Several parts in one job: a page per part, marked copies included
+        batch_data = pool.render_receipts([(WARM_UP_RECEIPT_HTML, None), (WARM_UP_RECEIPT_HTML, 'KOPJE')], 0.8, 3000)
+        assert page_count(batch_data) == 2, f"expected 2 pages, got {page_count(batch_data)}"
+        assert batch_data == paint_pdf_batch([display_list, marked_copy(display_list, 'KOPJE')],
+                                             5 * mm, 5 * mm, 3000 * mm, 20 * mm, 10 * mm), "batch PDF differs"
+
+        # A job that misses its deadline gets its worker killed and replaced
+        rows = ''.join(f'<tr><td>Item {i}</td><td>{i}.00</td></tr>' for i in range(5000))
+        try:
+            pool.render_receipt(f'<html><body><table>{rows}</table></body></html>', 0.8, 3000, timeout=0.05)
+            raise AssertionError("slow job did not time out")
+        except TimeoutError:
+            pass
+        assert pool.restarts == 1, f"worker not replaced after the timeout (restarts={pool.restarts})"
+        assert pool.render_receipt(WARM_UP_RECEIPT_HTML, 0.8, 3000) == pdf_data, "replacement worker broken"
+
+        # A render error is reported, and the same worker takes the next job
+        error = None
+        try:
+            pool.render_receipts([(None, None)], 0.8, 3000)
+        except Exception as e:
+            error = e
+        assert error is not None and 'Error' in str(error), f"worker error not reported: {error!r}"
+        assert pool.restarts == 1, "a render error must not restart the worker"
+        assert pool.render_receipt(WARM_UP_RECEIPT_HTML, 0.8, 3000) == pdf_data, "worker unusable after an error"
+
+        print(f"\n{'='*60}")
+        print(f"Render Pool Test - PASSED")
+        print(f"{'='*60}")
+        print(f"Receipt PDF: {len(pdf_data):,} bytes, restarts: {pool.restarts}")
+        print(f"{'='*60}\n")
+
+    except AssertionError as e:
+        print(f"\n[ERROR] Render pool test failed: {str(e)}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] Exception during test: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if pool is not None:
+            pool.close()
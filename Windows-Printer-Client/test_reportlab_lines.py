@@ -5,6 +5,7 @@ Test script to verify ReportLab modifications:
 """
 import sys
 import os
+import tempfile
 
 # Test HTML for regular receipt (Fature Tatimore)
 fature_html = """
@@ -121,9 +122,13 @@ try:
     print("\nTest 1: Regular Receipt (Fature Tatimore)")
     print("-" * 60)
     print("Expected: NO dashed lines anywhere")
-    pdf_path1 = printer_handler._convert_html_to_pdf(fature_html)
-    if pdf_path1 and os.path.exists(pdf_path1):
-        print(f"[OK] PDF created: {pdf_path1}")
+    pdf_data1, converter = printer_handler._convert_html_to_pdf(fature_html)
+    if pdf_data1:
+        # Renderers return PDF bytes - save a copy so it can be opened
+        pdf_path1 = os.path.join(tempfile.gettempdir(), 'test_reportlab_lines_fature.pdf')
+        with open(pdf_path1, 'wb') as f:
+            f.write(pdf_data1)
+        print(f"[OK] PDF created: {pdf_path1} (converter: {converter})")
         print("     All dashed lines should be removed")
     else:
         print("[ERROR] PDF creation failed")
@@ -134,9 +139,13 @@ try:
     print("\nTest 2: Urdhri Punes (Work Order)")
     print("-" * 60)
     print("Expected: NO dashed lines, SOLID lines before/after column headers")
-    pdf_path2 = printer_handler._convert_html_to_pdf(urdhri_html)
-    if pdf_path2 and os.path.exists(pdf_path2):
-        print(f"[OK] PDF created: {pdf_path2}")
+    pdf_data2, converter = printer_handler._convert_html_to_pdf(urdhri_html)
+    if pdf_data2:
+        # Renderers return PDF bytes - save a copy so it can be opened
+        pdf_path2 = os.path.join(tempfile.gettempdir(), 'test_reportlab_lines_urdhri.pdf')
+        with open(pdf_path2, 'wb') as f:
+            f.write(pdf_data2)
+        print(f"[OK] PDF created: {pdf_path2} (converter: {converter})")
         print("     Should have solid lines around column headers (Artikull, Sasia, etc.)")
     else:
         print("[ERROR] PDF creation failed")
@@ -0,0 +1,77 @@
+"""
+Test script for the scratch file janitor
+Runs the janitor thread on a temporary directory (no spooler: files are confirmed or wait out the grace period)
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scratch_janitor import ScratchJanitor
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() holds; returns whether it did"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+directory = tempfile.mkdtemp(prefix='scratch_janitor_test_')
+try:
+    # A leftover of an earlier run
+    leftover = os.path.join(directory, 'job_old.pdf')
+    with open(leftover, 'wb') as f:
+        f.write(b'%PDF-old')
+    os.utime(leftover, (time.time() - 3600, time.time() - 3600))
+
+    janitor = ScratchJanitor(directory, grace=0.3, interval=0.05, give_up=5)
+    janitor.start()
+    assert wait_for(lambda: not os.path.exists(leftover)), "leftover of an earlier run not reclaimed"
+    assert (janitor.reclaimed_files, janitor.reclaimed_bytes) == (1, 8), f"reclaim counters: {janitor.stats()}"
+
+    time.sleep(0.05)  # Files below are newer than the start
+    in_use = janitor.create(b'%PDF-in-use')
+    confirmed = janitor.create([b'%PDF-', b'confirmed'])  # Chunks, like a streamed render
+    unconfirmed = janitor.create(b'%PDF-unconfirmed')
+    with open(confirmed, 'rb') as f:
+        assert f.read() == b'%PDF-confirmed', "chunks not written in order"
+
+    # Confirmed files go at once; unconfirmed ones after the grace period
+    released_at = time.monotonic()
+    janitor.release(confirmed, confirmed=True)
+    janitor.release(unconfirmed)
+    assert wait_for(lambda: not os.path.exists(confirmed), 0.25), "confirmed file not deleted promptly"
+    assert os.path.exists(unconfirmed), "unconfirmed file deleted before the grace period"
+    assert wait_for(lambda: not os.path.exists(unconfirmed)), "unconfirmed file not deleted after the grace period"
+    assert time.monotonic() - released_at >= 0.3, "grace period not honoured"
+
+    # Files of this run that weren't released stay, also through another sweep
+    janitor.reclaim_leftovers()
+    time.sleep(0.4)
+    assert os.path.exists(in_use), "file of the current run deleted"
+
+    stats = janitor.stats()
+    assert (stats['deleted_files'], stats['pending_files'], stats['leaked_files']) == (2, 0, 0), f"counters: {stats}"
+
+    print(f"\n{'='*60}")
+    print(f"Scratch Janitor Test - PASSED")
+    print(f"{'='*60}")
+    print(f"Stats: {stats}")
+    print(f"{'='*60}\n")
+
+except AssertionError as e:
+    print(f"\n[ERROR] Scratch janitor test failed: {str(e)}")
+    sys.exit(1)
+except Exception as e:
+    print(f"\n[ERROR] Exception during test: {str(e)}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+finally:
+    shutil.rmtree(directory, ignore_errors=True)
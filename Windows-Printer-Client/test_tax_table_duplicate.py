@@ -90,10 +90,14 @@ handler = PrinterHandler()
 
 try:
     # Generate PDF using the internal method
-    result_path = handler._convert_html_to_pdf_reportlab(html_with_duplicate)
+    pdf_data = handler._convert_html_to_pdf_reportlab(html_with_duplicate)
 
-    if result_path and os.path.exists(result_path):
-        file_size = os.path.getsize(result_path)
+    if pdf_data:
+        # Renderers return PDF bytes - save a copy so it can be opened
+        result_path = os.path.join(tempfile.gettempdir(), 'test_tax_table_duplicate.pdf')
+        with open(result_path, 'wb') as f:
+            f.write(pdf_data)
+        file_size = len(pdf_data)
         print(f"\n{'='*60}")
         print(f"Tax Table Duplicate Test - PASSED")
         print(f"{'='*60}")
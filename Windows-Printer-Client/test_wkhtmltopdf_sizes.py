@@ -90,11 +90,15 @@ try:
     print("-" * 60)
 
     # Create a test PDF
-    pdf_path = printer_handler._convert_html_to_pdf(test_html)
-
-    if pdf_path and os.path.exists(pdf_path):
-        pdf_size = os.path.getsize(pdf_path)
-        print(f"[OK] PDF created successfully!")
+    pdf_data, converter = printer_handler._convert_html_to_pdf(test_html)
+
+    if pdf_data:
+        # Renderers return PDF bytes - save a copy so it can be opened
+        pdf_path = os.path.join(tempfile.gettempdir(), 'test_wkhtmltopdf_sizes.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_data)
+        pdf_size = len(pdf_data)
+        print(f"[OK] PDF created successfully! (converter: {converter})")
         print(f"  Path: {pdf_path}")
         print(f"  Size: {pdf_size:,} bytes")
         print(f"\n[OK] Font size reductions applied:")
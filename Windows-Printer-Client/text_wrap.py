@@ -0,0 +1,71 @@
+"""
+Text Wrap Module
+Linear-time word wrapping using cached per-font glyph advance tables
+"""
+import functools
+
+# font name -> {character: advance in 1/1000 em}
+_advance_tables = {}
+
+
+def _glyph_advances(font_name):
+    """Get (creating on first use) the glyph advance table for a font"""
+    table = _advance_tables.get(font_name)
+    if table is None:
+        table = _advance_tables[font_name] = {}
+    return table
+
+
+def _text_units(text, table, font_name):
+    """Sum glyph advances of text in 1/1000 em, filling the table for unseen characters"""
+    units = 0.0
+    for ch in text:
+        advance = table.get(ch)
+        if advance is None:
+            from reportlab.pdfbase.pdfmetrics import stringWidth
+            advance = table[ch] = stringWidth(ch, font_name, 1000)
+        units += advance
+    return units
+
+
+def text_width(text, font_name, font_size):
+    """Width of text in points (same result as canvas.stringWidth)"""
+    return _text_units(text, _glyph_advances(font_name), font_name) * font_size * 0.001
+
+
+@functools.lru_cache(maxsize=4096)
+def wrap_text(text, font_name, font_size, max_width, inclusive=True):
+    """Greedy word wrap of text into lines no wider than max_width points
+
+    Each word is measured once and line widths are accumulated, so wrapping is linear
+    in the text length. Results are cached, so repeated product names wrap only once.
+    inclusive=False requires lines to be strictly narrower than max_width.
+
+    Returns a tuple of lines.
+    """
+    table = _glyph_advances(font_name)
+    scale = font_size * 0.001
+    space_units = _text_units(' ', table, font_name)
+
+    lines = []
+    current_words = []
+    current_units = 0.0
+
+    for word in text.split():
+        word_units = _text_units(word, table, font_name)
+        test_units = current_units + space_units + word_units if current_words else word_units
+        test_width = test_units * scale
+
+        if test_width <= max_width if inclusive else test_width < max_width:
+            current_words.append(word)
+            current_units = test_units
+        else:
+            if current_words:
+                lines.append(' '.join(current_words))
+            current_words = [word]
+            current_units = word_units
+
+    if current_words:
+        lines.append(' '.join(current_words))
+
+    return tuple(lines)
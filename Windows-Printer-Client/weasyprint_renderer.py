@@ -0,0 +1,99 @@
+"""
+WeasyPrint Renderer Module
+Long-lived WeasyPrint renderer: imported, font-configured and stylesheet-compiled once,
+warmed up in the background, with a batch API for rush periods
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 80mm receipt page, content height decides the page length
+RECEIPT_PAGE_CSS = '''
+    @page {
+        size: 80mm auto;
+        margin: 0;
+        padding: 0;
+    }
+    body {
+        margin: 0;
+        padding: 5mm;
+        font-family: Arial, sans-serif;
+    }
+'''
+
+WARM_UP_HTML = '<html><body><table><tr><td><h1>Warm-up</h1></td></tr><tr><td>1 x</td><td>0.00</td></tr></table></body></html>'
+
+
+class WeasyPrintRenderer:
+    """WeasyPrint with a shared FontConfiguration and pre-compiled receipt stylesheet
+
+    WeasyPrint documents are rendered one at a time under a lock; the expensive parts
+    (import, font discovery, CSS compilation) happen once for the life of the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+        self._font_config = None
+        self._stylesheet = None
+        self.warm_up_seconds = None
+
+    def _ensure_ready(self):
+        """Import WeasyPrint and compile the stylesheet (caller holds the lock)"""
+        if self._stylesheet is None:
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+
+            self._font_config = FontConfiguration()
+            self._stylesheet = CSS(string=RECEIPT_PAGE_CSS, font_config=self._font_config)
+
+    def warm_up(self):
+        """Load WeasyPrint, fonts and the stylesheet by rendering a small document"""
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                self._ensure_ready()
+                self._write_pdf(WARM_UP_HTML)
+            self.warm_up_seconds = time.perf_counter() - start
+            logger.info(f"🔥 WeasyPrint warmed up in {self.warm_up_seconds:.2f}s")
+        except Exception as e:
+            logger.warning(f"WeasyPrint warm-up failed: {str(e)}")
+
+    def start_warm_up(self):
+        """Warm up in a background thread (returns immediately)"""
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name='weasyprint-warm-up', daemon=True)
+            self._warm_up_thread.start()
+
+    def _write_pdf(self, html_content):
+        from weasyprint import HTML
+        return HTML(string=html_content).write_pdf(stylesheets=[self._stylesheet], font_config=self._font_config)
+
+    def render(self, html_content):
+        """Render one HTML document to PDF bytes"""
+        with self._lock:
+            self._ensure_ready()
+            return self._write_pdf(html_content)
+
+    def render_batch(self, html_documents, combine=False):
+        """Render several HTML documents in one call
+
+        Returns a list of PDF bytes, one per document - or, with combine=True, a single PDF
+        holding the pages of all documents (one spool job for the whole batch).
+        """
+        from weasyprint import HTML
+
+        with self._lock:
+            self._ensure_ready()
+            documents = [
+                HTML(string=html_content).render(stylesheets=[self._stylesheet], font_config=self._font_config)
+                for html_content in html_documents
+            ]
+            if not documents:
+                return b'' if combine else []
+            if combine:
+                pages = [page for document in documents for page in document.pages]
+                return documents[0].copy(pages).write_pdf()
+            return [document.write_pdf() for document in documents]
@@ -0,0 +1,212 @@
+"""
+wkhtmltopdf Pool Module
+Executable discovery (once per process), cached stylesheet injection and a pool of
+pre-started wkhtmltopdf workers that convert HTML from stdin to PDF on stdout
+"""
+import functools
+import logging
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Same page setup as print_server/app.py
+WKHTMLTOPDF_ARGS = [
+    '--quiet',
+    '--encoding', 'utf-8',
+    '--page-width', '80mm',
+    '--page-height', '297mm',
+    '--margin-top', '0mm',
+    '--margin-bottom', '0mm',
+    '--margin-left', '0mm',
+    '--margin-right', '0mm',
+    '--zoom', '1',
+    '--disable-smart-shrinking',
+    '-', '-',  # HTML from stdin, PDF to stdout
+]
+
+# Injected into every document: smaller title, company name and address, clearer text
+RECEIPT_CSS = """
+    /* Improve text rendering for better readability */
+    * {
+        -webkit-font-smoothing: antialiased !important;
+        -moz-osx-font-smoothing: grayscale !important;
+        text-rendering: optimizeLegibility !important;
+    }
+
+    /* Center the "Fature" title */
+    h1 {
+        text-align: center !important;
+        font-size: 18px !important;
+        margin: 5px 0 !important;
+        font-weight: bold !important;
+    }
+
+    .title1 h1 {
+        font-size: 18px !important;
+        margin: 5px 0 !important;
+        text-align: center !important;
+    }
+
+    .tds-footer {
+        font-size: 14px !important;
+    }
+
+    /* Increase Artikull column font size for Full Invoice (4-column table) */
+    .columnsPershkrim {
+        font-size: 14px !important;
+        font-weight: 600 !important;
+    }
+
+    /* Increase Artikull column font size for Fature Porosi (2-column table) */
+    .columnsPershkrim_urdhri {
+        font-size: 15px !important;
+        font-weight: 600 !important;
+    }
+
+    /* Improve overall text clarity */
+    body, td, th, p, span, div {
+        -webkit-font-smoothing: antialiased !important;
+        -moz-osx-font-smoothing: grayscale !important;
+    }
+"""
+
+_STYLE_BLOCK = f"<style>{RECEIPT_CSS}</style>"
+_HEAD_END = re.compile(r'</head\s*>', re.IGNORECASE)
+_HTML_START = re.compile(r'<html[^>]*>', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1)
+def find_wkhtmltopdf():
+    """Locate wkhtmltopdf.exe once per process; returns the path or None"""
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        bundle_dir = os.path.dirname(sys.executable)
+        # PyInstaller extracts to _MEIPASS temporary folder
+        meipass_dir = getattr(sys, '_MEIPASS', None)
+        logger.info(f"📦 Running as PyInstaller bundle (executable dir: {bundle_dir}, extract dir: {meipass_dir})")
+    else:
+        # Running as script
+        bundle_dir = os.path.dirname(os.path.abspath(__file__))
+        meipass_dir = None
+
+    candidates = [
+        # PyInstaller temp directory (where bundled files are extracted)
+        os.path.join(meipass_dir, "wkhtmltopdf.exe") if meipass_dir else None,
+        # Same directory as the executable (bundled version) or the script (development)
+        os.path.join(bundle_dir, "wkhtmltopdf.exe"),
+        # Standard installation paths
+        r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe",
+        r"C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe",
+    ]
+
+    for path in candidates:
+        if path and os.path.exists(path):
+            logger.info(f"✅ Found wkhtmltopdf at: {path}")
+            return path
+
+    logger.warning(f"❌ wkhtmltopdf.exe not found (searched: {[p for p in candidates if p]})")
+    return None
+
+
+def inject_stylesheet(html_content):
+    """Add the receipt stylesheet to the document head without re-parsing the HTML"""
+    match = _HEAD_END.search(html_content)
+    if match:
+        return html_content[:match.start()] + _STYLE_BLOCK + html_content[match.start():]
+
+    match = _HTML_START.search(html_content)
+    if match:
+        return html_content[:match.end()] + f"<head>{_STYLE_BLOCK}</head>" + html_content[match.end():]
+
+    return f"<head>{_STYLE_BLOCK}</head>" + html_content
+
+
+class WkhtmltopdfPool:
+    """Pre-started wkhtmltopdf processes, each waiting for one HTML document on stdin
+
+    Process start-up happens ahead of time (a replacement is started as soon as a worker
+    is taken), max_workers limits concurrent conversions, and a conversion that runs past
+    timeout seconds is killed.
+    """
+
+    def __init__(self, executable, max_workers=2, timeout=30):
+        self.executable = executable
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._spares = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._closed = False
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [self.executable] + WKHTMLTOPDF_ARGS,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+        )
+
+    def _add_spare(self):
+        if self._closed or self._spares.qsize() >= self.max_workers:
+            return
+        try:
+            self._spares.put(self._spawn())
+        except Exception as e:
+            logger.warning(f"Could not pre-start wkhtmltopdf worker: {str(e)}")
+
+    def start(self):
+        """Pre-start one worker per slot (in the background)"""
+        for _ in range(self.max_workers - self._spares.qsize()):
+            threading.Thread(target=self._add_spare, daemon=True).start()
+
+    def _take_worker(self):
+        while True:
+            try:
+                process = self._spares.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if process.poll() is None:
+                return process
+
+    def convert(self, html_content):
+        """Convert an HTML document to PDF bytes"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Exception(f"No wkhtmltopdf worker free within {self.timeout}s")
+        try:
+            process = self._take_worker()
+            # Start the replacement while this worker converts
+            threading.Thread(target=self._add_spare, daemon=True).start()
+
+            try:
+                pdf_data, stderr = process.communicate(html_content.encode('utf-8'), timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise Exception(f"wkhtmltopdf timed out after {self.timeout}s")
+
+            if not pdf_data.startswith(b'%PDF'):
+                raise Exception(f"wkhtmltopdf failed (exit code {process.returncode}): {stderr.decode('utf-8', 'replace').strip()}")
+            if process.returncode != 0:
+                logger.warning(f"wkhtmltopdf exited with code {process.returncode} but produced a PDF")
+            return pdf_data
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Stop all idle workers"""
+        self._closed = True
+        while True:
+            try:
+                process = self._spares.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                process.kill()
+                process.wait(timeout=5)
+            except Exception:
+                pass